@@ -1,15 +1,20 @@
 import streamlit as st
-from groq import Groq
 from dotenv import load_dotenv
 import json
 import os
 import pandas as pd
 import torch
-from transformers import AutoTokenizer
+from token_counter import count_tokens_exact
 from dotenv import load_dotenv
 import requests
 import re
 import time 
+from prompt_encoder import encode_data
+from backends import get_backend
+from planning import continue_plan, is_truncated, tokens_per_second
+from stream_parser import AssignmentStreamParser
+from request_log import RunLog
+from results_view import render_results
 
 st.markdown(
     """
@@ -38,8 +43,8 @@ st.markdown(
 # Load environment variables
 load_dotenv()
 
-# Initialize Groq client
-client = Groq()
+# Groq backend, shared across reruns so its connection pool stays warm
+backend = get_backend("groq", "openai/gpt-oss-20b")
 
 # Load JSON files
 with open("C:\\Job Planner\\Json\\drivers.json", "r") as f:
@@ -48,30 +53,6 @@ with open("C:\\Job Planner\\Json\\drivers.json", "r") as f:
 with open("C:\\Job Planner\\Json\\jobs.json", "r") as f:
     jobs_json = json.load(f)
 
-# -------------------------
-# Helper: Count Tokens
-# -------------------------
-# Cache tokenizers per model
-tokenizer_cache = {}
-
-def count_tokens_exact(text, model="gpt-oss:20b"):
-    global tokenizer_cache
-    
-    if model not in tokenizer_cache:
-        # Map Ollama model to HuggingFace equivalent
-        if "llama" in model:
-            hf_model = "meta-llama/Llama-2-7b-hf"   # adjust for llama3.2 once available
-        elif "gpt-oss" in model:
-            hf_model = "EleutherAI/gpt-neox-20b"    # matches gpt-oss:20b arch
-        else:
-            hf_model = "gpt2"  # fallback
-        
-        tokenizer_cache[model] = AutoTokenizer.from_pretrained(hf_model)
-    
-    tokenizer = tokenizer_cache[model]
-    tokens = tokenizer.encode(text, add_special_tokens=False)
-    return len(tokens)
-
 
 # Streamlit UI
 st.title("Job Planner Assignment")
@@ -106,6 +87,8 @@ user_prompt = st.text_area("Enter your prompt:", height=200, value=default_promp
 # Return the assignment strictly in JSON format.
 # """
 
+drivers_text, jobs_text, _ = encode_data(drivers_json, jobs_json, fmt="csv")
+
 final_prompt = f"""
 You are a job planner system. 
 Always return ONLY a valid JSON object in this format:
@@ -121,82 +104,84 @@ Always return ONLY a valid JSON object in this format:
   ]
 }}
 
-Jobs: {json.dumps(jobs_json)}
-Drivers: {json.dumps(drivers_json)}
+Jobs: {jobs_text}
+Drivers: {drivers_text}
 
 User Request: {user_prompt}
 """
 
 
+run = None
 if st.button("Run Job Assignment"):
     start_time = time.time()
+    run = RunLog(app="Groq", backend="groq", model=backend.model, jobs=len(jobs_json), drivers=len(drivers_json))
 
     # --- Token Counting ---
-    prompt_tokens = count_tokens_exact(final_prompt, model="gpt-oss:20b")
+    with run.stage("tokenization"):
+        prompt_tokens = count_tokens_exact(final_prompt, model="gpt-oss:20b")
     st.info(f"📊 Token length: {prompt_tokens} tokens")
 
       # --- Display time placeholder ---
     time_placeholder = st.empty()  # reserve a space to update later
     with st.spinner("Generating job assignments..."):
-        # Call Groq API
-        completion = client.chat.completions.create(
-            model="openai/gpt-oss-20b",
-           messages=[
+        # Call Groq API, streaming so rows show up as drivers complete
+        parser = AssignmentStreamParser()
+        live_placeholder = st.empty()
+        live_rows = []
+        with backend.stream(
+            [
                 {
                     "role": "user",
                     "content": final_prompt
                 }
             ],
             temperature=1,
-            max_completion_tokens=8192,
+            max_tokens=8192,
             top_p=1,
             reasoning_effort="medium",
-            stream=False,
-            response_format={"type": "json_object"},
-        )
+        ) as stream:
+            for content in stream:
+                for driver in parser.feed(content):
+                    for job in driver.get("jobs", []):
+                        live_rows.append({
+                            "Driver ID": driver.get("driver_id"),
+                            "Job ID": job.get("job_id"),
+                            "Pickup Zone": job.get("pickup_zone"),
+                            "Dropoff Zone": job.get("dropoff_zone"),
+                        })
+                    live_placeholder.dataframe(pd.DataFrame(live_rows), hide_index=True)
 
         # Extract response
-        response_text = completion.choices[0].message.content
+        result = stream.result
+        response_text = result.text
+        run.add_result(result)
+        live_placeholder.empty()
+
+        if result.time_to_first_token is not None:
+            st.info(
+                f"⚡ First token after {result.time_to_first_token:.2f} s · "
+                f"{result.completion_tokens} completion tokens · {tokens_per_second(result) or 0:.1f} tokens/s"
+            )
 
         try:
-            response_json = json.loads(response_text)
+            if is_truncated(result):
+                # Keep the drivers that arrived whole and ask again for the rest
+                response_json, parts = continue_plan(
+                    backend, result, drivers_json, jobs_json, user_prompt, output="jobs", run=run,
+                )
+                run.set(continuation_parts=len(parts))
+                st.write("#### ✂️ Continuation parts")
+                st.dataframe(pd.DataFrame(parts), hide_index=True)
+            else:
+                with run.stage("json_extraction"):
+                    response_json = json.loads(response_text)
             st.success("✅ Job assignment completed!")
            # st.json(response_json)  # Display nicely formatted JSON
 
-           # Build table rows
-            rows = []
-            for driver in response_json.get("assignments", []):
-                driver_id = driver.get("driver_id")
-                for job in driver.get("jobs", []):
-                    rows.append({
-                        "Driver ID": driver_id,
-                        "Job ID": job.get("job_id"),
-                        "Pickup Zone": job.get("pickup_zone"),
-                        "Dropoff Zone": job.get("dropoff_zone"),
-                    })
-
-            # Convert to DataFrame
-            df = pd.DataFrame(rows)
-
-            # Show rows with Assign button
-            st.write("### Job Assignments")
-            header_cols = st.columns([2, 2, 2, 2, 1])
-            header_cols[0].write("**Driver ID**")
-            header_cols[1].write("**Job ID**")
-            header_cols[2].write("**Pickup Zone**")
-            header_cols[3].write("**Dropoff Zone**")
-            header_cols[4].write("**Action**")
-            
-            for i, row in df.iterrows():
-                cols = st.columns([2, 2, 2, 2, 1])
-                cols[0].write(row["Driver ID"])
-                cols[1].write(row["Job ID"])
-                cols[2].write(row["Pickup Zone"])
-                cols[3].write(row["Dropoff Zone"])
-
-                if cols[4].button("Assign", key=f"assign_{i}"):
-                    st.success(f"✅ Assigned Job {row['Job ID']} to Driver {row['Driver ID']}")
+            st.session_state["plan_result"] = {"prompt": final_prompt, "plan": response_json}
+            st.session_state.pop("groq_assigned", None)
         except Exception as e:
+            run.fail("parse", e)
             st.error("⚠️ Failed to parse JSON output.")
             st.text(response_text)  # Show raw output
 
@@ -208,6 +193,17 @@ if st.button("Run Job Assignment"):
     else:
         minutes = duration / 60
         time_placeholder.info(f"⏱️ Task completed in {minutes:.2f} minutes")
+
+# Show the last plan for this prompt as one grid with bulk assign
+result = st.session_state.get("plan_result")
+if result and result["prompt"] == final_prompt:
+    render_start = time.perf_counter()
+    render_results(result["plan"], key="groq")
+    if run is not None:
+        run.add("render", time.perf_counter() - render_start)
+if run is not None:
+    run.write()
+
 # Assign jobs to drivers with the following algorithm:
 # 1. Output must be JSON only with fields: driver_id, jobs[].
 # 2. Include Pickup Zone and Dropoff Zone for every job.
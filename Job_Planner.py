@@ -1,9 +1,11 @@
 import streamlit as st
 import json
-import paramiko
-import os 
 from dotenv import load_dotenv
 import requests
+from prompt_encoder import encode_data
+from backends import get_backend
+from request_log import RunLog
+from remote_ollama import get_remote_ollama
 
 load_dotenv()
 
@@ -19,8 +21,9 @@ with open("C:\\Job Planner\\Json\\jobs.json", "r") as f:
 # Streamlit UI
 st.write("Enter your prompt below to assign jobs to drivers:")
 
-# Default prompt
-default_prompt = """
+# Rules are the same on every run, so the Mac's Ollama serves them from
+# its prompt cache; the data and the request go last
+PROMPT_PREFIX = """
 You are a job planner system. 
 Always respond ONLY in valid JSON format with the following rules:
 
@@ -29,82 +32,60 @@ Always respond ONLY in valid JSON format with the following rules:
 3. A driver's next job must have pickup_zone equal to the previous job's dropoff_zone.
 4. Each driver can have at most 3 jobs.
 5. Assign all jobs so none are left unassigned.
+
+Return the assignment strictly in JSON format, nothing else.
 """
+default_prompt = "Assign jobs to drivers"
 
 user_prompt = st.text_area("Enter your prompt:", height=200, value=default_prompt)
 
-final_prompt = f"""
-{default_prompt}
+drivers_text, jobs_text, _ = encode_data(drivers_json, jobs_json, fmt="csv")
+
+final_prompt = f"""{PROMPT_PREFIX}
+Jobs: {jobs_text}
+Drivers: {drivers_text}
 
 User request:
 {user_prompt}
-
-Jobs: {json.dumps(jobs_json)}
-Drivers: {json.dumps(drivers_json)}
-
-Return the assignment strictly in JSON format, nothing else.
 """
 
 if st.button("Run Job Assignment"):
+    run = RunLog(app="Job_Planner", backend="remote", model="llama3.1:8b")
     with st.spinner("Generating job assignments..."):
         try:
             # -------------------------
-            # Connect to Mac via SSH
-            # -------------------------
-            MAC_IP = "192.168.1.19"   # replace with your Mac IP
-            USERNAME = "darshal"
-            PASSWORD = "dm@mac"  # or use key-based auth
-            # PASSWORD = os.getenv("PASSWORD")
-            # print(PASSWORD)
-            OLLAMA_PATH = "~/Code/Job Planner/ollama/ollama"
-
-            KEY_PATH="C:\\Users\\Admin\\.ssh\\id_rsa"    
-
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            # ssh.connect(MAC_IP, username=USERNAME, password=PASSWORD)
-
-            try:
-                # ✅ Try SSH key first
-                if os.path.exists(KEY_PATH):
-                    ssh.connect(MAC_IP, username=USERNAME, key_filename=KEY_PATH, timeout=10)
-                else:
-                    raise FileNotFoundError("SSH key not found")
-            except Exception:
-                # 🔑 Fallback to password
-                ssh.connect(MAC_IP, username=USERNAME, password=PASSWORD, timeout=10)
-
-
-            # -------------------------
-            # Run Ollama command and send prompt via stdin
+            # Stream from the Mac's Ollama over the shared SSH tunnel
             # -------------------------
-
-            command = f'echo "{final_prompt}" | {OLLAMA_PATH} run llama3.1:8b --input -'
-            stdin, stdout, stderr = ssh.exec_command(command)
-
-            # Send final_prompt as input to Ollama
-            stdin.write(final_prompt)
-            stdin.channel.shutdown_write()
-
-
-            response_text = stdout.read().decode().strip()
-            error_text = stderr.read().decode().strip()
-
-            ssh.close()
+            # The tunnel, HTTP session and loaded model are reused across
+            # clicks; the prompt is sent once in the request body.
+            backend = get_backend("remote", "llama3.1:8b")
+            stream = backend.stream([{"role": "user", "content": final_prompt}])
+            response_text = "".join(stream).strip()
+            run.add_result(stream.result)
 
             # -------------------------
             # Parse output
             # -------------------------
             try:
-                response_json = json.loads(response_text)
+                with run.stage("json_extraction"):
+                    response_json = json.loads(response_text)
                 st.success("✅ Job assignment completed!")
                 st.json(response_json)
-            except Exception:
+            except Exception as e:
+                run.fail("parse", e)
                 st.error("⚠️ Failed to parse JSON output.")
                 st.text(response_text)
-                if error_text:
-                    st.text("Errors from Ollama: " + error_text)
 
         except Exception as e:
+            run.fail("backend", e)
             st.error(f"❌ SSH/Ollama error: {str(e)}")
+    run.write()
 
+# Load the model on the Mac ahead of the first request
+if st.button("Warm up remote model"):
+    with st.spinner("Loading model on the remote Mac..."):
+        try:
+            get_remote_ollama().warm()
+            st.success("✅ Model loaded and kept alive")
+        except Exception as e:
+            st.error(f"❌ SSH/Ollama error: {str(e)}")
@@ -1,13 +1,15 @@
 import streamlit as st
 import json
-import os
-import requests
 import re
 import time 
 import tiktoken
 import torch
-from transformers import AutoTokenizer
+from token_counter import count_tokens_exact
 from dotenv import load_dotenv
+from prompt_encoder import encode_data
+from stream_parser import AssignmentStreamParser
+from backends import get_backend
+from request_log import RunLog
 
 
 load_dotenv()
@@ -45,30 +47,6 @@ def extract_json(text):
                 return None
     return None
 
-# -------------------------
-# Helper: Count Tokens
-# -------------------------
-# Cache tokenizers per model
-tokenizer_cache = {}
-
-def count_tokens_exact(text, model="gpt-oss:20b"):
-    global tokenizer_cache
-    
-    if model not in tokenizer_cache:
-        # Map Ollama model to HuggingFace equivalent
-        if "llama" in model:
-            hf_model = "meta-llama/Llama-2-7b-hf"   # adjust for llama3.2 once available
-        elif "gpt-oss" in model:
-            hf_model = "EleutherAI/gpt-neox-20b"    # matches gpt-oss:20b arch
-        else:
-            hf_model = "gpt2"  # fallback
-        
-        tokenizer_cache[model] = AutoTokenizer.from_pretrained(hf_model)
-    
-    tokenizer = tokenizer_cache[model]
-    tokens = tokenizer.encode(text, add_special_tokens=False)
-    return len(tokens)
-
 
 # -------------------------
 # Streamlit UI
@@ -76,56 +54,64 @@ def count_tokens_exact(text, model="gpt-oss:20b"):
 st.title("📂 Job Planner")
 st.write("Enter your prompt below to assign jobs to drivers:")
 
-default_prompt = """
-You are a job planner system. 
-Always respond ONLY in valid JSON format with the following rules:
+# Everything up to "Jobs:" is the same on every run, so a warm Ollama
+# serves it from its prompt cache; the data and the request go last
+PROMPT_PREFIX = """
+Act as a job planner system.
+Your ONLY output must be a valid JSON array.
 
+Rules:
 1. Output must be JSON only with fields: driver_id, jobs[].
 2. Each job must include pickup_zone and dropoff_zone.
 3. A driver's next job must have pickup_zone equal to the previous job's dropoff_zone.
 4. Each driver can have at most 3 jobs.
 5. Assign all jobs so none are left unassigned.
 6. Do not include explanations or text outside the JSON.
-"""
-
-user_prompt = st.text_area("Enter your prompt:", height=200, value=default_prompt)
-
-final_prompt = f"""
-Act as a job planner system.
-Your ONLY output must be a valid JSON array.
-
-User request:
-{user_prompt}
 
 Follow this schema exactly:
 [
-  {{
+  {
     "driver_id": "DR-001",
     "jobs": [
-      {{
+      {
         "job_id": "JOB-1001",
         "pickup_zone": "z1",
         "dropoff_zone": "z6"
-      }},
-      {{
+      },
+      {
         "job_id": "JOB-1005",
         "pickup_zone": "z6",
         "dropoff_zone": "z9"
-      }}
+      }
     ]
-  }}
+  }
 ]
-Jobs: {json.dumps(jobs_json)}
-Drivers: {json.dumps(drivers_json)}
-Return the assignment strictly in JSON format.  
+Return the assignment strictly in JSON format.
+"""
+
+default_prompt = "Assign jobs to drivers"
+
+user_prompt = st.text_area("Enter your prompt:", height=200, value=default_prompt)
+
+drivers_text, jobs_text, _ = encode_data(drivers_json, jobs_json, fmt="csv")
+
+final_prompt = f"""{PROMPT_PREFIX}
+Jobs: {jobs_text}
+Drivers: {drivers_text}
+
+User request:
+{user_prompt}
 """
 
 
 if st.button("Run Job Assignment"):
     start_time = time.time()
+    run = RunLog(app="Job_Planner_API", backend="ollama", model="gpt-oss:20b",
+                 jobs=len(jobs_json), drivers=len(drivers_json))
 
     # --- Token Counting ---
-    prompt_tokens = count_tokens_exact(final_prompt, model="gpt-oss:20b")
+    with run.stage("tokenization"):
+        prompt_tokens = count_tokens_exact(final_prompt, model="gpt-oss:20b")
     st.info(f"📊 Token length: {prompt_tokens} tokens")
 
       # --- Display time placeholder ---
@@ -133,44 +119,85 @@ if st.button("Run Job Assignment"):
 
     with st.spinner("Connecting to Ollama..."):
         try:
-            OLLAMA_API = os.getenv("OLLAMA_API")
-
-            payload = {
-                "model": "gpt-oss:20b",  #  "llama3.2:latest" "gpt-oss:20b"
-                "messages": [
-                   {"role": "system", "content": "Return only a JSON array following the provided schema. No explanations, no alternative keys."},
-                    {"role": "user", "content": final_prompt}
-                ],
-                "stream": True  # <-- IMPORTANT for Ollama
-            }
-            
-            # Collect streamed response
-            response = requests.post(OLLAMA_API, json=payload, stream=True)
-            response.raise_for_status()
+            # Shared keep-alive client for the Ollama API (OLLAMA_API in .env)
+            backend = get_backend("ollama", "gpt-oss:20b")  #  "llama3.2:latest" "gpt-oss:20b"
+            messages = [
+                {"role": "system", "content": "Return only a JSON array following the provided schema. No explanations, no alternative keys."},
+                {"role": "user", "content": final_prompt}
+            ]
+
+            # Stream the response; the first assignment is timed from here
+            request_start = time.time()
+            stream = backend.stream(messages, json_mode=False)
+
+            # Parse driver objects as they complete and render them right away
+            parser = AssignmentStreamParser()
+            all_job_ids = {job["job_id"] for job in jobs_json}
+            placed_job_ids = set()
+            drivers_done = []
+            rows = []
+            first_assignment_placeholder = st.empty()
+            table_placeholder = st.empty()
+            first_assignment_time = None
+            stopped_early = False
 
             collected_text = ""
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        obj = json.loads(line.decode("utf-8"))
-                        # Append message content if available
-                        if "message" in obj and "content" in obj["message"]:
-                            collected_text += obj["message"]["content"]
-                    except Exception:
-                        pass
+            for chunk in stream:
+                collected_text += chunk
+                new_drivers = parser.feed(chunk)
+                if not new_drivers:
+                    continue
+                if first_assignment_time is None:
+                    first_assignment_time = time.time() - request_start
+                    first_assignment_placeholder.info(
+                        f"⚡ First assignment after {first_assignment_time:.2f} seconds"
+                    )
+                for driver in new_drivers:
+                    drivers_done.append(driver)
+                    for job in driver.get("jobs", []):
+                        placed_job_ids.add(job.get("job_id"))
+                        rows.append({
+                            "Driver ID": driver.get("driver_id"),
+                            "Job ID": job.get("job_id"),
+                            "Pickup Zone": job.get("pickup_zone"),
+                            "Dropoff Zone": job.get("dropoff_zone"),
+                        })
+                table_placeholder.dataframe(rows, hide_index=True)
+
+                # Every job is placed: no need to wait for the closing brackets
+                if all_job_ids <= placed_job_ids:
+                    stopped_early = True
+                    stream.close()
+                    break
+
+            if stream.result is not None:
+                run.add_result(stream.result)
+            else:
+                # closed early: the final chunk with usage and timings never arrived
+                run.add("generation", time.time() - request_start)
+            run.set(stopped_early=stopped_early,
+                    first_assignment_seconds=None if first_assignment_time is None else round(first_assignment_time, 6))
 
             # Try extracting JSON
-            response_json = extract_json(collected_text)
+            with run.stage("json_extraction"):
+                response_json = drivers_done if stopped_early else extract_json(collected_text)
+            if not response_json and drivers_done:
+                response_json = drivers_done
 
             if response_json:
                 st.success("✅ Job assignment completed!")
+                if stopped_early:
+                    st.info("⏹️ Stream stopped early: every job was already assigned")
                 st.json(response_json)
             else:
+                run.fail("parse", collected_text)
                 st.error("⚠️ No JSON object found in response.")
                 st.text(collected_text)
     
         except Exception as e:
+            run.fail("backend", e)
             st.error(f"❌ API error: {str(e)}")
+    run.write()
 
     end_time = time.time()     # record end
     duration = end_time - start_time
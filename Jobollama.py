@@ -1,6 +1,8 @@
 import streamlit as st
 import json
-import ollama
+from backends import get_backend
+from request_log import RunLog
+from prompt_encoder import encode_data
 
 # Load JSON files
 with open("C:\\Job Planner\\Json\\drivers.json", "r") as f:
@@ -12,8 +14,9 @@ with open("C:\\Job Planner\\Json\\jobs.json", "r") as f:
 # Streamlit UI
 st.write("Enter your prompt below to assign jobs to drivers:")
 
-# Default prompt with rules
-default_prompt = """
+# Rules and example are the same on every run, so a warm Ollama serves
+# them from its prompt cache; the data and the request go last
+PROMPT_PREFIX = """
 You are a job planner system. 
 Always output ONLY valid JSON, no text, no explanations. 
 The JSON must follow these rules:
@@ -34,45 +37,53 @@ Example JSON format:
     ]
   }
 ]
+
+Return the assignment strictly in JSON format, nothing else.
 """
+default_prompt = "Assign jobs to drivers"
+
 # User input
 user_prompt = st.text_area("Enter your prompt:", height=200,value=default_prompt)
 
 # Build final prompt
-final_prompt = f"""
-{default_prompt}
+drivers_text, jobs_text, _ = encode_data(drivers_json, jobs_json, fmt="csv")
+
+final_prompt = f"""{PROMPT_PREFIX}
+Jobs: {jobs_text}
+Drivers: {drivers_text}
 
 User request:
 {user_prompt}
-
-Jobs: {json.dumps(jobs_json)}
-Drivers: {json.dumps(drivers_json)}
-
-Return the assignment strictly in JSON format, nothing else.
 """
 
 if st.button("Run Job Assignment"):
+    run = RunLog(app="Jobollama", backend="ollama", model="llama3.1:8b")
     with st.spinner("Generating job assignments..."):
         try:
-            # Run Ollama locally
-            response = ollama.chat(
-                model="llama3.1:8b",   # or "mistral", "llama2", etc.
-                messages=[
+            # Run Ollama locally through the shared keep-alive backend
+            backend = get_backend("ollama", "llama3.1:8b")   # or "mistral", "llama2", etc.
+            result = backend.complete(
+                [
                     {"role": "system", "content": "You are a strict JSON job assignment assistant."},
                     {"role": "user", "content": final_prompt},
                 ],
-                format= "json",
+                json_mode=True,
             )
 
-            response_text = response["message"]["content"]
+            response_text = result.text
+            run.add_result(result)
             print(response_text)
             try:
-                response_json = json.loads(response_text)
+                with run.stage("json_extraction"):
+                    response_json = json.loads(response_text)
                 st.success("✅ Job assignment completed!")
                 st.json(response_json)  # Pretty JSON
             except Exception as e:
+                run.fail("parse", e)
                 st.error("⚠️ Failed to parse JSON output.")
                 st.text(response_text)  # Show raw output if not JSON
         except Exception as e:
+            run.fail("backend", e)
             st.error(f"❌ Error: {str(e)}")
+    run.write()
 
@@ -1,17 +1,28 @@
 import streamlit as st
-from groq import Groq
 from dotenv import load_dotenv
-import json
 import pandas as pd
 import time
-from transformers import AutoTokenizer
-import re
-import os 
+from backends import get_backend
+from ingest import cached_records, file_bytes
+from optimizer import load_deadhead, optimize_assignments
+from plan_cache import get_plan_cache, plan_key
+from plan_queue import ACTIVE, ENGINE_KEYS, POLL_SECONDS, get_plan_queue
+from racing import race_plan
+from planning import (
+    DEFAULT_OUTPUT, OUTPUTS, SAMPLING, build_prompt, build_prompt_parts, continue_plan, decode_plan,
+    is_truncated, job_index, plan_hybrid, plan_incremental, request_plan, request_plan_stream,
+    tokens_per_second,
+)
+from prompt_encoder import DEFAULT_FORMAT, FORMATS
+from sharding import plan_sharded
+from solver import solve_assignments
+from token_counter import count_prompt_tokens
+from request_log import RunLog
+from results_view import render_results
+from validator import repair_plan, validate_plan
 
 load_dotenv()
 
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
 # ----------------- Custom CSS -----------------
 st.markdown(
     """
@@ -36,199 +47,457 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# ----------------- Load env & client -----------------
+# ----------------- Load env -----------------
 load_dotenv()
-client = Groq()
 
 # ----------------- File Uploaders -----------------
 st.title("📂 AI Job Planner")
 
 st.markdown("### Upload Driver and Job CSVs")
 
-# Load sample files
-drivers_sample = pd.read_csv("resources/Drivers.csv")
-jobs_sample = pd.read_csv("resources/Jobs.csv")
-
-# Add download buttons
+# Sample files are served as-is, read once per process
 st.markdown("#### 📥 Download sample files")
 st.download_button(
     label="Download Drivers.csv",
-    data=drivers_sample.to_csv(index=False),
+    data=file_bytes("resources/Drivers.csv"),
     file_name="Drivers.csv",
     mime="text/csv",
 )
 st.download_button(
     label="Download Jobs.csv",
-    data=jobs_sample.to_csv(index=False),
+    data=file_bytes("resources/Jobs.csv"),
     file_name="Jobs.csv",
     mime="text/csv",
 )
+st.download_button(
+    label="Download Deadhead.csv",
+    data=file_bytes("resources/Deadhead.csv"),
+    file_name="Deadhead.csv",
+    mime="text/csv",
+)
 
-drivers_file = st.file_uploader("Upload drivers.csv", type=["csv"])
-jobs_file = st.file_uploader("Upload jobs.csv", type=["csv"])
+# Key of the plan rendered from this upload, so a background result is not shown twice
+shown_key = None
 
-if drivers_file is not None and jobs_file is not None:
-    drivers_df = pd.read_csv(drivers_file)
-    jobs_df = pd.read_csv(jobs_file)
+drivers_file = st.file_uploader("Upload drivers.csv", type=["csv", "parquet"])
+jobs_file = st.file_uploader("Upload jobs.csv", type=["csv", "parquet"])
 
-    if "driver_id" in drivers_df.columns:
-        drivers_json = drivers_df[["driver_id"]].to_dict(orient="records")
-    else:
+if drivers_file is not None and jobs_file is not None:
+    parse_start = time.perf_counter()
+    # Parsed once per file content; reruns reuse the cached frames
+    try:
+        drivers_json = cached_records(drivers_file.getvalue(), "drivers", drivers_file.name)
+    except ValueError:
         st.error("⚠️ drivers.csv must contain a 'driver_id' column")
         st.stop()
-
-    # Normalize column names
-    jobs_df.columns = [c.strip().lower() for c in jobs_df.columns]
-    col_map = {
-        "job_id": "job_id",
-        "pickup zone": "pickup_zone",
-        "dropoff zone": "dropoff_zone"
-    }
-    missing = [c for c in col_map.keys() if c not in jobs_df.columns]
-    if missing:
-        st.error(f"⚠️ jobs.csv must contain columns: {', '.join(col_map.keys())}")
+    try:
+        jobs_json = cached_records(jobs_file.getvalue(), "jobs", jobs_file.name)
+    except ValueError:
+        st.error("⚠️ jobs.csv must contain columns: job_id, pickup zone, dropoff zone")
         st.stop()
-
-    jobs_df = jobs_df.rename(columns=col_map)
-    jobs_json = jobs_df[["job_id", "pickup_zone", "dropoff_zone"]].to_dict(orient="records")
+    parse_seconds = time.perf_counter() - parse_start
 
     # ----------------- Token Counter -----------------
-    tokenizer_cache = {}
-    def count_tokens_exact(text, model="gpt-oss:20b"):
-        global tokenizer_cache
-        if model not in tokenizer_cache:
-            hf_model = "EleutherAI/gpt-neox-20b"
-            tokenizer_cache[model] = AutoTokenizer.from_pretrained(hf_model)
-        tokenizer = tokenizer_cache[model]
-        return len(tokenizer.encode(text, add_special_tokens=False))
+    # Tokenizers live in token_counter and load once per process
+    token_mode = st.radio(
+        "Token count:",
+        ["estimate", "exact"],
+        horizontal=True,
+        help="estimate uses tiktoken and needs no model download; "
+             "exact uses the HF tokenizer (set TOKENIZER_DIR to load it offline).",
+    )
 
     # ----------------- Prompt -----------------
     default_prompt = "Assign jobs to drivers"
 
     user_prompt = st.text_area("Enter your prompt:", height=200, value=default_prompt)
-    final_prompt = f"""
-    Return ONLY a valid JSON object.
-    Do not include explanations.
-    Do not include markdown.
-    Do not include reasoning.
-    Do not include text before or after.
-    The response MUST be a single JSON object that matches the required format.
-
-    Format:
-    {{
-    "assignments": [
-        {{
-        "driver_id": "DR-001",
-        "jobs": [
-            {{"job_id":"JOB-1001","pickup_zone":"z1","dropoff_zone":"z6"}}
-        ]
-        }}
-    ]
-    }}
-
-    Rules:
-    - Each driver max 3 jobs.
-    - Next pickup_zone must equal previous dropoff_zone.
-    - Assign ALL jobs so none are left unassigned.
-
-    Data:
-    Drivers = {drivers_json}
-    Jobs = {jobs_json}
-
-    User Request: {user_prompt}
-    """
+    prompt_format = st.selectbox(
+        "Prompt data format:",
+        FORMATS,
+        index=FORMATS.index(DEFAULT_FORMAT),
+        help="csv sends header-once tables with only the columns the rules need; "
+             "csv_interned also replaces zone names with numbers.",
+    )
+    output = st.selectbox(
+        "Model output:",
+        OUTPUTS,
+        index=OUTPUTS.index(DEFAULT_OUTPUT),
+        help="ids has the model list job IDs only, enforced by a JSON schema, and fills in "
+             "zones from the uploaded jobs; jobs has it echo every job's zones.",
+    )
+    prompt_start = time.perf_counter()
+    prompt_prefix, prompt_data, zones = build_prompt_parts(
+        drivers_json, jobs_json, user_prompt, fmt=prompt_format, output=output,
+    )
+    final_prompt = prompt_prefix + prompt_data
+    prompt_seconds = time.perf_counter() - prompt_start
+
+    # ----------------- Planning Engine -----------------
+    engine = st.radio(
+        "Planning engine:",
+        ["Local solver", "Min-deadhead optimizer", "Hybrid (solver + LLM)", "Sharded LLM", "Full LLM",
+         "Race backends", "Incremental re-plan"],
+        horizontal=True,
+        help="The local solver chains jobs by zone without calling a model. "
+             "The min-deadhead optimizer also joins chains across zones, keeping empty running low. "
+             "Hybrid only sends the jobs it could not place to the LLM. "
+             "Sharded splits jobs by zone component and calls the LLM per shard in parallel. "
+             "Race sends the full prompt to several backends and keeps the first valid plan. "
+             "Incremental keeps the last plan and only places added or freed jobs.",
+    )
+    LOCAL_ENGINES = ("Local solver", "Min-deadhead optimizer")
+    deadhead = None
+    if engine == "Min-deadhead optimizer":
+        deadhead_file = st.file_uploader(
+            "Upload deadhead.csv (from_zone, to_zone, cost)", type=["csv"],
+            help="Empty-running cost between zones; pairs listed one way apply both ways.",
+        )
+        try:
+            deadhead = load_deadhead(deadhead_file.getvalue() if deadhead_file else file_bytes("resources/Deadhead.csv"))
+        except ValueError as e:
+            st.error(f"⚠️ {e}")
+            st.stop()
+    # Backends are created once per process and keep their connections open
+    BACKEND_CHOICES = {
+        "Groq · openai/gpt-oss-20b": ("groq", "openai/gpt-oss-20b"),
+        "Local Ollama · gpt-oss:20b": ("ollama", "gpt-oss:20b"),
+        "Remote Mac Ollama · llama3.1:8b": ("remote", "llama3.1:8b"),
+    }
+    backend_label = st.selectbox(
+        "LLM backend:", list(BACKEND_CHOICES), disabled=engine in LOCAL_ENGINES + ("Race backends",),
+    )
+    backend_name, backend_model = BACKEND_CHOICES[backend_label]
+    race_labels = []
+    if engine == "Race backends":
+        race_labels = st.multiselect(
+            "Backends to race:", list(BACKEND_CHOICES), default=list(BACKEND_CHOICES),
+            help="Slower requests are cancelled as soon as one backend returns a valid plan.",
+        )
+        if not race_labels:
+            st.error("⚠️ Pick at least one backend to race")
+            st.stop()
+        # repairs go to the first raced backend; the winner replaces it below
+        backend_name, backend_model = BACKEND_CHOICES[race_labels[0]]
+    auto_repair = engine not in LOCAL_ENGINES and st.checkbox(
+        "Repair rule violations automatically", value=True,
+        help="Re-prompts with only the offending drivers and unassigned jobs.",
+    )
+    background = engine in ENGINE_KEYS and engine not in LOCAL_ENGINES and st.checkbox(
+        "Run in the background", value=False,
+        help="Queues the plan and polls for it, so the page stays usable; a refreshed page picks the result up again.",
+    )
+    stream_output = engine == "Full LLM" and not background and st.checkbox(
+        "Stream results as they are generated", value=True,
+        help="Shows each driver's jobs as soon as the model finishes them.",
+    )
+    previous_plan = (st.session_state.get("plan_result") or {}).get("plan")
+    lock_assigned_only = engine == "Incremental re-plan" and st.checkbox(
+        "Lock only jobs marked Assigned", value=False,
+        help="Off: every job of the last plan that still exists stays put. "
+             "On: only each driver's jobs up to the last one marked Assigned are locked.",
+    )
+    # Incremental results depend on the previous plan, so they are not cached
+    cacheable = engine not in LOCAL_ENGINES + ("Incremental re-plan",)
+
+    # Identifies these inputs for the plan cache and the session's last result
+    model_key = (
+        "race:" + ",".join(":".join(BACKEND_CHOICES[label]) for label in race_labels)
+        if race_labels else f"{backend_name}:{backend_model}"
+    )
+    cache_key = plan_key(
+        model_key, SAMPLING, build_prompt([], [], user_prompt, fmt=prompt_format, output=output)[0],
+        drivers_json, jobs_json, engine=engine, fmt=prompt_format,
+    )
 
     # ----------------- Run Assignment -----------------
-    if st.button("Run Job Assignment"):
+    run = None
+    clicked = st.button("Run Job Assignment")
+    if clicked and background:
+        task_id = get_plan_queue().submit(
+            drivers_json, jobs_json,
+            {
+                "engine": ENGINE_KEYS[engine], "backend": backend_name, "model": backend_model,
+                "prompt": user_prompt, "fmt": prompt_format, "output": output, "repair": auto_repair,
+                "deadhead": None,
+            },
+            key=cache_key,
+            meta={"engine": engine, "backend": backend_label, "drivers": len(drivers_json), "jobs": len(jobs_json)},
+        )
+        # in the URL, so a refresh or a shared link finds the task again
+        st.query_params["task"] = task_id
+    elif clicked:
+        st.query_params.pop("task", None)
         start_time = time.time()
-
-        prompt_tokens = count_tokens_exact(final_prompt, model="openai/gpt-oss-20b")
-        st.info(f"📊 Token length: {prompt_tokens} tokens")
+        # One request-log record per run; written once the results render
+        run = RunLog(
+            app="assignJob", engine=engine, backend=backend_name, model=backend_model,
+            fmt=prompt_format, drivers=len(drivers_json), jobs=len(jobs_json),
+        )
+        run.add("upload_parse", parse_seconds)
+        run.add("prompt_build", prompt_seconds)
 
         # --- Display time placeholder ---
         time_placeholder = st.empty()  # reserve a space to update later
 
-
-        with st.spinner("Generating job assignments..."):
-            completion = client.chat.completions.create(
-            model="openai/gpt-oss-20b",   # ✅ recommended replacement  openai/gpt-oss-20b  qwen/qwen3-32b
-            messages=[
-                {"role": "system", "content": "You are a JSON generator. Return ONLY valid JSON. No reasoning. No text. No markdown."},
-                {"role": "user", "content": final_prompt},
-            ],
-            temperature=0,             # ✅ deterministic
-            max_tokens=8192,           # ✅ keep smaller, avoids truncation
-            top_p=1,
-            stream=False,
-            response_format={"type": "json_object"},
-        )
-
-            # ---------- JSON Cleaning ----------
-            response_text = completion.choices[0].message.content
-            if not response_text or not response_text.strip():
-                st.error("⚠️ Model returned empty response")
-                st.json(completion.model_dump())  # 🔍 Debug entire API response
+        # --- Plan cache: identical inputs skip the LLM entirely ---
+        cache = get_plan_cache()
+        cached = cache.get(cache_key) if cacheable else None
+        backend = get_backend(backend_name, backend_model) if engine not in LOCAL_ENGINES else None
+
+        if cached is not None:
+            response_json = cached["plan"]
+            run.set(cache_hit=True)
+            st.info("🗄️ Cache hit: reused the stored plan for these files")
+        elif engine == "Local solver":
+            with run.stage("solve"):
+                response_json = solve_assignments(drivers_json, jobs_json)
+            if response_json["unassigned"]:
+                st.warning(
+                    f"⚠️ {len(response_json['unassigned'])} jobs could not be placed: "
+                    "the solver's zone chains outnumber the drivers"
+                )
+        elif engine == "Min-deadhead optimizer":
+            with run.stage("solve"):
+                response_json = optimize_assignments(drivers_json, jobs_json, deadhead)
+            st.info(f"🚚 Empty running: {response_json['deadhead_cost']:g}")
+            if response_json["unassigned"]:
+                st.warning(f"⚠️ {len(response_json['unassigned'])} jobs could not be placed: the optimizer's chains outnumber the drivers")
+        elif engine == "Incremental re-plan":
+            if previous_plan is None:
+                st.error("⚠️ Run a plan first: incremental re-planning starts from the last plan")
                 st.stop()
-
-            #st.text_area("🔍 Raw model output:", value=response_text, height=200)
-
-            # Strip all Markdown fences, if present
-            clean_text = re.sub(r"^```[a-zA-Z]*", "", response_text.strip(), flags=re.IGNORECASE|re.MULTILINE)
-            clean_text = re.sub(r"```$", "", clean_text.strip(), flags=re.MULTILINE).strip()
-
-            response_json = None
-            try:
-                response_json = json.loads(clean_text)
-            except json.JSONDecodeError:
-                # fallback: try to find any JSON object inside the text
-                match = re.search(r"\{[\s\S]*\}", response_text)
-                if match:
-                    try:
-                        response_json = json.loads(match.group(0))
-                    except json.JSONDecodeError:
-                        pass
-
+            committed = None
+            if lock_assigned_only:
+                # lock each chain up to its last job marked Assigned in the grid
+                assigned = st.session_state.get("assignJob_assigned", set())
+                committed = {}
+                for entry in previous_plan.get("assignments", []):
+                    ids = [job.get("job_id") for job in entry.get("jobs", [])]
+                    committed[entry.get("driver_id")] = max(
+                        (k + 1 for k, job_id in enumerate(ids) if job_id in assigned), default=0,
+                    )
+            with st.spinner("Placing new and freed jobs around the locked chains..."):
+                response_json, stages = plan_incremental(
+                    backend, previous_plan, drivers_json, jobs_json, user_prompt,
+                    committed=committed, fmt=prompt_format, run=run, output=output,
+                )
+            st.write("#### 📊 Stage breakdown")
+            st.dataframe(pd.DataFrame(stages), hide_index=True)
+            if response_json["unassigned"]:
+                st.warning(f"⚠️ {len(response_json['unassigned'])} jobs are still unassigned")
+        elif engine == "Hybrid (solver + LLM)":
+            with st.spinner("Chaining jobs locally, sending leftovers to the LLM..."):
+                response_json, stages = plan_hybrid(
+                    backend, drivers_json, jobs_json, user_prompt,
+                    count_tokens=lambda text: count_prompt_tokens("", text, model=backend_model, mode=token_mode),
+                    fmt=prompt_format, run=run, output=output,
+                )
+            st.write("#### 📊 Stage breakdown")
+            st.dataframe(pd.DataFrame(stages), hide_index=True)
+            if response_json["unassigned"]:
+                st.warning(f"⚠️ {len(response_json['unassigned'])} jobs are still unassigned")
+        elif engine == "Sharded LLM":
+            with st.spinner("Generating job assignments per zone shard..."):
+                response_json, shard_stats = plan_sharded(
+                    backend, drivers_json, jobs_json, user_prompt, fmt=prompt_format, run=run, output=output,
+                )
+            st.write("#### 📊 Shard breakdown")
+            st.dataframe(pd.DataFrame(shard_stats), hide_index=True)
+            if response_json["unassigned"]:
+                st.warning(f"⚠️ {len(response_json['unassigned'])} jobs are still unassigned")
+        elif engine == "Race backends":
+            racers = [get_backend(*BACKEND_CHOICES[label]) for label in race_labels]
+            with st.spinner(f"Racing {len(racers)} backends..."):
+                response_json, race = race_plan(
+                    racers, final_prompt, drivers_json, jobs_json, zones, output=output, run=run,
+                )
+            run.set(race={k: v for k, v in race.items() if k != "entrants"},
+                    race_status={f"{e['backend']}:{e['model']}": e["status"] for e in race["entrants"]})
+            st.write("#### 🏁 Race")
+            st.dataframe(pd.DataFrame(race["entrants"]), hide_index=True)
+            if race["winner"] is None:
+                st.warning("⚠️ No backend returned a valid plan")
+            else:
+                won = next(e for e in race["entrants"] if e["status"] == "won")
+                backend = get_backend(won["backend"], won["model"])
+                margin = ""
+                if race["margin"] is not None:
+                    at_least = "at least " if race["margin_at_least"] else ""
+                    margin = f", {at_least}{race['margin']:.2f} s ahead of the next"
+                st.info(f"🏁 {race['winner']} won in {race['winner_seconds']:.2f} s{margin}")
             if not response_json:
-                st.error("⚠️ No JSON object found in model output")
-                st.text_area("🚨 Debug raw response:", value=response_text, height=200)
+                run.fail("parse", "no backend returned a parsable plan")
+                run.write()
+                st.error("⚠️ No JSON object found in any backend's output")
                 st.stop()
-
-            # ---------- Display Results ----------
-            st.success("✅ Job assignment completed!")
-            rows = []
-            for driver in response_json.get("assignments", []):
-                driver_id = driver.get("driver_id")
-                for job in driver.get("jobs", []):
-                    rows.append({
-                        "Driver ID": driver_id,
-                        "Job ID": job.get("job_id"),
-                        "Pickup Zone": job.get("pickup_zone"),
-                        "Dropoff Zone": job.get("dropoff_zone"),
-                    })
-
-            df = pd.DataFrame(rows)
-            st.write("### Job Assignments")
-            header_cols = st.columns([2, 2, 2, 2, 1])
-            header_cols[0].write("**Driver ID**")
-            header_cols[1].write("**Job ID**")
-            header_cols[2].write("**Pickup Zone**")
-            header_cols[3].write("**Dropoff Zone**")
-            header_cols[4].write("**Action**")
-
-            for i, row in df.iterrows():
-                cols = st.columns([2, 2, 2, 2, 1])
-                cols[0].write(row["Driver ID"])
-                cols[1].write(row["Job ID"])
-                cols[2].write(row["Pickup Zone"])
-                cols[3].write(row["Dropoff Zone"])
-                if cols[4].button("Assign", key=f"assign_{i}"):
-                    st.success(f"✅ Assigned Job {row['Job ID']} to Driver {row['Driver ID']}")
+        else:
+            with run.stage("tokenization"):
+                prompt_tokens = count_prompt_tokens(prompt_prefix, prompt_data, model=backend_model, mode=token_mode)
+            st.info(f"📊 Token length: {prompt_tokens} tokens")
+
+            def continue_truncated(result):
+                # A cut-off answer keeps its complete drivers; the rest is asked for again
+                with st.spinner("Answer hit max_tokens, requesting the remaining jobs..."):
+                    plan, parts = continue_plan(
+                        backend, result, drivers_json, jobs_json, user_prompt, zones=zones,
+                        fmt=prompt_format, output=output, run=run,
+                    )
+                run.set(continuation_parts=len(parts))
+                st.write("#### ✂️ Continuation parts")
+                st.dataframe(pd.DataFrame(parts), hide_index=True)
+                return plan
+
+            if stream_output:
+                st.write("#### ⏳ Assignments so far")
+                live_placeholder = st.empty()
+                live_rows = []
+                jobs_by_id = job_index(jobs_json)
+
+                def show_driver(driver):
+                    driver = decode_plan({"assignments": [driver]}, zones, jobs_by_id)["assignments"][0]
+                    for job in driver.get("jobs", []):
+                        live_rows.append({
+                            "Driver ID": driver.get("driver_id"),
+                            "Job ID": job.get("job_id"),
+                            "Pickup Zone": job.get("pickup_zone"),
+                            "Dropoff Zone": job.get("dropoff_zone"),
+                        })
+                    live_placeholder.dataframe(pd.DataFrame(live_rows), hide_index=True)
+
+                response_json, response_text, result = request_plan_stream(
+                    backend, final_prompt, on_driver=show_driver, run=run, output=output,
+                )
+                if result.time_to_first_token is not None:
+                    st.info(
+                        f"⚡ First token after {result.time_to_first_token:.2f} s · "
+                        f"{result.completion_tokens} completion tokens · "
+                        f"{tokens_per_second(result) or 0:.1f} tokens/s"
+                    )
+                if is_truncated(result):
+                    response_json = continue_truncated(result)
+                elif not response_json:
+                    run.fail("parse", response_text)
+                    run.write()
+                    st.error("⚠️ No JSON object found in model output")
+                    st.text_area("🚨 Debug raw response:", value=response_text, height=200)
+                    st.stop()
+                else:
+                    response_json = decode_plan(response_json, zones, jobs_json)
+            else:
+                with st.spinner("Generating job assignments..."):
+                    response_json, response_text, result = request_plan(backend, final_prompt, run=run, output=output)
+
+                if is_truncated(result):
+                    response_json = continue_truncated(result)
+                else:
+                    if not response_text or not response_text.strip():
+                        run.fail("empty_response", result.finish_reason)
+                        run.write()
+                        st.error("⚠️ Model returned empty response")
+                        st.json(result.raw)  # 🔍 Debug entire API response
+                        st.stop()
+
+                    #st.text_area("🔍 Raw model output:", value=response_text, height=200)
+
+                    if not response_json:
+                        run.fail("parse", response_text)
+                        run.write()
+                        st.error("⚠️ No JSON object found in model output")
+                        st.text_area("🚨 Debug raw response:", value=response_text, height=200)
+                        st.stop()
+                    response_json = decode_plan(response_json, zones, jobs_json)
+
+        # ---------- Validation & Repair ----------
+        with run.stage("validation"):
+            report = validate_plan(response_json, drivers_json, jobs_json, deadhead=deadhead)
+        if not report["valid"] and auto_repair and cached is None:
+            with st.spinner(f"Repairing {len(report['violations'])} rule violations..."), run.stage("repair"):
+                response_json, report, repair_rounds = repair_plan(
+                    backend, response_json, drivers_json, jobs_json, user_prompt, fmt=prompt_format, output=output,
+                    deadhead=deadhead,
+                )
+            for repair_round in repair_rounds:
+                run.add_tokens(repair_round["prompt_tokens"], repair_round["completion_tokens"])
+            run.set(repair_rounds=len(repair_rounds))
+            if repair_rounds:
+                st.write("#### 🔧 Repair rounds")
+                st.dataframe(pd.DataFrame(repair_rounds), hide_index=True)
+        if not report["valid"]:
+            run.fail("validation", sorted({v["type"] for v in report["violations"]}))
+            run.set(violations=len(report["violations"]))
+            st.warning(f"⚠️ Plan breaks {len(report['violations'])} rules")
+            st.dataframe(pd.DataFrame(report["violations"]), hide_index=True)
+
+        # only plans that pass the rules are worth serving again
+        if cacheable and cached is None and report["valid"]:
+            cache.put(cache_key, {"plan": response_json})
+            st.info("🗄️ Cache miss: plan generated and stored")
+
+        st.success("✅ Job assignment completed!")
+        st.session_state["plan_result"] = {"key": cache_key, "plan": response_json}
+        if engine != "Incremental re-plan":
+            # locked jobs keep their Assigned marks across an incremental run
+            st.session_state.pop("assignJob_assigned", None)
 
         duration = time.time() - start_time
         if duration < 60:
             time_placeholder.info(f"⏱️ Completed in {duration:.2f} seconds")
         else:
             minutes = duration/60
-            time_placeholder.info(f"Completed in {minutes:.2f} minutes") 
-
-
+            time_placeholder.info(f"Completed in {minutes:.2f} minutes")
+
+    # ---------- Display Results ----------
+    result = st.session_state.get("plan_result")
+    if result and result["key"] == cache_key:
+        shown_key = result["key"]
+        render_start = time.perf_counter()
+        render_results(result["plan"], key="assignJob", plan_id=result["key"])
+        if run is not None:
+            run.add("render", time.perf_counter() - render_start)
+    if run is not None:
+        run.write()
+
+# ----------------- Background Task -----------------
+# Shown with or without uploads: after a refresh the task id in the URL is all there is
+task_id = st.query_params.get("task")
+if task_id:
+    queue = get_plan_queue()
+    task = queue.status(task_id)
+    if task is None:
+        st.warning(f"⚠️ Background task {task_id} is unknown or has expired")
+    elif task["status"] in ACTIVE:
+        @st.fragment(run_every=POLL_SECONDS)
+        def poll_task():
+            # only this block reruns while waiting; the page reruns once the task ends
+            current = queue.status(task_id)
+            if current is None or current["status"] not in ACTIVE:
+                st.rerun()
+            label = f"{current['meta'].get('engine')} · {current['meta'].get('backend')}"
+            if current["status"] == "queued":
+                st.info(f"🕒 Task {task_id} queued ({label}), {current['ahead']} ahead of it")
+                if st.button("Cancel task", key="cancel_task"):
+                    queue.cancel(task_id)
+                    st.rerun()
+            else:
+                st.info(f"⏳ Task {task_id} running for {time.time() - current['started']:.0f} s ({label})")
+
+        poll_task()
+    elif task["status"] == "failed":
+        st.error(f"⚠️ Background task {task_id} failed: {task['error']}")
+    elif task["status"] == "cancelled":
+        st.warning(f"⚠️ Background task {task_id} was cancelled")
+    else:
+        result, report = task["result"], task["result"]["report"]
+        if (st.session_state.get("plan_result") or {}).get("task") != task_id:
+            # picked up once; the upload section renders it when the inputs still match
+            st.session_state["plan_result"] = {"key": task["key"], "plan": result["plan"], "task": task_id}
+            st.session_state.pop("assignJob_assigned", None)
+            st.rerun()
+        st.success(f"✅ Background task {task_id} done in {task['finished'] - task['started']:.2f} seconds")
+        if result["cache_hit"]:
+            st.info("🗄️ Cache hit: reused the stored plan for these files")
+        if not report["valid"]:
+            st.warning(f"⚠️ Plan breaks {len(report['violations'])} rules")
+            st.dataframe(pd.DataFrame(report["violations"]), hide_index=True)
+        if shown_key != task["key"]:
+            render_results(result["plan"], key="assignJob", plan_id=task["key"])
@@ -0,0 +1,497 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+import httpx
+
+from rate_limit import get_rate_limiter
+
+# ----------------- Settings -----------------
+TIMEOUT = float(os.getenv("LLM_TIMEOUT", "600"))          # read timeout, seconds
+CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+RETRY_STATUS = {502, 503, 504}
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Sent on every request: a num_ctx that changes between calls reloads the
+# model and throws away the cached prompt prefix. 0 keeps the server default.
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "16384"))
+
+
+def ollama_base_url():
+    # OLLAMA_API holds the full chat URL in Job_Planner_API.py's .env
+    api = os.getenv("OLLAMA_API")
+    if api:
+        return api.split("/api/")[0]
+    return os.getenv("OLLAMA_HOST", "http://localhost:11434")
+
+
+# ----------------- Result -----------------
+@dataclass
+class LLMResult:
+    """What every backend returns, whatever the wire format."""
+    text: str
+    backend: str
+    model: str
+    prompt_tokens: int = None
+    completion_tokens: int = None
+    seconds: float = None
+    time_to_first_token: float = None
+    finish_reason: str = None
+    raw: dict = field(default_factory=dict, repr=False)
+
+
+class LLMStream:
+    """Iterate for text chunks; ``result`` is filled in once exhausted.
+
+    Use it in a ``with`` block so a consumer that stops early (a break, an
+    error while parsing, a Streamlit rerun) still closes it.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.result = None
+
+    def __iter__(self):
+        self.result = yield from self._chunks
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # Stops the generation early and releases the HTTP response
+        self._chunks.close()
+
+
+# ----------------- Backends -----------------
+class Backend:
+    name = "base"
+
+    def __init__(self, model, timeout=TIMEOUT, max_retries=MAX_RETRIES):
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    def complete(self, messages, json_mode=True, max_tokens=8192, **options):
+        raise NotImplementedError
+
+    async def acomplete(self, messages, json_mode=True, max_tokens=8192, **options):
+        raise NotImplementedError
+
+    def stream(self, messages, json_mode=True, max_tokens=8192, **options):
+        # Backends without native streaming hand back the whole text at once
+        def chunks():
+            result = self.complete(messages, json_mode=json_mode, max_tokens=max_tokens, **options)
+            yield result.text
+            return result
+        return LLMStream(chunks())
+
+
+class GroqBackend(Backend):
+    """Groq chat completions over the SDK's pooled clients.
+
+    Every call is admitted by a :class:`rate_limit.RateLimiter` shared by
+    all users of the model, so concurrent sessions and batch workers stay
+    inside the per-minute quota; a 429 waits out the server's reset before
+    it is retried. ``limiter=False`` leaves retries to the SDK instead.
+    """
+    name = "groq"
+
+    def __init__(self, model="openai/gpt-oss-20b", api_key=None, base_url=None, limiter=None, **kwargs):
+        super().__init__(model, **kwargs)
+        from groq import AsyncGroq, Groq
+
+        self.limiter = get_rate_limiter(f"groq:{model}") if limiter is None else limiter or None
+        # with a limiter the retries happen here, so each one is admitted too
+        sdk_retries = 0 if self.limiter else self.max_retries
+        timeout = httpx.Timeout(self.timeout, connect=CONNECT_TIMEOUT)
+        api_key = api_key or os.getenv("GROQ_API_KEY")
+        self.client = Groq(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=sdk_retries)
+        self.async_client = AsyncGroq(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=sdk_retries)
+
+    def request(self, messages, json_mode, max_tokens, options):
+        request = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": options.pop("temperature", 0),
+            "top_p": options.pop("top_p", 1),
+            "max_tokens": max_tokens,
+        }
+        schema = options.pop("schema", None)
+        if schema:
+            request["response_format"] = {"type": "json_schema", "json_schema": {"name": "plan", "schema": schema}}
+        elif json_mode:
+            request["response_format"] = {"type": "json_object"}
+        request.update(options)
+        return request
+
+    def retry_wait(self, error, attempt):
+        # Seconds before retrying ``error``, None to raise it
+        from groq import APIConnectionError, InternalServerError, RateLimitError
+
+        if isinstance(error, RateLimitError) and attempt < self.limiter.retries:
+            return self.limiter.backoff(attempt, error.response.headers)
+        if isinstance(error, (APIConnectionError, InternalServerError)) and attempt < self.max_retries:
+            return 2 ** attempt
+        return None
+
+    def create(self, request, stream=False):
+        """``(response, ticket, sent)``: the SDK response, its limiter booking
+        and when the request that succeeded was sent."""
+        if self.limiter is None:
+            return self.client.chat.completions.create(**request, stream=stream), None, time.time()
+        cost = self.limiter.cost(request["messages"], request["max_tokens"])
+        attempt = 0
+        while True:
+            wait, ticket = self.limiter.admit(cost)
+            try:
+                time.sleep(wait)
+                if ticket is None:
+                    continue
+                sent = time.time()
+                raw = self.client.chat.completions.with_raw_response.create(**request, stream=stream)
+            except BaseException as e:
+                if not isinstance(e, Exception):
+                    # interrupted: the request may have gone out, so it stays booked
+                    self.limiter.settle(ticket, None)
+                    raise
+                self.limiter.refund(ticket)
+                wait = self.retry_wait(e, attempt)
+                if wait is None:
+                    raise
+                attempt += 1
+                time.sleep(wait)
+                continue
+            self.limiter.observe(raw.headers)
+            return raw.parse(), ticket, sent
+
+    async def acreate(self, request):
+        if self.limiter is None:
+            return await self.async_client.chat.completions.create(**request, stream=False), None, time.time()
+        cost = self.limiter.cost(request["messages"], request["max_tokens"])
+        attempt = 0
+        while True:
+            wait, ticket = self.limiter.admit(cost)
+            try:
+                await asyncio.sleep(wait)
+                if ticket is None:
+                    continue
+                sent = time.time()
+                raw = await self.async_client.chat.completions.with_raw_response.create(**request, stream=False)
+            except BaseException as e:
+                if not isinstance(e, Exception):
+                    # a cancelled race may have sent it already, so it stays booked
+                    self.limiter.settle(ticket, None)
+                    raise
+                self.limiter.refund(ticket)
+                wait = self.retry_wait(e, attempt)
+                if wait is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(wait)
+                continue
+            self.limiter.observe(raw.headers)
+            return await raw.parse(), ticket, sent
+
+    def settle(self, ticket, result):
+        if ticket is not None and result.prompt_tokens is not None:
+            self.limiter.settle(ticket, result.prompt_tokens + (result.completion_tokens or 0))
+
+    def to_result(self, completion, seconds):
+        choice = completion.choices[0]
+        usage = getattr(completion, "usage", None)
+        return LLMResult(
+            text=choice.message.content or "",
+            backend=self.name,
+            model=self.model,
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+            seconds=seconds,
+            finish_reason=choice.finish_reason,
+            raw=completion.model_dump(),
+        )
+
+    def complete(self, messages, json_mode=True, max_tokens=8192, **options):
+        completion, ticket, start = self.create(self.request(messages, json_mode, max_tokens, options))
+        result = self.to_result(completion, time.time() - start)
+        self.settle(ticket, result)
+        return result
+
+    async def acomplete(self, messages, json_mode=True, max_tokens=8192, **options):
+        completion, ticket, start = await self.acreate(self.request(messages, json_mode, max_tokens, options))
+        result = self.to_result(completion, time.time() - start)
+        self.settle(ticket, result)
+        return result
+
+    def stream(self, messages, json_mode=True, max_tokens=8192, **options):
+        def chunks():
+            first_token = None
+            parts = []
+            usage = None
+            finish_reason = None
+            stream, ticket, start = self.create(self.request(messages, json_mode, max_tokens, options), stream=True)
+            try:
+                for chunk in stream:
+                    # Groq puts usage on the last chunk under x_groq
+                    x_groq = getattr(chunk, "x_groq", None)
+                    usage = getattr(x_groq, "usage", None) or getattr(chunk, "usage", None) or usage
+                    if not chunk.choices:
+                        continue
+                    finish_reason = chunk.choices[0].finish_reason or finish_reason
+                    content = chunk.choices[0].delta.content
+                    if not content:
+                        continue
+                    if first_token is None:
+                        first_token = time.time() - start
+                    parts.append(content)
+                    yield content
+            except BaseException:
+                # stopped early: no usage arrives, so the whole booking stays spent
+                stream.close()
+                if ticket is not None:
+                    self.limiter.settle(ticket, None)
+                raise
+            result = LLMResult(
+                text="".join(parts),
+                backend=self.name,
+                model=self.model,
+                prompt_tokens=getattr(usage, "prompt_tokens", None),
+                # chunk count stands in for tokens when no usage was sent
+                completion_tokens=getattr(usage, "completion_tokens", None) or len(parts),
+                seconds=time.time() - start,
+                time_to_first_token=first_token,
+                finish_reason=finish_reason,
+            )
+            self.settle(ticket, result)
+            return result
+        return LLMStream(chunks())
+
+
+class OllamaBackend(Backend):
+    """Ollama /api/chat over keep-alive httpx clients.
+
+    The model stays loaded for ``keep_alive`` with a fixed ``num_ctx``, so a
+    prompt that starts like the previous one reuses its KV cache and only
+    the new tail is evaluated.
+    """
+    name = "ollama"
+
+    def __init__(self, model="gpt-oss:20b", base_url=None, keep_alive=OLLAMA_KEEP_ALIVE,
+                 num_ctx=OLLAMA_NUM_CTX, **kwargs):
+        super().__init__(model, **kwargs)
+        self.keep_alive = keep_alive
+        self.num_ctx = num_ctx
+        self.base_url = base_url or ollama_base_url()
+        self.client = None
+        self.async_client = None
+        self.lock = threading.Lock()
+
+    def url(self):
+        return self.base_url
+
+    async def aurl(self):
+        return self.url()
+
+    def get_client(self):
+        base_url = self.url()
+        with self.lock:
+            if self.client is None or str(self.client.base_url).rstrip("/") != base_url.rstrip("/"):
+                self.client = httpx.Client(
+                    base_url=base_url,
+                    timeout=httpx.Timeout(self.timeout, connect=CONNECT_TIMEOUT),
+                    transport=httpx.HTTPTransport(retries=self.max_retries),
+                )
+        return self.client
+
+    def get_async_client(self, base_url):
+        # httpx async clients are bound to the loop that created them
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            if self.async_client is None or self.async_client[0] is not loop \
+                    or str(self.async_client[1].base_url).rstrip("/") != base_url.rstrip("/"):
+                self.async_client = (loop, httpx.AsyncClient(
+                    base_url=base_url,
+                    timeout=httpx.Timeout(self.timeout, connect=CONNECT_TIMEOUT),
+                    transport=httpx.AsyncHTTPTransport(retries=self.max_retries),
+                ))
+        return self.async_client[1]
+
+    def payload(self, messages, json_mode, max_tokens, options, stream):
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": stream,
+            "keep_alive": options.pop("keep_alive", self.keep_alive),
+            "options": {
+                "temperature": options.pop("temperature", 0),
+                "top_p": options.pop("top_p", 1),
+                "num_predict": max_tokens,
+                **({"num_ctx": self.num_ctx} if self.num_ctx else {}),
+                **options.pop("options", {}),
+            },
+        }
+        # a JSON schema goes in as Ollama's structured-output format
+        schema = options.pop("schema", None)
+        fmt = options.pop("format", schema or ("json" if json_mode else None))
+        if fmt:
+            payload["format"] = fmt
+        payload.update(options)
+        return payload
+
+    def to_result(self, text, final, seconds, first_token=None):
+        return LLMResult(
+            text=text,
+            backend=self.name,
+            model=self.model,
+            prompt_tokens=final.get("prompt_eval_count"),
+            completion_tokens=final.get("eval_count"),
+            seconds=seconds,
+            time_to_first_token=first_token,
+            finish_reason=final.get("done_reason"),
+            raw=final,
+        )
+
+    def post(self, payload):
+        # Connection errors are retried by the transport, busy servers here
+        for attempt in range(self.max_retries + 1):
+            response = self.get_client().post("/api/chat", json=payload)
+            if response.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                response.raise_for_status()
+                return response.json()
+            time.sleep(2 ** attempt)
+
+    async def apost(self, payload):
+        for attempt in range(self.max_retries + 1):
+            client = self.get_async_client(await self.aurl())
+            response = await client.post("/api/chat", json=payload)
+            if response.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                response.raise_for_status()
+                return response.json()
+            await asyncio.sleep(2 ** attempt)
+
+    def complete(self, messages, json_mode=True, max_tokens=8192, **options):
+        start = time.time()
+        final = self.post(self.payload(messages, json_mode, max_tokens, options, stream=False))
+        return self.to_result(final.get("message", {}).get("content", ""), final, time.time() - start)
+
+    async def acomplete(self, messages, json_mode=True, max_tokens=8192, **options):
+        start = time.time()
+        final = await self.apost(self.payload(messages, json_mode, max_tokens, options, stream=False))
+        return self.to_result(final.get("message", {}).get("content", ""), final, time.time() - start)
+
+    def stream(self, messages, json_mode=True, max_tokens=8192, **options):
+        payload = self.payload(messages, json_mode, max_tokens, options, stream=True)
+
+        def chunks():
+            start = time.time()
+            first_token = None
+            parts = []
+            final = {}
+            with self.get_client().stream("POST", "/api/chat", json=payload) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    obj = json.loads(line)
+                    content = obj.get("message", {}).get("content")
+                    if content:
+                        if first_token is None:
+                            first_token = time.time() - start
+                        parts.append(content)
+                        yield content
+                    if obj.get("done"):
+                        final = obj
+                        break
+            return self.to_result("".join(parts), final, time.time() - start, first_token)
+        return LLMStream(chunks())
+
+
+class RemoteOllamaBackend(OllamaBackend):
+    """Ollama on the remote Mac, reached through the shared SSH port-forward."""
+    name = "remote"
+
+    def __init__(self, model="llama3.1:8b", **kwargs):
+        super().__init__(model, base_url="", **kwargs)
+
+    def url(self):
+        from remote_ollama import get_remote_ollama
+
+        remote = get_remote_ollama()
+        remote.ensure_connected()
+        return remote.base_url
+
+    async def aurl(self):
+        # the SSH connect and tunnel setup block, so keep them off the event loop
+        return await asyncio.to_thread(self.url)
+
+
+class LimitedBackend:
+    """``backend`` with every request made while holding ``limiter``.
+
+    Caps the requests in flight to one backend however they are issued,
+    including the shards a single sharded plan sends at once; anything
+    else is passed through to the wrapped backend.
+    """
+
+    def __init__(self, backend, limiter):
+        self.backend = backend
+        self.limiter = limiter
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def complete(self, *args, **kwargs):
+        with self.limiter:
+            return self.backend.complete(*args, **kwargs)
+
+    async def acomplete(self, *args, **kwargs):
+        # a thread waits for the slot so the event loop does not
+        acquiring = asyncio.ensure_future(asyncio.to_thread(self.limiter.acquire))
+        try:
+            await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # the thread goes on to take the slot; hand it back when it does
+            acquiring.add_done_callback(self.release_abandoned)
+            raise
+        try:
+            return await self.backend.acomplete(*args, **kwargs)
+        finally:
+            self.limiter.release()
+
+    def release_abandoned(self, acquiring):
+        if not acquiring.cancelled() and acquiring.exception() is None:
+            self.limiter.release()
+
+    def stream(self, *args, **kwargs):
+        def chunks():
+            with self.limiter:
+                stream = self.backend.stream(*args, **kwargs)
+                yield from stream
+                return stream.result
+        return LLMStream(chunks())
+
+
+# ----------------- Registry -----------------
+BACKENDS = {
+    "groq": GroqBackend,
+    "ollama": OllamaBackend,
+    "remote": RemoteOllamaBackend,
+}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_backend(name, model=None, **kwargs):
+    """Process-wide backend instances, so connection pools are reused."""
+    key = (name, model, tuple(sorted(kwargs.items())))
+    with _instances_lock:
+        if key not in _instances:
+            cls = BACKENDS[name]
+            _instances[key] = cls(model=model, **kwargs) if model else cls(**kwargs)
+        return _instances[key]
@@ -0,0 +1,299 @@
+"""Plan every depot in a directory without the Streamlit UI.
+
+A depot is either a sub-folder holding drivers.{csv,parquet,json} and
+jobs.{csv,parquet,json}, or a pair of files named <depot>_drivers.* and
+<depot>_jobs.*. Each depot gets <out>/<depot>.assignments.json; the run
+ends with <out>/summary.json and <out>/summary.csv.
+
+Usage: python batch_plan.py DEPOTS_DIR [--out DIR] [--engine hybrid]
+       [--backend groq] [--model MODEL] [--workers 8] [--pool thread]
+       [--backend-limit N] [--prompt TEXT] [--format csv] [--no-repair]
+       [--deadhead resources/Deadhead.csv] [--output-format ids]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from backends import LimitedBackend, get_backend
+from ingest import cached_records, file_bytes
+from optimizer import load_deadhead, optimize_assignments
+from plan_cache import get_plan_cache, plan_key
+from planning import (
+    DEFAULT_OUTPUT, OUTPUTS, SAMPLING, build_prompt, continue_plan, decode_plan, is_truncated, plan_hybrid,
+    request_plan,
+)
+from prompt_encoder import DEFAULT_FORMAT, FORMATS
+from request_log import RunLog
+from sharding import plan_sharded
+from solver import normalize_job, solve_assignments
+from validator import repair_plan, validate_plan
+
+# Same labels as assignJob.py, so both share plan cache entries
+ENGINES = {
+    "local": "Local solver",
+    "optimizer": "Min-deadhead optimizer",
+    "hybrid": "Hybrid (solver + LLM)",
+    "sharded": "Sharded LLM",
+    "full": "Full LLM",
+}
+DEFAULT_MODELS = {"groq": "openai/gpt-oss-20b", "ollama": "gpt-oss:20b", "remote": "llama3.1:8b"}
+# Requests in flight to one backend at a time; a local GPU serves one
+BACKEND_LIMITS = {"groq": 4, "ollama": 1, "remote": 1}
+DATA_EXTENSIONS = (".csv", ".parquet", ".json")
+LOCAL_ENGINES = ("local", "optimizer")
+
+
+# ----------------- Depot Discovery -----------------
+def find_depots(directory):
+    """Return ``[(depot, drivers_path, jobs_path)]`` sorted by depot name."""
+    depots = {}
+
+    def add(name, kind, path):
+        depots.setdefault(name, {})[kind] = path
+
+    for entry in sorted(os.listdir(directory)):
+        path = os.path.join(directory, entry)
+        if os.path.isdir(path):
+            for sub in sorted(os.listdir(path)):
+                stem, ext = os.path.splitext(sub)
+                if ext.lower() in DATA_EXTENSIONS and stem.lower() in ("drivers", "jobs"):
+                    add(entry, stem.lower(), os.path.join(path, sub))
+            continue
+        stem, ext = os.path.splitext(entry)
+        match = re.match(r"(.+?)[_-](drivers|jobs)$", stem, re.IGNORECASE)
+        if ext.lower() in DATA_EXTENSIONS and match:
+            add(match.group(1), match.group(2).lower(), path)
+
+    return [(name, files["drivers"], files["jobs"])
+            for name, files in sorted(depots.items()) if {"drivers", "jobs"} <= files.keys()]
+
+
+def read_records(path, kind):
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    # CSV/Parquet go through the same ingestion as assignJob.py's uploads
+    with open(path, "rb") as f:
+        return cached_records(f.read(), kind, path)
+
+
+def load_depot(drivers_path, jobs_path):
+    drivers = read_records(drivers_path, "drivers")
+    if any("driver_id" not in d for d in drivers):
+        raise ValueError(f"{drivers_path} must contain a 'driver_id' column")
+    drivers_json = [{"driver_id": d["driver_id"]} for d in drivers]
+    jobs_json = [normalize_job(j) for j in read_records(jobs_path, "jobs")]
+    return drivers_json, jobs_json
+
+
+# ----------------- Planning -----------------
+def run_engine(engine, backend, drivers_json, jobs_json, user_prompt, fmt, run, deadhead=None, output=DEFAULT_OUTPUT):
+    if engine == "local":
+        return solve_assignments(drivers_json, jobs_json)
+    if engine == "optimizer":
+        return optimize_assignments(drivers_json, jobs_json, deadhead)
+    if engine == "hybrid":
+        plan, _ = plan_hybrid(backend, drivers_json, jobs_json, user_prompt, fmt=fmt, run=run, output=output)
+        return plan
+    if engine == "sharded":
+        plan, _ = plan_sharded(backend, drivers_json, jobs_json, user_prompt, fmt=fmt, run=run, output=output)
+        return plan
+    with run.stage("prompt_build"):
+        prompt, zones = build_prompt(drivers_json, jobs_json, user_prompt, fmt=fmt, output=output)
+    plan, response_text, result = request_plan(backend, prompt, run=run, output=output)
+    if is_truncated(result):
+        plan, _ = continue_plan(
+            backend, result, drivers_json, jobs_json, user_prompt, zones=zones, fmt=fmt, output=output, run=run,
+        )
+        return plan
+    if not plan:
+        raise ValueError(f"no JSON object in model output (finish_reason={result.finish_reason})")
+    return decode_plan(plan, zones, jobs_json)
+
+
+def plan_records(drivers_json, jobs_json, options, run, limiter=None):
+    """Plan loaded records with ``options``: cache, engine, validation, repair.
+
+    ``limiter`` is held around every single backend request, so engines
+    that make none never wait for it. Returns ``(plan, report,
+    info)``; ``info`` holds ``cache_hit`` and ``repair_rounds`` (None when no
+    repair was attempted).
+    """
+    engine, backend_name, model = options["engine"], options["backend"], options["model"]
+    cache = get_plan_cache() if engine not in LOCAL_ENGINES else None
+    key = plan_key(
+        f"{backend_name}:{model}", SAMPLING,
+        build_prompt([], [], options["prompt"], fmt=options["fmt"], output=options["output"])[0],
+        drivers_json, jobs_json, engine=ENGINES[engine], fmt=options["fmt"],
+    )
+    cached = cache.get(key) if cache is not None else None
+    backend = get_backend(backend_name, model) if engine not in LOCAL_ENGINES else None
+    if backend is not None and limiter is not None:
+        backend = LimitedBackend(backend, limiter)
+    # read per call so process-pool workers need no shared state
+    deadhead = load_deadhead(file_bytes(options["deadhead"])) if engine == "optimizer" else None
+
+    if cached is not None:
+        plan = cached["plan"]
+        run.set(cache_hit=True)
+    else:
+        plan = run_engine(
+            engine, backend, drivers_json, jobs_json, options["prompt"], options["fmt"], run, deadhead,
+            options["output"],
+        )
+
+    with run.stage("validation"):
+        report = validate_plan(plan, drivers_json, jobs_json, deadhead=deadhead)
+    repair_rounds = None
+    if not report["valid"] and options["repair"] and backend is not None and cached is None:
+        with run.stage("repair"):
+            plan, report, rounds = repair_plan(
+                backend, plan, drivers_json, jobs_json, options["prompt"], fmt=options["fmt"],
+                output=options["output"], deadhead=deadhead,
+            )
+        for repair_round in rounds:
+            run.add_tokens(repair_round["prompt_tokens"], repair_round["completion_tokens"])
+        repair_rounds = len(rounds)
+    if cache is not None and cached is None and report["valid"]:
+        cache.put(key, {"plan": plan})
+    if not report["valid"]:
+        run.fail("validation", sorted({v["type"] for v in report["violations"]}))
+    return plan, report, {"cache_hit": cached is not None, "repair_rounds": repair_rounds}
+
+
+def plan_depot(depot, options, limiter=None):
+    """Plan one depot and write its assignments file; return its summary row."""
+    name, drivers_path, jobs_path = depot
+    engine, backend_name, model = options["engine"], options["backend"], options["model"]
+    run = RunLog(app="batch", depot=name, engine=ENGINES[engine], backend=backend_name, model=model)
+    row = {"depot": name, "engine": engine, "backend": backend_name, "model": model, "error": None}
+    start = time.time()
+    try:
+        with run.stage("upload_parse"):
+            drivers_json, jobs_json = load_depot(drivers_path, jobs_path)
+        row.update(drivers=len(drivers_json), jobs=len(jobs_json))
+        run.set(drivers=len(drivers_json), jobs=len(jobs_json))
+
+        plan, report, info = plan_records(drivers_json, jobs_json, options, run, limiter)
+        if info["repair_rounds"] is not None:
+            row["repair_rounds"] = info["repair_rounds"]
+
+        path = os.path.join(options["out"], f"{name}.assignments.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(plan, f, indent=2)
+
+        row.update(
+            assigned=sum(len(a.get("jobs", [])) for a in plan.get("assignments", [])),
+            unassigned=len(report["unassigned"]),
+            valid=report["valid"],
+            violations=len(report["violations"]),
+            cache_hit=info["cache_hit"],
+            output=path,
+        )
+    except Exception as e:
+        run.fail("error", e)
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["prompt_tokens"] = run.record["prompt_tokens"]
+    row["completion_tokens"] = run.record["completion_tokens"]
+    row["seconds"] = round(time.time() - start, 3)
+    run.write()
+    return row
+
+
+def plan_all(depots, options, workers=4, pool="thread", backend_limit=None):
+    """Plan ``depots`` concurrently; at most ``backend_limit`` requests reach the backend at once."""
+    limit = backend_limit or BACKEND_LIMITS.get(options["backend"], 1)
+    if pool == "process":
+        # Backends are rebuilt in each worker; the semaphore lives in a manager
+        manager = multiprocessing.Manager()
+        limiter = manager.BoundedSemaphore(limit)
+        executor = ProcessPoolExecutor(max_workers=workers)
+    else:
+        manager = None
+        limiter = threading.BoundedSemaphore(limit)
+        executor = ThreadPoolExecutor(max_workers=workers)
+
+    rows = []
+    try:
+        with executor:
+            futures = {executor.submit(plan_depot, depot, options, limiter): depot for depot in depots}
+            for future in as_completed(futures):
+                row = future.result()
+                status = row["error"] or f"{row.get('assigned', 0)}/{row.get('jobs', 0)} jobs, valid={row.get('valid')}"
+                print(f"[{len(rows) + 1}/{len(depots)}] {row['depot']}: {status} ({row['seconds']:.1f}s)")
+                rows.append(row)
+    finally:
+        if manager is not None:
+            manager.shutdown()
+    return sorted(rows, key=lambda r: r["depot"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("depots_dir")
+    parser.add_argument("--out", default="batch_output")
+    parser.add_argument("--engine", choices=list(ENGINES), default="hybrid")
+    parser.add_argument("--backend", choices=list(DEFAULT_MODELS), default="groq")
+    parser.add_argument("--model", help="default depends on --backend")
+    parser.add_argument("--workers", type=int, default=8, help="depots planned at once")
+    parser.add_argument("--pool", choices=["thread", "process"], default="thread")
+    parser.add_argument("--backend-limit", type=int, help="requests in flight to the backend at once")
+    parser.add_argument("--prompt", default="Assign jobs to drivers")
+    parser.add_argument("--format", choices=FORMATS, default=DEFAULT_FORMAT)
+    parser.add_argument("--output-format", choices=OUTPUTS, default=DEFAULT_OUTPUT,
+                        help="ids: the model lists job IDs only and zones are filled in locally")
+    parser.add_argument("--no-repair", action="store_true")
+    parser.add_argument("--deadhead", default="resources/Deadhead.csv",
+                        help="from_zone,to_zone,cost table for --engine optimizer")
+    args = parser.parse_args()
+
+    load_dotenv()
+    depots = find_depots(args.depots_dir)
+    if not depots:
+        sys.exit(f"no drivers/jobs pairs found in {args.depots_dir}")
+    os.makedirs(args.out, exist_ok=True)
+
+    options = {
+        "engine": args.engine,
+        "backend": args.backend,
+        "model": args.model or DEFAULT_MODELS[args.backend],
+        "prompt": args.prompt,
+        "fmt": args.format,
+        "output": args.output_format,
+        "repair": not args.no_repair,
+        "deadhead": args.deadhead,
+        "out": args.out,
+    }
+    start = time.time()
+    rows = plan_all(depots, options, args.workers, args.pool, args.backend_limit)
+
+    failed = [r for r in rows if r["error"]]
+    summary = {
+        "depots": len(rows),
+        "failed": len(failed),
+        "invalid": sum(1 for r in rows if r.get("valid") is False),
+        "jobs": sum(r.get("jobs", 0) for r in rows),
+        "assigned": sum(r.get("assigned", 0) for r in rows),
+        "seconds": round(time.time() - start, 3),
+        **{k: v for k, v in options.items() if k != "out"},
+        "results": rows,
+    }
+    with open(os.path.join(args.out, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, default=str)
+    pd.DataFrame(rows).to_csv(os.path.join(args.out, "summary.csv"), index=False)
+    print(f"{summary['assigned']}/{summary['jobs']} jobs assigned across {len(rows)} depots "
+          f"in {summary['seconds']:.1f}s; {len(failed)} failed, {summary['invalid']} invalid")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
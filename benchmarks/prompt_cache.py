@@ -0,0 +1,105 @@
+"""Prompt-eval time on Ollama with the prompt prefix cached and not.
+
+Three request patterns, each run --runs times with generation capped at one
+token so only prompt evaluation is timed:
+
+  cold         a fresh nonce opens the system message, so nothing is reused
+  new_data     same rules prefix, a different upload each time
+  new_request  same prefix and upload, only the user request changes
+
+The warm patterns are primed with one unmeasured request. Needs a running
+Ollama (OLLAMA_HOST, or --backend remote for the SSH-tunnelled Mac).
+
+Usage: python -m benchmarks.prompt_cache [--backend ollama] [--model MODEL]
+       [--jobs 200] [--runs 3] [--format csv] [--output FILE]
+"""
+import argparse
+import json
+import statistics
+import time
+import uuid
+
+from backends import get_backend
+from benchmarks.synthetic import generate_drivers, generate_jobs
+from planning import SYSTEM_PROMPT, build_prompt
+from prompt_encoder import DEFAULT_FORMAT, FORMATS
+from solver import normalize_job
+
+MODES = ["cold", "new_data", "new_request"]
+DEFAULT_MODELS = {"ollama": "gpt-oss:20b", "remote": "llama3.1:8b"}
+
+
+def upload(n_jobs, seed):
+    drivers = [{"driver_id": d["driver_id"]} for d in generate_drivers(max(1, n_jobs // 2), seed=seed)]
+    jobs = [normalize_job(j) for j in generate_jobs(n_jobs, seed=seed)]
+    return drivers, jobs
+
+
+def measure(backend, system, prompt):
+    start = time.perf_counter()
+    result = backend.complete(
+        [{"role": "system", "content": system}, {"role": "user", "content": prompt}],
+        json_mode=False, max_tokens=1, temperature=0,
+    )
+    raw = result.raw
+    return {
+        "wall": time.perf_counter() - start,
+        # Ollama reports durations in nanoseconds
+        "prompt_eval": (raw.get("prompt_eval_duration") or 0) / 1e9,
+        "load": (raw.get("load_duration") or 0) / 1e9,
+        "evaluated_tokens": raw.get("prompt_eval_count"),
+    }
+
+
+def run_mode(backend, mode, n_jobs, runs, fmt):
+    drivers, jobs = upload(n_jobs, seed=0)
+    if mode != "cold":
+        measure(backend, SYSTEM_PROMPT, build_prompt(drivers, jobs, "Assign jobs to drivers", fmt=fmt)[0])
+
+    samples = []
+    for k in range(1, runs + 1):
+        system, request = SYSTEM_PROMPT, "Assign jobs to drivers"
+        if mode == "cold":
+            system = f"[{uuid.uuid4().hex}] {SYSTEM_PROMPT}"
+        elif mode == "new_data":
+            drivers, jobs = upload(n_jobs, seed=k)
+        else:
+            request = f"Assign jobs to drivers, plan {k}"
+        prompt, _ = build_prompt(drivers, jobs, request, fmt=fmt)
+        samples.append(measure(backend, system, prompt))
+    return {
+        "mode": mode,
+        "runs": runs,
+        "prompt_eval": statistics.median(s["prompt_eval"] for s in samples),
+        "wall": statistics.median(s["wall"] for s in samples),
+        "load": max(s["load"] for s in samples),
+        "evaluated_tokens": statistics.median(s["evaluated_tokens"] or 0 for s in samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=list(DEFAULT_MODELS), default="ollama")
+    parser.add_argument("--model", help="default depends on --backend")
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--format", choices=FORMATS, default=DEFAULT_FORMAT)
+    parser.add_argument("--output", help="also write the rows as JSON here")
+    args = parser.parse_args()
+
+    backend = get_backend(args.backend, args.model or DEFAULT_MODELS[args.backend])
+    rows = [run_mode(backend, mode, args.jobs, args.runs, args.format) for mode in MODES]
+
+    cold = rows[0]["prompt_eval"] or None
+    print(f"{'mode':<13}{'prompt eval s':>14}{'vs cold':>9}{'evaluated tok':>15}{'wall s':>9}{'load s':>9}")
+    for row in rows:
+        speedup = f"{cold / row['prompt_eval']:.1f}x" if cold and row["prompt_eval"] else "-"
+        print(f"{row['mode']:<13}{row['prompt_eval']:>14.3f}{speedup:>9}"
+              f"{row['evaluated_tokens']:>15.0f}{row['wall']:>9.3f}{row['load']:>9.3f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"backend": args.backend, "model": backend.model, "jobs": args.jobs, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
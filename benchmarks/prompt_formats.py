@@ -0,0 +1,46 @@
+"""Token cost of each prompt format on the sample (or given) jobs/drivers.
+
+Usage: python -m benchmarks.prompt_formats [drivers.csv jobs.csv] [--model MODEL]
+"""
+import argparse
+import json
+
+import pandas as pd
+
+from planning import build_prompt
+from prompt_encoder import FORMATS, encode_data
+from token_counter import count_tokens_exact
+
+
+def load_records(drivers_path, jobs_path):
+    drivers_df = pd.read_csv(drivers_path)
+    jobs_df = pd.read_csv(jobs_path)
+    jobs_df.columns = [c.strip().lower() for c in jobs_df.columns]
+    jobs_df = jobs_df.rename(columns={"pickup zone": "pickup_zone", "dropoff zone": "dropoff_zone"})
+    # the raw records, unused columns included, as Groq.py/Jobollama.py send them
+    return drivers_df.to_dict(orient="records"), jobs_df.to_dict(orient="records")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("drivers", nargs="?", default="resources/Drivers.csv")
+    parser.add_argument("jobs", nargs="?", default="resources/Jobs.csv")
+    parser.add_argument("--model", default="openai/gpt-oss-20b")
+    args = parser.parse_args()
+
+    drivers_json, jobs_json = load_records(args.drivers, args.jobs)
+
+    # Baseline: every column of every record inlined as JSON
+    raw = count_tokens_exact(f"Drivers = {json.dumps(drivers_json)}\nJobs = {json.dumps(jobs_json)}", model=args.model)
+    print(f"{'format':<14}{'data tokens':>12}{'vs raw':>8}{'prompt tokens':>15}")
+    print(f"{'raw records':<14}{raw:>12}{'':>8}{'':>15}")
+    for fmt in FORMATS:
+        drivers_text, jobs_text, _ = encode_data(drivers_json, jobs_json, fmt)
+        data = count_tokens_exact(f"Drivers = {drivers_text}\nJobs = {jobs_text}", model=args.model)
+        prompt, _ = build_prompt(drivers_json, jobs_json, "", fmt=fmt)
+        total = count_tokens_exact(prompt, model=args.model)
+        print(f"{fmt:<14}{data:>12}{1 - data / raw:>8.0%}{total:>15}")
+
+
+if __name__ == "__main__":
+    main()
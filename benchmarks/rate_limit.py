@@ -0,0 +1,185 @@
+"""Groq calls against a local stand-in that enforces a quota and answers 429s.
+
+The stand-in speaks Groq's /openai/v1/chat/completions and keeps a sliding
+--period window of requests and tokens (prompt plus completion). Over the
+limit it answers 429 with retry-after and x-ratelimit-* headers, as Groq
+does. The same --requests are sent from --concurrency threads twice:
+
+  sdk      no client limiter, the Groq SDK's own retries only
+  limiter  admitted through rate_limit.RateLimiter, learning the token
+           limit from the headers
+
+Usage: python -m benchmarks.rate_limit [--requests 80] [--concurrency 16]
+       [--rpm 20] [--tpm 6000] [--period 6] [--max-tokens 200] [--output FILE]
+"""
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backends import GroqBackend
+from rate_limit import RateLimiter
+
+MODES = ["sdk", "limiter"]
+REPLY = json.dumps({"assignments": []})
+
+
+# ----------------- Stand-in server -----------------
+class QuotaWindow:
+    """Requests and tokens served in the last ``period`` seconds."""
+
+    def __init__(self, rpm, tpm, period):
+        self.rpm, self.tpm, self.period = rpm, tpm, period
+        self.served = deque()   # (time, tokens)
+        self.lock = threading.Lock()
+        self.accepted = 0
+        self.rejected = 0
+
+    def take(self, tokens):
+        """None when admitted, else the seconds until it would be."""
+        with self.lock:
+            now = time.monotonic()
+            while self.served and self.served[0][0] <= now - self.period:
+                self.served.popleft()
+            count, used = len(self.served), sum(t for _, t in self.served)
+            if count >= self.rpm or used + tokens > self.tpm:
+                # until enough of the window has expired to fit this request
+                wait = 0.0
+                for at, t in self.served:
+                    if count < self.rpm and used + tokens <= self.tpm:
+                        break
+                    count, used, wait = count - 1, used - t, at + self.period - now
+                self.rejected += 1
+                return max(wait, 0.001)
+            self.served.append((now, tokens))
+            self.accepted += 1
+            return None
+
+    def headers(self):
+        with self.lock:
+            used = sum(t for _, t in self.served)
+            reset = self.served[0][0] + self.period - time.monotonic() if self.served else 0
+        return {
+            "x-ratelimit-limit-requests": str(self.rpm),
+            "x-ratelimit-remaining-requests": str(max(self.rpm - len(self.served), 0)),
+            "x-ratelimit-reset-requests": f"{max(reset, 0):.2f}s",
+            "x-ratelimit-limit-tokens": str(self.tpm),
+            "x-ratelimit-remaining-tokens": str(max(self.tpm - used, 0)),
+            "x-ratelimit-reset-tokens": f"{max(reset, 0):.2f}s",
+        }
+
+
+class MockGroq(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt_tokens = sum(len(m["content"]) for m in request["messages"]) // 4
+        completion_tokens = min(len(REPLY) // 4, request.get("max_tokens") or 0)
+        window = self.server.window
+        wait = window.take(prompt_tokens + completion_tokens)
+        if wait is not None:
+            self.reply(429, {"error": {"message": "Rate limit reached", "code": "rate_limit_exceeded"}},
+                       {"retry-after": f"{wait:.2f}", **window.headers()})
+            return
+        time.sleep(self.server.latency)
+        self.reply(200, {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": REPLY}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }, window.headers())
+
+    def reply(self, status, body, headers):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class MockServer(ThreadingHTTPServer):
+    # the default backlog of 5 drops connections of a burst, which then
+    # arrive a second late and skew the window
+    request_queue_size = 128
+
+
+def start_mock(rpm, tpm, period, latency):
+    server = MockServer(("127.0.0.1", 0), MockGroq)
+    server.window = QuotaWindow(rpm, tpm, period)
+    server.latency = latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ----------------- Benchmark -----------------
+def run_mode(mode, args):
+    server = start_mock(args.rpm, args.tpm, args.period, args.latency)
+    limiter = RateLimiter(rpm=args.rpm, tpm=0, period=args.period) if mode == "limiter" else False
+    backend = GroqBackend(
+        "mock", api_key="mock", base_url=f"http://127.0.0.1:{server.server_address[1]}", limiter=limiter,
+    )
+    prompt = "Assign jobs to drivers. " * (args.prompt_tokens // 5)
+
+    def call(k):
+        try:
+            backend.complete([{"role": "user", "content": f"{k} {prompt}"}], max_tokens=args.max_tokens)
+            return None
+        except Exception as e:
+            return type(e).__name__
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            errors = list(executor.map(call, range(args.requests)))
+    finally:
+        server.shutdown()
+    failed = [e for e in errors if e]
+    return {
+        "mode": mode,
+        "ok": len(errors) - len(failed),
+        "failed": len(failed),
+        "errors": sorted(set(failed)),
+        "served_429": server.window.rejected,
+        "seconds": round(time.perf_counter() - start, 3),
+        "client_wait": round(limiter.stats["waited"], 3) if limiter else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=80)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rpm", type=int, default=20, help="requests per --period on the stand-in")
+    parser.add_argument("--tpm", type=int, default=6000, help="tokens per --period on the stand-in")
+    parser.add_argument("--period", type=float, default=6.0, help="quota window in seconds (Groq: 60)")
+    parser.add_argument("--prompt-tokens", type=int, default=150)
+    parser.add_argument("--max-tokens", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the stand-in takes per answer")
+    parser.add_argument("--output", help="also write the rows as JSON here")
+    args = parser.parse_args()
+
+    rows = [run_mode(mode, args) for mode in MODES]
+    print(f"{'mode':<9}{'ok':>5}{'failed':>8}{'429s':>7}{'seconds':>9}{'client wait s':>15}")
+    for row in rows:
+        wait = f"{row['client_wait']:.1f}" if row["client_wait"] is not None else "-"
+        print(f"{row['mode']:<9}{row['ok']:>5}{row['failed']:>8}{row['served_429']:>7}{row['seconds']:>9.2f}{wait:>15}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
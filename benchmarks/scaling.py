@@ -0,0 +1,183 @@
+"""Time each planning stage at growing job counts; write a JSON report.
+
+The backend call goes over HTTP to a local stand-in for Ollama's /api/chat
+that answers with the local solver's plan, so the numbers cover the real
+request/response handling without a model in the loop.
+
+Usage: python -m benchmarks.scaling [--sizes 10 1000 10000 100000]
+       [--repeat N] [--output FILE] [--baseline FILE]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backends import OllamaBackend
+from benchmarks.synthetic import DRIVER_COLUMNS, JOB_COLUMNS, generate_drivers, generate_jobs, write_csv
+from ingest import parse_frame, to_records
+from planning import build_prompt, parse_plan_text, plan_messages
+from results_view import assignments_frame
+from solver import solve_assignments
+from token_counter import count_tokens_estimate
+from validator import validate_plan
+
+SIZES = [10, 1000, 10000, 100000]
+STAGES = ["load", "prompt", "tokens", "solve", "backend", "extract", "validate", "table"]
+REGRESSION = 1.25   # slower than baseline by this factor is flagged
+
+
+# ----------------- Mock backend -----------------
+class MockOllama(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    reply = ""
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = request["messages"][-1]["content"]
+        body = json.dumps({
+            "message": {"role": "assistant", "content": self.server.reply},
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": (len(prompt) + 3) // 4,
+            "eval_count": (len(self.server.reply) + 3) // 4,
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_mock():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockOllama)
+    server.reply = ""
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ----------------- Benchmark -----------------
+def run_once(n_jobs, server, backend, workdir):
+    drivers_path = os.path.join(workdir, "Drivers.csv")
+    jobs_path = os.path.join(workdir, "Jobs.csv")
+    write_csv(generate_drivers(max(1, n_jobs // 2)), DRIVER_COLUMNS, drivers_path)
+    write_csv(generate_jobs(n_jobs), JOB_COLUMNS, jobs_path)
+
+    timings = {}
+
+    def timed(stage, fn, *args):
+        start = time.perf_counter()
+        value = fn(*args)
+        timings[stage] = time.perf_counter() - start
+        return value
+
+    def load():
+        # the parse an upload in assignJob.py gets on a cache miss; the data is
+        # the same every --repeat, so going through the cache would time hits
+        with open(drivers_path, "rb") as f:
+            drivers = to_records(parse_frame(f.read(), "drivers", drivers_path))
+        with open(jobs_path, "rb") as f:
+            jobs = to_records(parse_frame(f.read(), "jobs", jobs_path))
+        return drivers, jobs
+
+    drivers_json, jobs_json = timed("load", load)
+    prompt, _ = timed("prompt", build_prompt, drivers_json, jobs_json, "")
+    prompt_tokens = timed("tokens", count_tokens_estimate, prompt)
+    solved = timed("solve", solve_assignments, drivers_json, jobs_json)
+    server.reply = json.dumps({"assignments": solved["assignments"]})
+    result = timed("backend", backend.complete, plan_messages(prompt))
+    plan = timed("extract", parse_plan_text, result.text)
+    report = timed("validate", validate_plan, plan, drivers_json, jobs_json)
+    df = timed("table", assignments_frame, plan)
+
+    return timings, {
+        "drivers": len(drivers_json),
+        "prompt_tokens": prompt_tokens,
+        "assigned": len(df),
+        "valid": report["valid"],
+    }
+
+
+def run(sizes, repeat):
+    server = start_mock()
+    backend = OllamaBackend("mock", base_url=f"http://127.0.0.1:{server.server_address[1]}", max_retries=0)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            for n_jobs in sizes:
+                runs = [run_once(n_jobs, server, backend, workdir) for _ in range(repeat)]
+                stages = {stage: statistics.median(t[stage] for t, _ in runs) for stage in STAGES}
+                results.append({
+                    "jobs": n_jobs,
+                    **runs[-1][1],
+                    "stages": stages,
+                    "total": sum(stages.values()),
+                })
+    finally:
+        server.shutdown()
+    return {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(report, baseline):
+    """Mark stages slower than the baseline by more than REGRESSION."""
+    previous = {row["jobs"]: row["stages"] for row in baseline.get("results", [])}
+    regressions = []
+    for row in report["results"]:
+        for stage, seconds in row["stages"].items():
+            before = previous.get(row["jobs"], {}).get(stage)
+            # sub-millisecond stages are too noisy to call
+            if before and seconds > 0.001 and seconds / before > REGRESSION:
+                regressions.append({"jobs": row["jobs"], "stage": stage, "before": before, "after": seconds})
+    return regressions
+
+
+def print_report(report, regressions):
+    flagged = {(r["jobs"], r["stage"]) for r in regressions}
+    print(f"{'jobs':>8}" + "".join(f"{stage:>10}" for stage in STAGES) + f"{'total':>10}")
+    for row in report["results"]:
+        cells = "".join(
+            f"{row['stages'][stage]:>9.3f}{'!' if (row['jobs'], stage) in flagged else ' '}" for stage in STAGES
+        )
+        print(f"{row['jobs']:>8}{cells}{row['total']:>10.3f}")
+    for r in regressions:
+        print(f"regression: {r['stage']} at {r['jobs']} jobs {r['before']:.3f}s -> {r['after']:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", default="benchmarks/scaling_report.json")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.repeat)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f))
+        report["regressions"] = regressions
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report, regressions)
+    print(f"report written to {args.output}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
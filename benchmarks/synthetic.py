@@ -0,0 +1,110 @@
+"""Seeded synthetic drivers/jobs in the resources/*.csv column layout.
+
+Usage: python -m benchmarks.synthetic JOBS [--drivers N] [--zones N]
+       [--chain-density P] [--days N] [--seed N] [--out-dir DIR]
+"""
+import argparse
+import csv
+import os
+import random
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+DRIVER_COLUMNS = ["driver_id", "name", "contact_number"]
+JOB_COLUMNS = [
+    "job_id", "pickup_location", "delivery_location", "pickup_datetime",
+    "delivery_datetime", "vehicle_registration", "Pickup Zone", "Dropoff Zone",
+]
+
+CITIES = [
+    "Leeds", "Manchester", "London", "Birmingham", "Liverpool", "Sheffield", "Nottingham",
+    "Derby", "Bristol", "Cardiff", "Glasgow", "Edinburgh", "Coventry", "Leicester", "Oxford",
+    "Reading", "Cambridge", "Norwich", "Southampton", "Portsmouth", "Newcastle", "York",
+]
+FIRST_NAMES = ["John", "Emily", "Michael", "Olivia", "Daniel", "Sophie", "James", "Charlotte", "Thomas", "Isla"]
+LAST_NAMES = ["Smith", "Johnson", "Brown", "Williams", "Taylor", "Anderson", "Wilson", "Moore", "Martin", "Thompson"]
+START = datetime(2025, 8, 8, 6, 0)
+
+
+def generate_drivers(n, seed=0):
+    rng = random.Random(seed)
+    width = max(3, len(str(n)))
+    return [
+        {
+            "driver_id": f"DR-{i:0{width}d}",
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "contact_number": f"+44 77{rng.randrange(100):02d} {rng.randrange(1000000):06d}",
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def location(rng, zone_number):
+    city = CITIES[zone_number % len(CITIES)]
+    return f"{city}, {city[:2].upper()}{rng.randrange(1, 30)} {rng.randrange(1, 10)}{rng.choice('ABDEFG')}{rng.choice('HJLNPQ')}"
+
+
+def generate_jobs(n, zones=15, chain_density=0.5, days=10, seed=0):
+    """``n`` jobs over ``zones`` zones and ``days`` days.
+
+    With probability ``chain_density`` a job picks up where an earlier job
+    dropped off, and no sooner than that job's delivery, so the data holds
+    real chains for the planner to find. Same seed, same jobs.
+    """
+    rng = random.Random(seed)
+    open_ends = []      # (dropoff zone, delivery time) of jobs a chain can extend
+    jobs = []
+    for i in range(n):
+        if open_ends and rng.random() < chain_density:
+            pickup_zone, earliest = open_ends.pop(rng.randrange(len(open_ends)))
+            pickup_at = earliest + timedelta(minutes=rng.randrange(15, 180, 15))
+        else:
+            pickup_zone = rng.randrange(1, zones + 1)
+            pickup_at = START + timedelta(days=rng.randrange(days), minutes=rng.randrange(0, 12 * 60, 15))
+        dropoff_zone = rng.randrange(1, zones + 1)
+        if zones > 1:
+            while dropoff_zone == pickup_zone:
+                dropoff_zone = rng.randrange(1, zones + 1)
+        delivery_at = pickup_at + timedelta(minutes=rng.randrange(60, 300, 15))
+        open_ends.append((dropoff_zone, delivery_at))
+
+        letters = "".join(rng.choice("ABCDEFGHJKLMNPRSTUVWXY") for _ in range(2))
+        jobs.append({
+            "job_id": f"JOB-{1001 + i}",
+            "pickup_location": location(rng, pickup_zone),
+            "delivery_location": location(rng, dropoff_zone),
+            "pickup_datetime": pickup_at.isoformat(),
+            "delivery_datetime": delivery_at.isoformat(),
+            "vehicle_registration": f"{letters}{rng.randrange(10, 100)}{letters}{letters[0]}",
+            "Pickup Zone": f"z{pickup_zone}",
+            "Dropoff Zone": f"z{dropoff_zone}",
+        })
+    return jobs
+
+
+def write_csv(records, columns, path):
+    pd.DataFrame(records, columns=columns).to_csv(path, index=False, quoting=csv.QUOTE_ALL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("jobs", type=int)
+    parser.add_argument("--drivers", type=int, help="default: one driver per two jobs")
+    parser.add_argument("--zones", type=int, default=15)
+    parser.add_argument("--chain-density", type=float, default=0.5)
+    parser.add_argument("--days", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out-dir", default=".")
+    args = parser.parse_args()
+
+    drivers = generate_drivers(args.drivers or max(1, args.jobs // 2), seed=args.seed)
+    jobs = generate_jobs(args.jobs, args.zones, args.chain_density, args.days, seed=args.seed)
+    os.makedirs(args.out_dir, exist_ok=True)
+    write_csv(drivers, DRIVER_COLUMNS, os.path.join(args.out_dir, "Drivers.csv"))
+    write_csv(jobs, JOB_COLUMNS, os.path.join(args.out_dir, "Jobs.csv"))
+    print(f"wrote {len(drivers)} drivers and {len(jobs)} jobs to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
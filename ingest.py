@@ -0,0 +1,171 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# ----------------- Settings -----------------
+# Parsed frames kept per process, keyed by file content
+CACHE_ENTRIES = int(os.getenv("INGEST_CACHE_ENTRIES", "16"))
+
+# Accepted spellings (lower-cased) of the columns the planner reads
+DRIVER_COLUMNS = {"driver_id": ["driver_id"]}
+JOB_COLUMNS = {
+    "job_id": ["job_id"],
+    "pickup_zone": ["pickup zone", "pickup_zone"],
+    "dropoff_zone": ["dropoff zone", "dropoff_zone"],
+}
+# Read when present; chaining then also checks pickup/delivery times
+OPTIONAL_JOB_COLUMNS = {
+    "pickup_datetime": ["pickup_datetime"],
+    "delivery_datetime": ["delivery_datetime"],
+}
+DTYPES = {
+    "driver_id": "string",
+    "job_id": "string",
+    "pickup_zone": "category",
+    "dropoff_zone": "category",
+    "pickup_datetime": "string",
+    "delivery_datetime": "string",
+}
+PARQUET_MAGIC = b"PAR1"
+
+
+# ----------------- Parsing -----------------
+def is_parquet(data, name=""):
+    return name.lower().endswith(".parquet") or data[:4] == PARQUET_MAGIC
+
+
+def source_columns(header, wanted, optional=None):
+    """Map each wanted column to its spelling in ``header``; raise if missing.
+
+    ``optional`` columns are mapped when the header has them.
+    """
+    lookup = {str(c).strip().lower(): c for c in header}
+    found, missing = {}, []
+    for column, spellings in {**wanted, **(optional or {})}.items():
+        match = next((lookup[s] for s in spellings if s in lookup), None)
+        if match is None:
+            if column in wanted:
+                missing.append(column)
+        else:
+            found[match] = column
+    if missing:
+        raise ValueError(f"missing columns: {', '.join(missing)}")
+    return found
+
+
+def read_frame(data, wanted, name="", optional=None):
+    """Parse CSV or Parquet ``data`` keeping only the ``wanted`` columns.
+
+    Unused columns (addresses, registrations) are never materialized: the
+    Parquet reader skips them and the Arrow CSV reader drops them while
+    parsing.
+    """
+    if is_parquet(data, name):
+        import pyarrow.parquet as pq
+
+        header = pq.ParquetFile(io.BytesIO(data)).schema_arrow.names
+        columns = source_columns(header, wanted, optional)
+        df = pd.read_parquet(io.BytesIO(data), columns=list(columns))
+    else:
+        header = pd.read_csv(io.BytesIO(data), nrows=0, encoding="utf-8-sig").columns
+        columns = source_columns(header, wanted, optional)
+        df = pd.read_csv(
+            io.BytesIO(data),
+            engine="pyarrow",
+            usecols=list(columns),
+            dtype={source: DTYPES[column] for source, column in columns.items()},
+        )
+    df = df.rename(columns=columns)[list(columns.values())]
+    return df.astype({c: DTYPES[c] for c in df.columns})
+
+
+# ----------------- Cache -----------------
+_frames = OrderedDict()
+_lock = threading.Lock()
+
+
+def content_key(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def parse_frame(data, kind, name=""):
+    """The ``kind`` ("drivers" or "jobs") frame of ``data``, parsed every call."""
+    wanted, optional = (DRIVER_COLUMNS, None) if kind == "drivers" else (JOB_COLUMNS, OPTIONAL_JOB_COLUMNS)
+    return read_frame(data, wanted, name, optional)
+
+
+def cached_frame(data, kind, name=""):
+    """Parsed ``kind`` ("drivers" or "jobs") frame for ``data``, LRU-cached.
+
+    Streamlit reruns the script on every widget click; the same upload hashes
+    to the same key, so it is parsed once. Callers must not mutate the frame.
+    """
+    key = (content_key(data), kind)
+    with _lock:
+        if key in _frames:
+            _frames.move_to_end(key)
+            return _frames[key]
+    df = parse_frame(data, kind, name)
+    with _lock:
+        _frames[key] = df
+        while len(_frames) > CACHE_ENTRIES:
+            _frames.popitem(last=False)
+    return df
+
+
+def load_drivers(data, name=""):
+    return cached_frame(data, "drivers", name)
+
+
+def load_jobs(data, name=""):
+    return cached_frame(data, "jobs", name)
+
+
+def column_values(series):
+    # blank cells come back as pd.NA or NaN; records carry None, like JSON null
+    values = series.tolist()
+    if series.hasnans:
+        values = [None if pd.isna(v) else v for v in values]
+    return values
+
+
+def to_records(df):
+    # Column-wise tolist() is several times faster than to_dict on
+    # categoricals, and categories come back as plain strings
+    columns = list(df.columns)
+    return [dict(zip(columns, row)) for row in zip(*(column_values(df[c]) for c in columns))]
+
+
+_records = OrderedDict()
+
+
+def cached_records(data, kind, name=""):
+    """``to_records`` of :func:`cached_frame`, cached the same way; read-only."""
+    key = (content_key(data), kind)
+    with _lock:
+        if key in _records:
+            _records.move_to_end(key)
+            return _records[key]
+    records = to_records(cached_frame(data, kind, name))
+    with _lock:
+        _records[key] = records
+        while len(_records) > CACHE_ENTRIES:
+            _records.popitem(last=False)
+    return records
+
+
+# ----------------- Files -----------------
+_file_bytes = {}
+
+
+def file_bytes(path):
+    """Bytes of a file on disk, read once per (path, mtime)."""
+    key = (path, os.path.getmtime(path))
+    if key not in _file_bytes:
+        with open(path, "rb") as f:
+            _file_bytes[key] = f.read()
+    return _file_bytes[key]
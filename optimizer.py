@@ -0,0 +1,306 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from solver import MAX_JOBS_PER_DRIVER, build_chains, job_time_columns, normalize_job
+
+# ----------------- Settings -----------------
+# Jobs per assignment block; the cost matrix is BLOCK_SIZE x BLOCK_SIZE
+BLOCK_SIZE = 2000
+DEADHEAD_COLUMNS = ["from_zone", "to_zone", "cost"]
+
+
+# ----------------- Deadhead Table -----------------
+class DeadheadTable:
+    """Empty-running cost between zones, as a dense NumPy matrix.
+
+    ``cost[a, b]`` is the cost of driving empty from zone ``a`` to zone
+    ``b``; ``inf`` means the hop is not allowed. Staying in a zone is free.
+    """
+
+    def __init__(self, zones, cost):
+        self.zones = list(zones)
+        self.index = {zone: i for i, zone in enumerate(self.zones)}
+        self.cost = cost
+
+    @classmethod
+    def from_records(cls, records, symmetric=True):
+        zones = sorted({str(r["from_zone"]) for r in records} | {str(r["to_zone"]) for r in records})
+        index = {zone: i for i, zone in enumerate(zones)}
+        cost = np.full((len(zones), len(zones)), np.inf)
+        for r in records:
+            a, b = index[str(r["from_zone"])], index[str(r["to_zone"])]
+            cost[a, b] = float(r["cost"])
+            # a table that lists one direction only is taken as symmetric
+            if symmetric and np.isinf(cost[b, a]):
+                cost[b, a] = float(r["cost"])
+        np.fill_diagonal(cost, 0)
+        return cls(zones, cost)
+
+    def covering(self, zones):
+        """This table, or a copy that also knows every zone in ``zones``.
+
+        Zones the table does not know get their own id with no hops in or
+        out. The copy is grown once for all of them, and the table itself,
+        shared between plans, is left as it is.
+        """
+        unknown = list(dict.fromkeys(str(z) for z in zones if str(z) not in self.index))
+        if not unknown:
+            return self
+        n = len(self.zones)
+        cost = np.full((n + len(unknown), n + len(unknown)), np.inf)
+        cost[:n, :n] = self.cost
+        new = np.arange(n, n + len(unknown))
+        cost[new, new] = 0
+        return DeadheadTable(self.zones + unknown, cost)
+
+    def zone_ids(self, zones):
+        # every zone must be known; see covering()
+        return np.array([self.index[str(zone)] for zone in zones], dtype=np.int64)
+
+    def hop(self, from_zone, to_zone):
+        a, b = self.index.get(str(from_zone)), self.index.get(str(to_zone))
+        if a is None or b is None:
+            return 0.0 if str(from_zone) == str(to_zone) else np.inf
+        return float(self.cost[a, b])
+
+
+def load_deadhead(data):
+    """Read a from_zone,to_zone,cost CSV (bytes or path) into a table."""
+    source = io.BytesIO(data) if isinstance(data, bytes) else data
+    df = pd.read_csv(source, encoding="utf-8-sig")
+    df.columns = [c.strip().lower() for c in df.columns]
+    missing = [c for c in DEADHEAD_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"deadhead table must contain columns: {', '.join(DEADHEAD_COLUMNS)}")
+    return DeadheadTable.from_records(df[DEADHEAD_COLUMNS].to_dict(orient="records"))
+
+
+# ----------------- Assignment -----------------
+def linear_sum_assignment(cost):
+    """Min-cost perfect assignment of a square matrix; returns ``(rows, cols)``.
+
+    Uses scipy when it is installed, else a NumPy shortest-augmenting-path
+    solver (the Jonker-Volgenant variant scipy implements) whose inner
+    relaxation is vectorized over columns.
+    """
+    try:
+        from scipy.optimize import linear_sum_assignment as scipy_lsa
+    except ImportError:
+        return _linear_sum_assignment(np.asarray(cost, dtype=float))
+    return scipy_lsa(cost)
+
+
+def _linear_sum_assignment(cost):
+    n = cost.shape[0]
+    # Column reduction, then hand every row its cheapest column while that
+    # column is free; only rows that collide need an augmenting path
+    u = np.zeros(n)
+    v = cost.min(axis=0)
+    col4row = np.full(n, -1)
+    row4col = np.full(n, -1)
+    for row, col in enumerate(np.argmin(cost - v, axis=1)):
+        if row4col[col] == -1 and cost[row, col] - v[col] == 0:
+            row4col[col], col4row[row] = row, col
+    for cur_row in np.flatnonzero(col4row == -1):
+        shortest = np.full(n, np.inf)
+        path = np.full(n, -1)
+        visited_cols = np.zeros(n, dtype=bool)
+        visited_rows = []
+        min_val = 0.0
+        i, sink = cur_row, -1
+        while sink == -1:
+            visited_rows.append(i)
+            reduced = min_val + cost[i] - u[i] - v
+            better = ~visited_cols & (reduced < shortest)
+            path[better] = i
+            shortest[better] = reduced[better]
+            open_costs = np.where(visited_cols, np.inf, shortest)
+            min_val = open_costs.min()
+            # among equally short paths, stop at a free column when there is one
+            ties = open_costs == min_val
+            free = ties & (row4col == -1)
+            j = int(np.argmax(free)) if free.any() else int(np.argmax(ties))
+            if np.isinf(min_val):
+                raise ValueError("cost matrix has no feasible assignment")
+            visited_cols[j] = True
+            if row4col[j] == -1:
+                sink = j
+            else:
+                i = row4col[j]
+
+        u[cur_row] += min_val
+        for r in visited_rows[1:]:
+            u[r] += min_val - shortest[col4row[r]]
+        v[visited_cols] -= min_val - shortest[visited_cols]
+
+        j = sink
+        while True:
+            i = path[j]
+            row4col[j] = i
+            col4row[i], j = j, col4row[i]
+            if i == cur_row:
+                break
+    return np.arange(n), col4row
+
+
+class JobArrays:
+    """Zone ids and times of ``jobs`` as NumPy columns, built once per plan."""
+
+    def __init__(self, jobs, deadhead):
+        pickups, deliveries = job_time_columns(jobs)
+        self.deadhead = deadhead.covering(
+            [job["pickup_zone"] for job in jobs] + [job["dropoff_zone"] for job in jobs]
+        )
+        self.pickups = np.asarray(pickups, dtype=float)
+        self.deliveries = np.asarray(deliveries, dtype=float)
+        self.pick = self.deadhead.zone_ids([job["pickup_zone"] for job in jobs])
+        self.drop = self.deadhead.zone_ids([job["dropoff_zone"] for job in jobs])
+
+    def hop(self, a, b):
+        # empty running from the end of job a to the start of job b
+        return float(self.deadhead.cost[self.drop[a], self.pick[b]])
+
+
+def successor_costs(arrays, pieces, max_jobs=MAX_JOBS_PER_DRIVER):
+    """``cost[a, b]`` of running piece ``b`` right after piece ``a``.
+
+    A piece is a list of job indexes already chained together. Built in one
+    vectorized pass: the deadhead from ``a``'s last dropoff to ``b``'s first
+    pickup, or ``inf`` when ``b`` starts before ``a`` is delivered, the hop
+    is not in the table, or the joined piece would exceed ``max_jobs``.
+    """
+    heads = np.array([piece[0] for piece in pieces])
+    tails = np.array([piece[-1] for piece in pieces])
+    lengths = np.array([len(piece) for piece in pieces])
+    cost = arrays.deadhead.cost[arrays.drop[tails][:, None], arrays.pick[heads][None, :]]
+    cost[arrays.pickups[heads][None, :] < arrays.deliveries[tails][:, None]] = np.inf
+    cost[lengths[:, None] + lengths[None, :] > max_jobs] = np.inf
+    np.fill_diagonal(cost, np.inf)
+    return cost
+
+
+def link_pieces(arrays, pieces, max_jobs=MAX_JOBS_PER_DRIVER, start_cost=None):
+    """Pick piece -> next-piece links that minimize deadhead plus chain starts.
+
+    Every piece left without a predecessor starts a chain costing
+    ``start_cost`` (default: more than any single hop, so a link always
+    beats an extra driver). Returns ``{a: b}`` successor links.
+    """
+    cost = successor_costs(arrays, pieces, max_jobs)
+    finite = cost[np.isfinite(cost)]
+    if not finite.size:
+        return {}
+    if start_cost is None:
+        start_cost = float(finite.max()) + 1.0
+    # Savings over starting a new chain; 0 stands for "no link", which any
+    # row can take, so the perfect assignment is the best set of links
+    savings = np.minimum(cost - start_cost, 0.0)
+    rows, cols = linear_sum_assignment(savings)
+    return {int(a): int(b) for a, b in zip(rows, cols) if savings[a, b] < 0}
+
+
+def follow_links(count, links):
+    """Paths of piece indexes along ``links``; every piece lands in one path."""
+    has_predecessor = set(links.values())
+    seen = [False] * count
+    paths = []
+
+    def walk(start):
+        path = []
+        a = start
+        while a is not None and not seen[a]:
+            seen[a] = True
+            path.append(a)
+            a = links.get(a)
+        paths.append(path)
+
+    for a in range(count):
+        if a not in has_predecessor:
+            walk(a)
+    for a in range(count):
+        if not seen[a]:   # cycles, only possible when times are missing
+            walk(a)
+    return paths
+
+
+def cut_path(arrays, pieces, max_jobs=MAX_JOBS_PER_DRIVER):
+    """Split consecutive ``pieces`` into the fewest chains of ``max_jobs``.
+
+    Among equally few chains, the cuts drop the most expensive hops.
+    """
+    hops = [arrays.hop(a[-1], b[0]) for a, b in zip(pieces, pieces[1:])]
+    kept = [0.0]
+    for hop in hops:
+        kept.append(kept[-1] + hop)
+    # best[k]: (chains, deadhead, cut) for the first k pieces
+    best = [(0, 0.0, 0)] + [None] * len(pieces)
+    for k in range(1, len(pieces) + 1):
+        size = 0
+        for s in range(k - 1, -1, -1):
+            size += len(pieces[s])
+            if size > max_jobs:
+                break
+            candidate = (best[s][0] + 1, best[s][1] + kept[k - 1] - kept[s], s)
+            if best[k] is None or candidate[:2] < best[k][:2]:
+                best[k] = candidate
+    chains, k = [], len(pieces)
+    while k:
+        s = best[k][2]
+        chains.append([job for piece in pieces[s:k] for job in piece])
+        k = s
+    return chains[::-1]
+
+
+def build_optimal_chains(arrays, pieces, max_jobs=MAX_JOBS_PER_DRIVER, start_cost=None):
+    """Chain ``pieces`` (lists of job indexes) by rounds of min-cost matching.
+
+    Each round links pieces; matched paths longer than ``max_jobs`` are
+    cut. Later rounds link the short chains left over, until a round no
+    longer reduces the number of chains.
+    """
+    full = []
+    while len(pieces) > 1:
+        links = link_pieces(arrays, pieces, max_jobs, start_cost)
+        if not links:
+            break
+        joined = []
+        for path in follow_links(len(pieces), links):
+            joined.extend(cut_path(arrays, [pieces[a] for a in path], max_jobs))
+        if len(joined) >= len(pieces):
+            break
+        full.extend(p for p in joined if len(p) >= max_jobs)
+        pieces = [p for p in joined if len(p) < max_jobs]
+    return full + pieces
+
+
+def optimize_assignments(drivers, jobs, deadhead, max_jobs=MAX_JOBS_PER_DRIVER,
+                         start_cost=None, block_size=BLOCK_SIZE):
+    """Plan ``jobs`` minimizing empty running instead of requiring zone equality.
+
+    Same output as :func:`solver.solve_assignments` plus ``deadhead_cost``,
+    the summed empty-running cost of the chosen links. Jobs are linked in
+    pickup-time blocks of ``block_size`` so the cost matrix stays small.
+    """
+    jobs = [normalize_job(j) for j in jobs]
+    driver_ids = [d["driver_id"] if isinstance(d, dict) else d for d in drivers]
+    arrays = JobArrays(jobs, deadhead)
+
+    # Zone-exact chains cost no deadhead; only the short ones are worth
+    # joining across zones, in pickup-time blocks
+    chains = build_chains(jobs, max_jobs)
+    short = sorted((c for c in chains if len(c) < max_jobs), key=lambda c: arrays.pickups[c[0]])
+    chains = [c for c in chains if len(c) >= max_jobs]
+    for start in range(0, len(short), block_size):
+        chains.extend(build_optimal_chains(arrays, short[start:start + block_size], max_jobs, start_cost))
+
+    # Longest chains first, as in the greedy solver
+    chains.sort(key=len, reverse=True)
+    assignments = [
+        {"driver_id": driver_id, "jobs": [jobs[i] for i in chain]}
+        for driver_id, chain in zip(driver_ids, chains)
+    ]
+    unassigned = [jobs[i] for chain in chains[len(driver_ids):] for i in chain]
+    deadhead_cost = sum(arrays.hop(a, b) for chain in chains[:len(driver_ids)] for a, b in zip(chain, chain[1:]))
+    return {"assignments": assignments, "unassigned": unassigned, "deadhead_cost": deadhead_cost}
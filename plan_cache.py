@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from prompt_encoder import DRIVER_COLUMNS, JOB_COLUMNS, select_columns
+from solver import normalize_job
+
+# ----------------- Settings -----------------
+CACHE_PATH = os.getenv("PLAN_CACHE_PATH", ".plan_cache/plans.sqlite3")
+MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "500"))
+MAX_BYTES = int(os.getenv("PLAN_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+
+# ----------------- Cache Key -----------------
+def canonical_records(drivers_json, jobs_json):
+    # Same columns the prompt sees, order-independent
+    drivers, _ = select_columns(list(drivers_json), DRIVER_COLUMNS)
+    jobs, _ = select_columns([normalize_job(j) for j in jobs_json], JOB_COLUMNS)
+    drivers = sorted(drivers, key=lambda d: str(d.get("driver_id")))
+    jobs = sorted(jobs, key=lambda j: str(j.get("job_id")))
+    return drivers, jobs
+
+
+def normalize_template(text):
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def plan_key(model, sampling, template, drivers_json, jobs_json, **extra):
+    """Content hash of everything that decides what the model is asked.
+
+    ``template`` is the prompt without data (rules, schema, user request),
+    whitespace-normalized so re-indenting it does not miss the cache.
+    ``extra`` carries anything else that changes the plan, e.g. the engine.
+    """
+    drivers, jobs = canonical_records(drivers_json, jobs_json)
+    payload = json.dumps({
+        "model": model,
+        "sampling": sampling,
+        "template": normalize_template(template),
+        "drivers": drivers,
+        "jobs": jobs,
+        "extra": extra,
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ----------------- Cache -----------------
+class PlanCache:
+    """SQLite-backed plan store with LRU eviction by entry count and size."""
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS plans ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.db.commit()
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute("SELECT value FROM plans WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE plans SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        data = json.dumps(value, default=str)
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO plans (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), now, now),
+            )
+            self.evict()
+            self.db.commit()
+
+    def evict(self):
+        # Drop least recently used entries until both limits hold
+        count, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM plans").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        rows = self.db.execute("SELECT key, size FROM plans ORDER BY accessed").fetchall()
+        for key, entry_size in rows:
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            self.db.execute("DELETE FROM plans WHERE key = ?", (key,))
+            count -= 1
+            size -= entry_size
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM plans")
+            self.db.commit()
+
+
+_cache = None
+
+
+def get_plan_cache():
+    # One cache per process, shared by every Streamlit session and rerun
+    global _cache
+    if _cache is None:
+        _cache = PlanCache()
+    return _cache
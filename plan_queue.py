@@ -0,0 +1,231 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from batch_plan import BACKEND_LIMITS, ENGINES, LOCAL_ENGINES, plan_records
+from request_log import RunLog
+
+# ----------------- Settings -----------------
+QUEUE_PATH = os.getenv("PLAN_QUEUE_PATH", ".plan_queue/tasks.sqlite3")
+# Plans running at once across all backends; BACKEND_LIMITS caps each one
+QUEUE_WORKERS = int(os.getenv("PLAN_QUEUE_WORKERS", "4"))
+# Finished tasks kept for sessions that come back for them
+KEEP_FINISHED = int(os.getenv("PLAN_QUEUE_KEEP", "200"))
+# Seconds between status checks while a page waits on a task
+POLL_SECONDS = float(os.getenv("PLAN_QUEUE_POLL", "2"))
+
+# assignJob.py engine labels -> batch engine keys
+ENGINE_KEYS = {label: key for key, label in ENGINES.items()}
+
+ACTIVE = ("queued", "running")
+FINISHED = ("done", "failed", "cancelled")
+
+
+# ----------------- Queue -----------------
+class PlanQueue:
+    """Background planning on a bounded thread pool, tracked in SQLite.
+
+    ``submit()`` stores the inputs and returns a task id at once; the task
+    starts when a worker is free and its backend is under its limit, oldest
+    first, so tasks for a busy local GPU do not hold up Groq tasks queued
+    behind them. The same limit also caps the backend's requests in flight,
+    which a sharded task sends several of. ``status()`` polls. Results outlive the session that asked
+    for them, and tasks a stopped process left queued or running are queued
+    again on start.
+    """
+
+    def __init__(self, path=QUEUE_PATH, workers=QUEUE_WORKERS, backend_limits=None, keep=KEEP_FINISHED):
+        self.path = path
+        self.workers = workers
+        self.backend_limits = backend_limits or BACKEND_LIMITS
+        self.keep = keep
+        self.lock = threading.Lock()
+        self.running = {}   # task id -> backend slot it holds (None for local engines)
+        # held per request, so one sharded task cannot exceed the cap either
+        self.limiters = {
+            name: threading.BoundedSemaphore(limit) for name, limit in self.backend_limits.items()
+        }
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            " id TEXT PRIMARY KEY, key TEXT, status TEXT NOT NULL, options TEXT NOT NULL, meta TEXT,"
+            " inputs TEXT, result TEXT, error TEXT, submitted REAL NOT NULL, started REAL, finished REAL)"
+        )
+        self.db.execute("UPDATE tasks SET status = 'queued', started = NULL WHERE status = 'running'")
+        self.db.commit()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="plan-queue")
+        self.dispatch()
+
+    def submit(self, drivers_json, jobs_json, options, key=None, meta=None):
+        """Queue a plan of the records with batch ``options``; return its task id.
+
+        A task still queued or running under the same ``key`` (the plan
+        cache key) is returned instead of planning the same inputs twice.
+        ``meta`` is stored as-is for the caller.
+        """
+        if options["engine"] not in ENGINES:
+            raise ValueError(f"unknown engine: {options['engine']}")
+        with self.lock:
+            if key is not None:
+                row = self.db.execute(
+                    "SELECT id FROM tasks WHERE key = ? AND status IN (?, ?) ORDER BY submitted LIMIT 1",
+                    (key, *ACTIVE),
+                ).fetchone()
+                if row is not None:
+                    return row[0]
+            task_id = uuid.uuid4().hex[:12]
+            self.db.execute(
+                "INSERT INTO tasks (id, key, status, options, meta, inputs, submitted) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    task_id, key, "queued", json.dumps(options), json.dumps(meta or {}),
+                    json.dumps({"drivers": list(drivers_json), "jobs": list(jobs_json)}, default=str),
+                    time.time(),
+                ),
+            )
+            self.db.commit()
+        self.dispatch()
+        return task_id
+
+    def slot(self, options):
+        return None if options["engine"] in LOCAL_ENGINES else options["backend"]
+
+    def dispatch(self):
+        # Start queued tasks, oldest first, while workers and backend slots allow
+        with self.lock:
+            if len(self.running) >= self.workers:
+                return
+            queued = self.db.execute(
+                "SELECT id, options FROM tasks WHERE status = 'queued' ORDER BY submitted"
+            ).fetchall()
+            for task_id, options in queued:
+                if len(self.running) >= self.workers:
+                    break
+                backend = self.slot(json.loads(options))
+                busy = sum(1 for b in self.running.values() if b == backend)
+                if backend is not None and busy >= self.backend_limits.get(backend, 1):
+                    continue
+                self.running[task_id] = backend
+                self.db.execute(
+                    "UPDATE tasks SET status = 'running', started = ? WHERE id = ?", (time.time(), task_id)
+                )
+                self.executor.submit(self.work, task_id)
+            self.db.commit()
+
+    def work(self, task_id):
+        run = None
+        try:
+            with self.lock:
+                options, inputs = self.db.execute(
+                    "SELECT options, inputs FROM tasks WHERE id = ?", (task_id,)
+                ).fetchone()
+            options, inputs = json.loads(options), json.loads(inputs)
+            run = RunLog(
+                app="queue", task_id=task_id, engine=ENGINES[options["engine"]], backend=options["backend"],
+                model=options["model"], fmt=options["fmt"], drivers=len(inputs["drivers"]), jobs=len(inputs["jobs"]),
+            )
+            with self.lock:
+                limiter = self.limiters.setdefault(options["backend"], threading.BoundedSemaphore(1))
+            plan, report, info = plan_records(inputs["drivers"], inputs["jobs"], options, run, limiter)
+            self.finish(task_id, "done", result={"plan": plan, "report": report, **info})
+        except Exception as e:
+            if run is not None:
+                run.fail("error", e)
+            self.finish(task_id, "failed", error=f"{type(e).__name__}: {e}")
+        finally:
+            if run is not None:
+                run.write()
+            with self.lock:
+                self.running.pop(task_id, None)
+            self.dispatch()
+
+    def finish(self, task_id, status, result=None, error=None):
+        # Inputs are only needed to run the task; the result is what is kept
+        with self.lock:
+            self.db.execute(
+                "UPDATE tasks SET status = ?, result = ?, error = ?, inputs = NULL, finished = ? WHERE id = ?",
+                (status, json.dumps(result, default=str) if result is not None else None, error, time.time(), task_id),
+            )
+            self.prune()
+            self.db.commit()
+
+    def prune(self):
+        # Keep the newest ``keep`` finished tasks
+        self.db.execute(
+            "DELETE FROM tasks WHERE status IN (?, ?, ?) AND id NOT IN ("
+            " SELECT id FROM tasks WHERE status IN (?, ?, ?) ORDER BY finished DESC LIMIT ?)",
+            (*FINISHED, *FINISHED, self.keep),
+        )
+
+    def cancel(self, task_id):
+        """Drop a task that has not started yet; return whether it was dropped."""
+        with self.lock:
+            cursor = self.db.execute(
+                "UPDATE tasks SET status = 'cancelled', inputs = NULL, finished = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), task_id),
+            )
+            self.db.commit()
+        return cursor.rowcount > 0
+
+    def status(self, task_id):
+        """The task as a dict, with its ``result`` once done; None if unknown.
+
+        A queued task also carries ``ahead``, the queued tasks submitted
+        before it.
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT id, key, status, meta, result, error, submitted, started, finished FROM tasks WHERE id = ?",
+                (task_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            task = self.row(row)
+            if task["status"] == "queued":
+                task["ahead"] = self.db.execute(
+                    "SELECT COUNT(*) FROM tasks WHERE status = 'queued' AND submitted < ?", (task["submitted"],)
+                ).fetchone()[0]
+        return task
+
+    def tasks(self, limit=20):
+        """The newest ``limit`` tasks, without their results."""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT id, key, status, meta, NULL, error, submitted, started, finished FROM tasks"
+                " ORDER BY submitted DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [self.row(row) for row in rows]
+
+    @staticmethod
+    def row(row):
+        task_id, key, status, meta, result, error, submitted, started, finished = row
+        return {
+            "task_id": task_id,
+            "key": key,
+            "status": status,
+            "meta": json.loads(meta or "{}"),
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "submitted": submitted,
+            "started": started,
+            "finished": finished,
+        }
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_plan_queue():
+    # One queue per process: every Streamlit session shares its workers
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = PlanQueue()
+    return _queue
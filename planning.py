@@ -0,0 +1,471 @@
+import json
+import re
+import time
+
+from prompt_encoder import DEFAULT_FORMAT, decode_zones, encode_data, format_note
+from stream_parser import AssignmentStreamParser
+from solver import MAX_JOBS_PER_DRIVER, extend_tails, lock_prefixes, normalize_job, solve_assignments
+
+MODEL = "openai/gpt-oss-20b"
+# Sampling settings for every Groq call; also part of the plan cache key
+SAMPLING = {"temperature": 0, "top_p": 1, "max_tokens": 8192}
+# Follow-up calls allowed after an answer is cut off at max_tokens
+MAX_CONTINUATIONS = 8
+SYSTEM_PROMPT = "You are a JSON generator. Return ONLY valid JSON. No reasoning. No text. No markdown."
+
+# What the model writes back. "ids" lists each driver's job IDs in order and
+# the zones are filled in locally (see rehydrate_plan); "jobs" has the model
+# echo job_id, pickup_zone and dropoff_zone for every job.
+OUTPUTS = ["ids", "jobs"]
+DEFAULT_OUTPUT = "ids"
+OUTPUT_EXAMPLES = {
+    "ids": """
+    {"assignments": [{"driver_id": "DR-001", "job_ids": ["JOB-1001", "JOB-1005"]}]}
+    List each driver's job_ids in the order the driver does them.""",
+    "jobs": """
+    {
+    "assignments": [
+        {
+        "driver_id": "DR-001",
+        "jobs": [
+            {"job_id":"JOB-1001","pickup_zone":"z1","dropoff_zone":"z6"}
+        ]
+        }
+    ]
+    }""",
+}
+# Structured-output schema for "ids", sent as Groq's response_format and
+# Ollama's format so the model cannot drift from it
+ID_PLAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "assignments": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "driver_id": {"type": "string"},
+                    "job_ids": {"type": "array", "items": {"type": "string"}, "maxItems": MAX_JOBS_PER_DRIVER},
+                },
+                "required": ["driver_id", "job_ids"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["assignments"],
+    "additionalProperties": False,
+}
+
+
+# ----------------- Prompt -----------------
+def build_prompt_parts(drivers_json, jobs_json, user_prompt, extra_rules="", fmt=DEFAULT_FORMAT,
+                       output=DEFAULT_OUTPUT):
+    """Return ``(prefix, data, zones)``.
+
+    ``prefix`` is the static instructions, ``data`` the per-upload tables and
+    user request; ``zones`` is only set for ``csv_interned``. ``output`` is
+    one of OUTPUTS and picks the answer format the prompt asks for.
+    """
+    drivers_text, jobs_text, zones = encode_data(drivers_json, jobs_json, fmt)
+    note = format_note(fmt)
+    prefix = f"""
+    Return ONLY a valid JSON object.
+    Do not include explanations.
+    Do not include markdown.
+    Do not include reasoning.
+    Do not include text before or after.
+    The response MUST be a single JSON object that matches the required format.
+
+    Format:{OUTPUT_EXAMPLES[output]}
+
+    Rules:
+    - Each driver max 3 jobs.
+    - Next pickup_zone must equal previous dropoff_zone.
+    - Next pickup_datetime must not be before previous delivery_datetime.
+    - Assign ALL jobs so none are left unassigned.{extra_rules}
+
+"""
+    data = f"""    Data:{" " + note if note else ""}
+    Drivers = {drivers_text}
+    Jobs = {jobs_text}
+
+    User Request: {user_prompt}
+    """
+    return prefix, data, zones
+
+
+def build_prompt(drivers_json, jobs_json, user_prompt, extra_rules="", fmt=DEFAULT_FORMAT, output=DEFAULT_OUTPUT):
+    """Return ``(prompt, zones)``; ``zones`` is only set for ``csv_interned``."""
+    prefix, data, zones = build_prompt_parts(drivers_json, jobs_json, user_prompt, extra_rules, fmt, output)
+    return prefix + data, zones
+
+
+# Drivers sent to the leftover stage already carry local jobs
+LEFTOVER_RULES = """
+    - Drivers already have jobs: add at most free_slots jobs to a driver.
+    - If last_dropoff_zone is set, the driver's first new pickup_zone must equal it.
+    - If available_from is set, the driver's first new pickup_datetime must not be before it."""
+
+
+# ----------------- JSON Cleaning -----------------
+def parse_plan_text(response_text):
+    if not response_text or not response_text.strip():
+        return None
+
+    # Strip all Markdown fences, if present
+    clean_text = re.sub(r"^```[a-zA-Z]*", "", response_text.strip(), flags=re.IGNORECASE|re.MULTILINE)
+    clean_text = re.sub(r"```$", "", clean_text.strip(), flags=re.MULTILINE).strip()
+
+    try:
+        return json.loads(clean_text)
+    except json.JSONDecodeError:
+        # fallback: try to find any JSON object inside the text
+        match = re.search(r"\{[\s\S]*\}", response_text)
+        if match:
+            try:
+                return json.loads(match.group(0))
+            except json.JSONDecodeError:
+                pass
+    return None
+
+
+def job_index(jobs_json):
+    return {job["job_id"]: job for job in map(normalize_job, jobs_json)}
+
+
+def rehydrate_plan(plan, jobs_json):
+    """Turn each ``job_ids`` list of an ID-only plan into full ``jobs``.
+
+    Fields come from the job records the prompt was built from, or from a
+    ready ``{job_id: job}`` index (see :func:`job_index`). An ID that is not
+    among them stays a bare ``{"job_id": ...}`` so validation reports it.
+    Entries that already carry ``jobs`` are left alone.
+    """
+    if not plan:
+        return plan
+    index = jobs_json if isinstance(jobs_json, dict) else None
+    for entry in plan.get("assignments", []):
+        if "job_ids" not in entry or "jobs" in entry:
+            continue
+        if index is None:
+            index = job_index(jobs_json)
+        job_ids = entry.pop("job_ids") or []
+        if not isinstance(job_ids, list):
+            job_ids = [job_ids]
+        entry["jobs"] = [dict(index.get(job_id) or {"job_id": job_id}) for job_id in job_ids]
+    return plan
+
+
+def decode_plan(plan, zones, jobs_json):
+    # Back to zone names and full job records, whichever output was asked for
+    return rehydrate_plan(decode_zones(plan, zones), jobs_json)
+
+
+def output_options(output):
+    # Only the ID contract is enforced; "jobs" keeps plain JSON mode
+    return {"schema": ID_PLAN_SCHEMA} if output == "ids" else {}
+
+
+# ----------------- LLM Call -----------------
+def plan_messages(prompt):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def request_plan(backend, prompt, max_tokens=SAMPLING["max_tokens"], run=None, output=DEFAULT_OUTPUT):
+    """Ask ``backend`` (see backends.py) for a plan.
+
+    Returns ``(response_json, response_text, result)``; ``result`` is the
+    backend's :class:`backends.LLMResult` with token usage and timings.
+    ``run`` (a :class:`request_log.RunLog`) receives them plus the parse time.
+    ``output`` must match the prompt's; ID-only answers still need
+    :func:`decode_plan`.
+    """
+    result = backend.complete(
+        plan_messages(prompt),
+        temperature=SAMPLING["temperature"],  # ✅ deterministic
+        max_tokens=max_tokens,                # ✅ keep smaller, avoids truncation
+        top_p=SAMPLING["top_p"],
+        **output_options(output),
+    )
+    return extract_plan(result, run), result.text, result
+
+
+def extract_plan(result, run=None):
+    start = time.perf_counter()
+    plan = parse_plan_text(result.text)
+    if run is not None:
+        run.add_result(result)
+        run.add("json_extraction", time.perf_counter() - start)
+    return plan
+
+
+def tokens_per_second(result):
+    generation = (result.seconds or 0) - (result.time_to_first_token or 0)
+    if not result.completion_tokens or generation <= 0:
+        return None
+    return result.completion_tokens / generation
+
+
+def request_plan_stream(backend, prompt, max_tokens=SAMPLING["max_tokens"], on_driver=None, run=None,
+                        output=DEFAULT_OUTPUT):
+    """Streaming variant of :func:`request_plan`.
+
+    ``on_driver`` is called with each driver entry of ``assignments`` as soon
+    as it is complete. The returned result carries time-to-first-token.
+    """
+    parser = AssignmentStreamParser()
+    with backend.stream(
+        plan_messages(prompt),
+        temperature=SAMPLING["temperature"],
+        max_tokens=max_tokens,
+        top_p=SAMPLING["top_p"],
+        **output_options(output),
+    ) as stream:
+        for content in stream:
+            for driver in parser.feed(content):
+                if on_driver is not None:
+                    on_driver(driver)
+    result = stream.result
+    return extract_plan(result, run), result.text, result
+
+
+# ----------------- Continuation -----------------
+def is_truncated(result):
+    # Groq reports finish_reason "length", Ollama done_reason "length"
+    return result is not None and result.finish_reason == "length"
+
+
+def salvage_plan(text):
+    """Every complete driver entry of a plan cut off mid-answer."""
+    return {"assignments": AssignmentStreamParser().feed(text or "")}
+
+
+def continue_plan(backend, result, drivers_json, jobs_json, user_prompt, zones=None, fmt=DEFAULT_FORMAT,
+                  output=DEFAULT_OUTPUT, max_parts=MAX_CONTINUATIONS, run=None):
+    """Finish a plan whose first answer (``result``) hit max_tokens.
+
+    The complete drivers of each cut-off answer are kept; the jobs they do
+    not cover go out again, with the drivers that still have room, until an
+    answer ends on its own or a part places nothing new. ``zones`` is the
+    interning table of the first prompt. Returns ``(response_json, parts)``
+    with one row per answer, the first included.
+    """
+    jobs = job_index(jobs_json)
+    placed, done_ids, parts = {}, set(), []
+    prompt_jobs = list(jobs.values())
+    while True:
+        start = time.time()
+        truncated = is_truncated(result)
+        answer = salvage_plan(result.text) if truncated else parse_plan_text(result.text) or {"assignments": []}
+        answer = decode_plan(answer, zones, prompt_jobs)
+        base = {"assignments": [placed.get(d["driver_id"], {"driver_id": d["driver_id"], "jobs": []})
+                                for d in drivers_json]}
+        # only jobs still open count; a job repeated from an earlier part is dropped
+        open_ids = {job["job_id"] for job in prompt_jobs}
+        for entry in answer.get("assignments", []):
+            entry["jobs"] = [job for job in entry.get("jobs", []) if job.get("job_id") in open_ids]
+            open_ids -= {job["job_id"] for job in entry["jobs"]}
+        placed = {a["driver_id"]: a for a in merge_assignments(base, answer)["assignments"]}
+        done_before = len(done_ids)
+        done_ids = {job["job_id"] for entry in placed.values() for job in entry["jobs"]}
+        new_jobs = len(done_ids) - done_before
+        remaining = [job for job_id, job in jobs.items() if job_id not in done_ids]
+        parts.append({
+            "part": len(parts) + 1,
+            "jobs": len(prompt_jobs),
+            "placed": new_jobs,
+            "finish_reason": result.finish_reason,
+            "prompt_tokens": result.prompt_tokens,
+            "completion_tokens": result.completion_tokens,
+            "seconds": (result.seconds or 0) + time.time() - start,
+        })
+
+        free_drivers = free_capacity({"assignments": list(placed.values())}, drivers_json)
+        if not truncated or not new_jobs or not remaining or not free_drivers or len(parts) > max_parts:
+            break
+        prompt_jobs = remaining
+        prompt, zones = build_prompt(free_drivers, prompt_jobs, user_prompt, extra_rules=LEFTOVER_RULES,
+                                     fmt=fmt, output=output)
+        response_json, response_text, result = request_plan(backend, prompt, run=run, output=output)
+
+    return {"assignments": list(placed.values()), "unassigned": remaining}, parts
+
+
+# ----------------- Hybrid Planning -----------------
+def free_capacity(plan, drivers_json, max_jobs=MAX_JOBS_PER_DRIVER):
+    loaded = {a["driver_id"]: a["jobs"] for a in plan["assignments"]}
+    free = []
+    for driver in drivers_json:
+        jobs = loaded.get(driver["driver_id"], [])
+        if len(jobs) < max_jobs:
+            free.append({
+                "driver_id": driver["driver_id"],
+                "free_slots": max_jobs - len(jobs),
+                "last_dropoff_zone": jobs[-1]["dropoff_zone"] if jobs else None,
+                "available_from": jobs[-1].get("delivery_datetime") if jobs else None,
+            })
+    return free
+
+
+def merge_assignments(plan, extra, jobs=None, max_jobs=MAX_JOBS_PER_DRIVER):
+    """Append ``extra`` assignments onto the drivers of ``plan``.
+
+    Jobs the LLM placed beyond a driver's capacity, or on a driver id that
+    does not exist in the plan's driver list, are returned as unassigned,
+    and so is every job of ``jobs`` (the ones it was asked to place) that
+    it left out of its answer altogether.
+    """
+    by_driver = {a["driver_id"]: a for a in plan["assignments"]}
+    unassigned = []
+    for entry in extra.get("assignments", []):
+        driver_id = entry.get("driver_id")
+        placed = entry.get("jobs", [])
+        if driver_id not in by_driver:
+            unassigned.extend(placed)
+            continue
+        current = by_driver[driver_id]["jobs"]
+        room = max_jobs - len(current)
+        current.extend(placed[:room])
+        unassigned.extend(placed[room:])
+    if jobs is not None:
+        seen = {job.get("job_id") for a in plan["assignments"] for job in a["jobs"]}
+        seen |= {job.get("job_id") for job in unassigned}
+        unassigned.extend(job for job in jobs if job["job_id"] not in seen)
+    return {
+        "assignments": [a for a in plan["assignments"] if a["jobs"]],
+        "unassigned": unassigned,
+    }
+
+
+def plan_hybrid(backend, drivers_json, jobs_json, user_prompt, count_tokens=None, fmt=DEFAULT_FORMAT, run=None,
+                output=DEFAULT_OUTPUT):
+    """Chain what the solver can, then ask the LLM for the leftovers only.
+
+    Returns ``(response_json, stages)`` where ``stages`` holds one dict per
+    stage with prompt/completion tokens and wall time. ``run`` is passed on
+    to :func:`request_plan`.
+    """
+    stages = []
+
+    # --- Local stage ---
+    start = time.time()
+    local = solve_assignments(drivers_json, jobs_json)
+    leftovers = local["unassigned"]
+    # keep every driver in the plan so the LLM stage can extend idle ones
+    placed = {a["driver_id"]: a for a in local["assignments"]}
+    plan = {
+        "assignments": [placed.get(d["driver_id"], {"driver_id": d["driver_id"], "jobs": []}) for d in drivers_json],
+    }
+    free_drivers = free_capacity(plan, drivers_json)
+    stages.append({
+        "stage": "local",
+        "jobs": len(jobs_json) - len(leftovers),
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "seconds": time.time() - start,
+    })
+
+    if not leftovers or not free_drivers:
+        plan["assignments"] = [a for a in plan["assignments"] if a["jobs"]]
+        plan["unassigned"] = leftovers
+        return plan, stages
+
+    # --- LLM stage ---
+    start = time.time()
+    leftover_jobs = [normalize_job(j) for j in leftovers]
+    prompt, zones = build_prompt(
+        free_drivers, leftover_jobs, user_prompt, extra_rules=LEFTOVER_RULES, fmt=fmt, output=output,
+    )
+    response_json, response_text, result = request_plan(backend, prompt, run=run, output=output)
+    response_json = decode_plan(response_json, zones, leftover_jobs)
+
+    prompt_tokens = result.prompt_tokens
+    if prompt_tokens is None and count_tokens is not None:
+        prompt_tokens = count_tokens(prompt)
+    stages.append({
+        "stage": "llm",
+        "jobs": len(leftover_jobs),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": result.completion_tokens,
+        "seconds": time.time() - start,
+    })
+
+    if not response_json:
+        plan["assignments"] = [a for a in plan["assignments"] if a["jobs"]]
+        plan["unassigned"] = leftover_jobs
+        return plan, stages
+    return merge_assignments(plan, response_json, leftover_jobs), stages
+
+
+# ----------------- Incremental Planning -----------------
+def plan_incremental(backend, previous, drivers_json, jobs_json, user_prompt, committed=None,
+                     fmt=DEFAULT_FORMAT, run=None, output=DEFAULT_OUTPUT):
+    """Re-plan after jobs were added or cancelled without moving locked work.
+
+    ``previous`` is an earlier plan and ``jobs_json`` the current job list.
+    Each driver keeps the head of its chain (see :func:`solver.lock_prefixes`);
+    only the other jobs are chained onto the tails and onto idle drivers,
+    and whatever is left goes to the LLM with just the drivers that can
+    take it. ``backend`` may be None for a local-only re-plan. Returns
+    ``(response_json, stages)`` like :func:`plan_hybrid`.
+    """
+    stages = []
+
+    # --- Lock stage ---
+    start = time.time()
+    locked, pool = lock_prefixes((previous or {}).get("assignments", []), jobs_json, committed)
+    stages.append({
+        "stage": "locked",
+        "jobs": sum(len(entry["jobs"]) for entry in locked),
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "seconds": time.time() - start,
+    })
+
+    # --- Local stage ---
+    start = time.time()
+    plan = extend_tails(locked, drivers_json, pool)
+    leftovers = plan["unassigned"]
+    stages.append({
+        "stage": "local",
+        "jobs": len(pool) - len(leftovers),
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "seconds": time.time() - start,
+    })
+    if not leftovers or backend is None:
+        return plan, stages
+
+    # --- LLM stage: only drivers that can take a leftover ---
+    start = time.time()
+    pickup_zones = {job["pickup_zone"] for job in leftovers}
+    by_driver = {a["driver_id"]: a for a in plan["assignments"]}
+    free_drivers, idle = [], 0
+    for driver in free_capacity(plan, drivers_json):
+        if driver["last_dropoff_zone"] is None:
+            if idle >= len(leftovers):
+                continue
+            idle += 1
+        elif driver["last_dropoff_zone"] not in pickup_zones:
+            continue
+        free_drivers.append(driver)
+        by_driver.setdefault(driver["driver_id"], {"driver_id": driver["driver_id"], "jobs": []})
+    if not free_drivers:
+        return plan, stages
+
+    prompt, zones = build_prompt(free_drivers, leftovers, user_prompt, extra_rules=LEFTOVER_RULES, fmt=fmt, output=output)
+    response_json, response_text, result = request_plan(backend, prompt, run=run, output=output)
+    response_json = decode_plan(response_json, zones, leftovers)
+    stages.append({
+        "stage": "llm",
+        "jobs": len(leftovers),
+        "prompt_tokens": result.prompt_tokens,
+        "completion_tokens": result.completion_tokens,
+        "seconds": time.time() - start,
+    })
+    if not response_json:
+        return plan, stages
+    return merge_assignments({"assignments": list(by_driver.values())}, response_json, leftovers), stages
@@ -0,0 +1,100 @@
+import csv
+import io
+import json
+
+from solver import normalize_job
+
+# ----------------- Formats -----------------
+# python       - str(list of dicts), what assignJob.py used to inline
+# json         - json.dumps(list of dicts), what Groq.py/Jobollama.py inline
+# csv          - header once, one row per record
+# csv_interned - csv with zone names replaced by small integer ids
+FORMATS = ["python", "json", "csv", "csv_interned"]
+DEFAULT_FORMAT = "csv"
+
+# Only the columns the planning rules need
+DRIVER_COLUMNS = ["driver_id", "free_slots", "last_dropoff_zone", "available_from"]
+JOB_COLUMNS = ["job_id", "pickup_zone", "dropoff_zone", "pickup_datetime", "delivery_datetime"]
+ZONE_COLUMNS = {"pickup_zone", "dropoff_zone", "last_dropoff_zone"}
+
+
+def select_columns(records, columns):
+    # Keep the wanted columns that are actually present, in ``columns`` order
+    present = [c for c in columns if any(c in r for r in records)]
+    return [{c: r.get(c) for c in present} for r in records], present
+
+
+def zone_table(jobs):
+    zones = set()
+    for job in jobs:
+        for column in ZONE_COLUMNS:
+            if job.get(column) is not None:
+                zones.add(str(job[column]))
+    return sorted(zones)
+
+
+def encode_table(records, columns, fmt=DEFAULT_FORMAT, zones=None):
+    records, columns = select_columns(records, columns)
+    if fmt == "python":
+        return str(records)
+    if fmt == "json":
+        return json.dumps(records, separators=(",", ":"))
+    if fmt not in ("csv", "csv_interned"):
+        raise ValueError(f"unknown prompt format {fmt!r}, expected one of {FORMATS}")
+
+    zone_ids = {z: i for i, z in enumerate(zones or [])} if fmt == "csv_interned" else {}
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(columns)
+    for record in records:
+        row = []
+        for column in columns:
+            value = record[column]
+            if value is None:
+                value = ""
+            elif column in ZONE_COLUMNS and zone_ids:
+                value = zone_ids.get(str(value), value)
+            row.append(value)
+        writer.writerow(row)
+    # start on a fresh line so the header lines up with the rows
+    return "\n" + out.getvalue().rstrip("\n")
+
+
+def encode_data(drivers_json, jobs_json, fmt=DEFAULT_FORMAT):
+    """Encode the driver and job records for a prompt.
+
+    Only the columns the planning rules need are sent; the csv formats give
+    them as a header row once, then one row per record. Returns
+    ``(drivers_text, jobs_text, zones)``; ``zones`` is the interning table
+    for ``csv_interned`` (None otherwise) and is what :func:`decode_zones`
+    needs to map the model's answer back.
+    """
+    jobs_json = [normalize_job(j) for j in jobs_json]
+    zones = zone_table(jobs_json + list(drivers_json)) if fmt == "csv_interned" else None
+    drivers_text = encode_table(drivers_json, DRIVER_COLUMNS, fmt, zones)
+    jobs_text = encode_table(jobs_json, JOB_COLUMNS, fmt, zones)
+    return drivers_text, jobs_text, zones
+
+
+def format_note(fmt):
+    if fmt == "csv":
+        return "Drivers and Jobs are CSV tables with a header row."
+    if fmt == "csv_interned":
+        return ("Drivers and Jobs are CSV tables with a header row. "
+                "Zones are numbered; use the same numbers for pickup_zone and dropoff_zone.")
+    return ""
+
+
+def decode_zones(plan, zones):
+    # Map interned zone ids in the model's answer back to zone names
+    if not plan or not zones:
+        return plan
+    for driver in plan.get("assignments", []):
+        for job in driver.get("jobs", []):
+            for column in ("pickup_zone", "dropoff_zone"):
+                value = job.get(column)
+                try:
+                    job[column] = zones[int(value)]
+                except (TypeError, ValueError, IndexError):
+                    pass
+    return plan
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import threading
+import time
+
+from planning import DEFAULT_OUTPUT, SAMPLING, decode_plan, output_options, parse_plan_text, plan_messages
+from validator import validate_plan
+
+# ----------------- Settings -----------------
+# Seconds the losers may keep running after a win, only to measure the margin;
+# one still running then is cut, and the margin over it is only a lower bound
+RACE_GRACE = float(os.getenv("RACE_GRACE", "0.5"))
+
+
+# ----------------- Event Loop -----------------
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def race_loop():
+    # One loop for every race in the process: the backends' async clients
+    # bind to the loop they first run on, so a fresh loop per race would
+    # strand (and leak) them
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="race-loop", daemon=True).start()
+    return _loop
+
+
+# ----------------- Racing -----------------
+async def _race(backends, prompt, drivers_json, jobs_json, zones, max_tokens, grace, output, run):
+    start = time.perf_counter()
+
+    async def attempt(backend):
+        result = await backend.acomplete(
+            plan_messages(prompt),
+            temperature=SAMPLING["temperature"],
+            max_tokens=max_tokens,
+            top_p=SAMPLING["top_p"],
+            **output_options(output),
+        )
+        return result, time.perf_counter() - start
+
+    tasks = {asyncio.create_task(attempt(b)): b for b in backends}
+    stats = {b: {"backend": b.name, "model": b.model, "status": "cancelled", "seconds": None} for b in backends}
+    winner = fallback = None
+
+    def settle(task):
+        nonlocal winner, fallback
+        entry = stats[tasks[task]]
+        try:
+            result, seconds = task.result()
+        except Exception as e:
+            entry.update(status="error", error=f"{type(e).__name__}: {e}",
+                         seconds=round(time.perf_counter() - start, 3))
+            return
+        entry.update(seconds=round(seconds, 3), prompt_tokens=result.prompt_tokens,
+                     completion_tokens=result.completion_tokens, finish_reason=result.finish_reason)
+        if run is not None:
+            # losers' tokens are still spent, so they count
+            run.add_tokens(result.prompt_tokens, result.completion_tokens)
+        validation_start = time.perf_counter()
+        plan = decode_plan(parse_plan_text(result.text), zones, jobs_json)
+        report = validate_plan(plan, drivers_json, jobs_json) if plan else None
+        if run is not None:
+            run.add("validation", time.perf_counter() - validation_start)
+        if report is None:
+            entry["status"] = "unparsed"
+        elif not report["valid"]:
+            entry.update(status="invalid", violations=len(report["violations"]))
+            # fewest violations is the best answer if nobody is valid
+            if fallback is None or len(report["violations"]) < fallback[2]:
+                fallback = (plan, result, len(report["violations"]))
+        elif winner is None:
+            entry["status"] = "won"
+            winner = (plan, result)
+        else:
+            entry["status"] = "lost"
+
+    pending = set(tasks)
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=lambda t: t.result()[1] if not t.exception() else float("inf")):
+                settle(task)
+        if pending and grace > 0:
+            # only to measure the margin; whatever is still running then is cut
+            done, pending = await asyncio.wait(pending, timeout=grace)
+            for task in done:
+                settle(task)
+    finally:
+        # a cancelled backend had not answered yet: it would have been at least this late
+        cancelled_at = round(time.perf_counter() - start, 3)
+        for task in pending:
+            stats[tasks[task]]["seconds"] = cancelled_at
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    return winner, fallback, list(stats.values()), time.perf_counter() - start
+
+
+def race_plan(backends, prompt, drivers_json, jobs_json, zones=None,
+              max_tokens=SAMPLING["max_tokens"], grace=RACE_GRACE, output=DEFAULT_OUTPUT, run=None):
+    """Send ``prompt`` to every backend at once; keep the first valid plan.
+
+    Each response is parsed and validated as it arrives; the first valid one
+    wins and the requests still running are cancelled, after ``grace``
+    seconds if set. Returns ``(plan, race)``: ``plan`` falls back to the
+    parsed answer with the fewest rule violations (or None) when no backend
+    is valid. ``race`` holds the winner, its ``margin`` in seconds over the
+    next backend to answer and one status row per backend, whose
+    ``seconds`` is when it answered or was cancelled. When every other
+    backend was cancelled before answering, the margin is up to the
+    cancellation and ``margin_at_least`` is set; RACE_GRACE lets them run
+    on for a closer figure.
+    """
+    winner, fallback, entrants, elapsed = asyncio.run_coroutine_threadsafe(
+        _race(backends, prompt, drivers_json, jobs_json, zones, max_tokens, grace, output, run), race_loop(),
+    ).result()
+    plan, result = (winner or fallback or (None, None))[:2]
+    if run is not None and result is not None:
+        run.add("time_to_first_token", result.time_to_first_token)
+        run.add("generation", (result.seconds or 0) - (result.time_to_first_token or 0))
+
+    race = {"winner": None, "winner_seconds": None, "margin": None, "margin_at_least": False,
+            "seconds": round(elapsed, 3), "entrants": entrants}
+    if winner is not None:
+        won = next(e for e in entrants if e["status"] == "won")
+        later = [e["seconds"] for e in entrants
+                 if e is not won and e["status"] in ("lost", "invalid", "unparsed") and e["seconds"] >= won["seconds"]]
+        cancelled = [e["seconds"] for e in entrants if e["status"] == "cancelled"]
+        race.update(winner=f"{won['backend']}:{won['model']}", winner_seconds=won["seconds"])
+        if later:
+            race["margin"] = round(min(later) - won["seconds"], 3)
+        elif cancelled:
+            race.update(margin=round(min(cancelled) - won["seconds"], 3), margin_at_least=True)
+    return plan, race
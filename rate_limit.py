@@ -0,0 +1,258 @@
+import bisect
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+
+from token_counter import count_tokens_estimate
+
+# ----------------- Settings -----------------
+# Groq quota per model; 0 requests means no local cap, 0 tokens means the
+# x-ratelimit-limit-tokens header of the first response sets it
+GROQ_RPM = int(os.getenv("GROQ_RPM", "30"))
+GROQ_TPM = int(os.getenv("GROQ_TPM", "0"))
+# 429s retried per request, each after the wait the server asks for
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", "6"))
+BACKOFF_BASE = float(os.getenv("RATE_LIMIT_BACKOFF_BASE", "1"))
+BACKOFF_MAX = float(os.getenv("RATE_LIMIT_BACKOFF_MAX", "60"))
+# Up to this fraction is added to every retry wait so callers spread out
+JITTER = 0.25
+# A booking is held this fraction of the period past the window, for the
+# time a request takes to reach the server
+WINDOW_MARGIN = 0.02
+# Seconds between checks while the first request learns the token quota
+PROBE_POLL = 0.05
+# Longest wait for token room before checking again, as a fraction of the period
+RECHECK = 0.05
+
+DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value):
+    """Seconds in a header value: ``"7.66s"``, ``"2m59.56s"``, ``"120ms"`` or ``"3"``."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION.findall(value)
+    return sum(float(n) * UNITS[unit] for n, unit in parts) if parts else None
+
+
+def header_int(headers, name):
+    try:
+        return int(float(headers.get(name)))
+    except (TypeError, ValueError):
+        return None
+
+
+# ----------------- Sliding Window -----------------
+class SlidingWindow:
+    """At most ``capacity`` units in any ``period`` seconds, as the quota is kept.
+
+    ``room()`` says how long until more units fit and ``book()`` takes them
+    once they do, so a window never holds more than the quota, not even
+    the first one, and units given back are free for the next caller at
+    once. A capacity of 0 admits everything, but pauses still apply.
+    """
+
+    def __init__(self, capacity, period=60.0):
+        self.capacity = capacity
+        self.period = period
+        # the server's window starts when a request arrives, a little after it is sent
+        self.margin = period * WINDOW_MARGIN
+        self.booked = deque()   # [send time, units], oldest first
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def expire(self, now):
+        while self.booked and self.booked[0][0] + self.period + self.margin <= now:
+            self.booked.popleft()
+
+    def room(self, amount):
+        """Seconds until ``amount`` more units fit; 0 when they fit now.
+
+        More than the window holds waits for an empty window, then goes.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.expire(now)
+            wait = max(0.0, self.blocked_until - now)
+            if self.capacity:
+                amount = min(amount, self.capacity)
+                used = sum(units for _, units in self.booked)
+                for sent, units in self.booked:
+                    if used + amount <= self.capacity:
+                        break
+                    used -= units
+                    wait = max(wait, sent + self.period + self.margin - now)
+            return wait
+
+    def book(self, amount):
+        """Take ``amount`` units now; the booking goes to ``give_back()``."""
+        with self.lock:
+            booking = [time.monotonic(), min(amount, self.capacity) if self.capacity else amount]
+            if self.capacity:
+                self.booked.append(booking)
+            return booking
+
+    def give_back(self, booking, amount):
+        with self.lock:
+            booking[1] = max(0, booking[1] - amount)
+
+    def resize(self, capacity):
+        with self.lock:
+            self.capacity = capacity
+
+    def sync(self, remaining=None, reset=None):
+        # The server's count wins when it is lower: other processes share the
+        # quota, so what they used is booked until the server's window resets
+        with self.lock:
+            now = time.monotonic()
+            self.expire(now)
+            if remaining is None:
+                return
+            if remaining <= 0 and reset:
+                self.blocked_until = max(self.blocked_until, now + reset)
+            if self.capacity:
+                used = sum(units for _, units in self.booked)
+                others = self.capacity - remaining - used
+                if others > 0:
+                    sent = now + (reset or self.period) - self.period
+                    bisect.insort(self.booked, [sent, others])
+
+    def pause(self, seconds):
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+# ----------------- Rate Limiter -----------------
+class RateLimiter:
+    """Client-side admission for one model's quota: requests and tokens a ``period``.
+
+    A request is charged its estimated prompt tokens plus ``max_tokens`` up
+    front, and ``settle()`` returns what the usage shows it did not spend.
+    ``observe()`` keeps both windows in line with the x-ratelimit headers,
+    and ``backoff()`` turns a 429 into a wait every caller honours.
+    """
+
+    def __init__(self, rpm=GROQ_RPM, tpm=GROQ_TPM, retries=RATE_LIMIT_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX, period=60.0):
+        self.requests = SlidingWindow(rpm, period)
+        self.tokens = SlidingWindow(tpm, period)
+        # until a response says what the quota is, one request goes at a time
+        self.learned = bool(tpm)
+        self.probe = None
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "rate_limited": 0, "waited": 0.0}
+
+    def cost(self, messages, max_tokens):
+        prompt = sum(count_tokens_estimate(str(m.get("content") or "")) for m in messages)
+        return prompt + (max_tokens or 0)
+
+    def admit(self, cost):
+        """Book a request of ``cost`` tokens if the quota has room: ``(wait, ticket)``.
+
+        With a ticket, send now; it goes to ``refund()`` or ``settle()``
+        afterwards. Without one (None), sleep ``wait`` seconds and ask again.
+        """
+        with self.lock:
+            if not self.learned and self.probe is not None:
+                wait = PROBE_POLL
+            else:
+                # settled requests give tokens back early, so a token wait is checked again sooner
+                wait = max(self.requests.room(1), min(self.tokens.room(cost), self.tokens.period * RECHECK))
+            if wait > 0:
+                self.stats["waited"] += wait
+                return wait, None
+            ticket = (self.requests.book(1), self.tokens.book(cost))
+            if not self.learned:
+                self.probe = ticket
+            self.stats["requests"] += 1
+        return 0.0, ticket
+
+    def refund(self, ticket):
+        # a refused request spent nothing
+        if ticket is None:
+            return
+        request, tokens = ticket
+        self.requests.give_back(request, request[1])
+        self.tokens.give_back(tokens, tokens[1])
+        with self.lock:
+            if self.probe is ticket:
+                self.probe = None
+
+    def settle(self, ticket, used):
+        # max_tokens is rarely spent in full; hand the rest back. None keeps
+        # the whole booking, for a request that may or may not have gone out.
+        if ticket is None:
+            return
+        tokens = ticket[1]
+        if used is not None and used < tokens[1]:
+            self.tokens.give_back(tokens, tokens[1] - used)
+        with self.lock:
+            if self.probe is ticket:
+                self.probe = None
+
+    def observe(self, headers):
+        limit = header_int(headers, "x-ratelimit-limit-tokens")
+        if not self.learned and limit and limit != self.tokens.capacity:
+            self.tokens.resize(limit)
+        self.tokens.sync(
+            header_int(headers, "x-ratelimit-remaining-tokens"),
+            parse_duration(headers.get("x-ratelimit-reset-tokens")),
+        )
+        # Groq counts requests per day here, so this rarely binds before it runs out
+        self.requests.sync(
+            header_int(headers, "x-ratelimit-remaining-requests"),
+            parse_duration(headers.get("x-ratelimit-reset-requests")),
+        )
+        with self.lock:
+            self.learned, self.probe = True, None
+
+    def backoff(self, attempt, headers):
+        """Seconds to wait after a 429 on retry ``attempt`` (0-based).
+
+        ``retry-after`` decides when sent, then the reset header of the
+        exhausted quota, then exponential backoff. Every caller waits that
+        long; this one adds jitter on top so the retries do not land together.
+        """
+        with self.lock:
+            self.stats["rate_limited"] += 1
+        wait = parse_duration(headers.get("retry-after"))
+        if wait is None:
+            resets = [
+                parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                for kind in ("tokens", "requests")
+                if header_int(headers, f"x-ratelimit-remaining-{kind}") == 0
+            ]
+            wait = max((r for r in resets if r), default=None)
+        if wait is None:
+            wait = self.backoff_base * 2 ** attempt
+        wait = min(wait, self.backoff_max)
+        self.requests.pause(wait)
+        wait += random.uniform(0, wait * JITTER)
+        with self.lock:
+            self.stats["waited"] += wait
+        return wait
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name):
+    # One per quota (Groq limits each model separately), shared by every
+    # session, batch worker and racing task in the process
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = RateLimiter()
+        return _limiters[name]
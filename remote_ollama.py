@@ -0,0 +1,150 @@
+import os
+import select
+import socketserver
+import threading
+
+import paramiko
+import requests
+
+# -------------------------
+# Remote Mac running Ollama
+# -------------------------
+# Host and user must be set; the password is only tried when the key fails
+MAC_IP = os.getenv("REMOTE_OLLAMA_HOST")
+USERNAME = os.getenv("REMOTE_OLLAMA_USER")
+PASSWORD = os.getenv("REMOTE_OLLAMA_PASSWORD")
+KEY_PATH = os.getenv("REMOTE_OLLAMA_KEY", os.path.expanduser(os.path.join("~", ".ssh", "id_rsa")))
+REMOTE_OLLAMA_PORT = int(os.getenv("REMOTE_OLLAMA_PORT", "11434"))
+
+MODEL = "llama3.1:8b"
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")   # how long the remote keeps the model loaded
+SSH_KEEPALIVE = 30   # seconds between SSH keepalive packets
+
+
+# -------------------------
+# Local port-forward over the SSH transport
+# -------------------------
+class _ForwardServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def _make_handler(transport, remote_port):
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            channel = transport.open_channel(
+                "direct-tcpip", ("127.0.0.1", remote_port), self.request.getpeername(),
+            )
+            try:
+                while True:
+                    ready, _, _ = select.select([self.request, channel], [], [])
+                    if self.request in ready:
+                        data = self.request.recv(16384)
+                        if not data:
+                            break
+                        channel.sendall(data)
+                    if channel in ready:
+                        data = channel.recv(16384)
+                        if not data:
+                            break
+                        self.request.sendall(data)
+            finally:
+                channel.close()
+
+    return Handler
+
+
+class RemoteOllama:
+    """One SSH transport and one port-forward to the Mac's Ollama HTTP API.
+
+    Lives for the whole process: requests reuse the SSH session, the local
+    HTTP keep-alive session and the loaded model instead of paying the
+    handshake, auth and model load every click.
+    """
+
+    def __init__(self, host=MAC_IP, username=USERNAME, password=PASSWORD, key_path=KEY_PATH,
+                 remote_port=REMOTE_OLLAMA_PORT, model=MODEL, keep_alive=KEEP_ALIVE):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.key_path = key_path
+        self.remote_port = remote_port
+        self.model = model
+        self.keep_alive = keep_alive
+        self.ssh = None
+        self.server = None
+        self.session = requests.Session()
+        self.lock = threading.Lock()
+
+    # --- connection ---
+    def connect(self):
+        missing = [name for name, value in (("REMOTE_OLLAMA_HOST", self.host), ("REMOTE_OLLAMA_USER", self.username))
+                   if not value]
+        if missing:
+            raise RuntimeError(f"set {' and '.join(missing)} to reach the remote Ollama")
+        ssh = paramiko.SSHClient()
+        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        try:
+            # ✅ Try SSH key first
+            if os.path.exists(self.key_path):
+                ssh.connect(self.host, username=self.username, key_filename=self.key_path, timeout=10)
+            else:
+                raise FileNotFoundError(f"SSH key not found: {self.key_path}")
+        except Exception as e:
+            # 🔑 Fallback to password
+            if not self.password:
+                raise RuntimeError(
+                    f"SSH key login to {self.host} failed ({e}) and REMOTE_OLLAMA_PASSWORD is not set"
+                ) from e
+            ssh.connect(self.host, username=self.username, password=self.password, timeout=10)
+
+        transport = ssh.get_transport()
+        transport.set_keepalive(SSH_KEEPALIVE)
+        server = _ForwardServer(("127.0.0.1", 0), _make_handler(transport, self.remote_port))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.ssh, self.server = ssh, server
+
+    def ensure_connected(self):
+        with self.lock:
+            transport = self.ssh.get_transport() if self.ssh else None
+            if transport is not None and transport.is_active():
+                return
+            self.close()
+            self.connect()
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.ssh is not None:
+            self.ssh.close()
+            self.ssh = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    # --- Ollama API ---
+    def warm(self):
+        # An empty generate loads the model and pins it for keep_alive
+        self.ensure_connected()
+        response = self.session.post(
+            f"{self.base_url}/api/generate",
+            json={"model": self.model, "keep_alive": self.keep_alive},
+            timeout=300,
+        )
+        response.raise_for_status()
+
+
+_remote = None
+_remote_lock = threading.Lock()
+
+
+def get_remote_ollama():
+    # One remote backend per process, shared by every session and rerun
+    global _remote
+    with _remote_lock:
+        if _remote is None:
+            _remote = RemoteOllama()
+        return _remote
@@ -0,0 +1,186 @@
+"""Per-stage timings of planning runs, one JSON line per run.
+
+Summarize the log with: python -m request_log [LOG_PATH]
+"""
+import glob
+import json
+import logging
+import logging.handlers
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# ----------------- Settings -----------------
+# requests.jsonl in the repo root is the work backlog, so runs go elsewhere
+LOG_PATH = os.getenv("PLANNER_REQUEST_LOG", "logs/planner_requests.jsonl")
+MAX_BYTES = int(os.getenv("PLANNER_REQUEST_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+BACKUP_COUNT = int(os.getenv("PLANNER_REQUEST_LOG_BACKUPS", "5"))
+
+STAGES = [
+    "upload_parse", "prompt_build", "tokenization", "time_to_first_token",
+    "generation", "json_extraction", "validation", "repair", "render",
+]
+
+
+# ----------------- Run Record -----------------
+class RunLog:
+    """Collects one planning run: metadata, stage durations, failures.
+
+    ``with run.stage("prompt_build"): ...`` times a block; repeated stages
+    add up. ``write()`` appends the record to the request log.
+    """
+
+    def __init__(self, **fields):
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()   # sharded runs report from worker threads
+        self.record = {
+            "run_id": uuid.uuid4().hex,
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "cache_hit": False,
+            "prompt_tokens": None,
+            "completion_tokens": None,
+            "failure": None,
+            **fields,
+            "stages": {},
+        }
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        if seconds is None:
+            return
+        with self.lock:
+            stages = self.record["stages"]
+            stages[name] = round(stages.get(name, 0) + seconds, 6)
+
+    def add_tokens(self, prompt_tokens=None, completion_tokens=None):
+        with self.lock:
+            for field, value in (("prompt_tokens", prompt_tokens), ("completion_tokens", completion_tokens)):
+                if value is not None:
+                    self.record[field] = (self.record[field] or 0) + value
+
+    def add_result(self, result):
+        """Token usage and model timings from a backends.LLMResult."""
+        self.add_tokens(result.prompt_tokens, result.completion_tokens)
+        first_token = result.time_to_first_token
+        self.add("time_to_first_token", first_token)
+        self.add("generation", (result.seconds or 0) - (first_token or 0))
+
+    def set(self, **fields):
+        self.record.update(fields)
+
+    def fail(self, kind, detail=""):
+        self.record["failure"] = {"type": kind, "detail": str(detail)[:500]}
+
+    def write(self, path=None):
+        self.record["total_seconds"] = round(time.perf_counter() - self.started, 6)
+        log_request(self.record, path)
+        return self.record
+
+
+# ----------------- Log File -----------------
+_loggers = {}
+_lock = threading.Lock()
+
+
+def get_logger(path=LOG_PATH):
+    # A size-rotated file per path; the handler serializes concurrent writes
+    with _lock:
+        if path not in _loggers:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            logger = logging.getLogger(f"planner.requests.{path}")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT, encoding="utf-8",
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            _loggers[path] = logger
+    return _loggers[path]
+
+
+def log_request(record, path=None):
+    get_logger(path or LOG_PATH).info(json.dumps(record, default=str))
+
+
+def read_records(path=LOG_PATH):
+    # Oldest rotated file first, then the live one
+    paths = sorted(glob.glob(f"{glob.escape(path)}.[0-9]*"), key=lambda p: -int(p.rsplit(".", 1)[1]))
+    records = []
+    for p in paths + [path]:
+        if not os.path.exists(p):
+            continue
+        with open(p, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        pass   # a line cut short by a crash
+    return records
+
+
+# ----------------- Summary -----------------
+def percentile(values, q):
+    # Nearest-rank percentile; no numpy needed for a few thousand runs
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(records):
+    """p50/p95 per stage plus run, failure, cache-hit and race-win counts."""
+    names = STAGES + sorted({s for r in records for s in r.get("stages", {})} - set(STAGES) - {"total"})
+    stages = {}
+    for name in names + ["total"]:
+        if name == "total":
+            values = [r["total_seconds"] for r in records if r.get("total_seconds") is not None]
+        else:
+            values = [r["stages"][name] for r in records if name in r.get("stages", {})]
+        if values:
+            stages[name] = {"count": len(values), "p50": percentile(values, 50), "p95": percentile(values, 95)}
+    failures = {}
+    race_wins = {}
+    for r in records:
+        if r.get("failure"):
+            kind = r["failure"].get("type", "unknown")
+            failures[kind] = failures.get(kind, 0) + 1
+        winner = (r.get("race") or {}).get("winner")
+        if winner:
+            race_wins[winner] = race_wins.get(winner, 0) + 1
+    return {
+        "runs": len(records),
+        "cache_hits": sum(1 for r in records if r.get("cache_hit")),
+        "failures": failures,
+        "race_wins": race_wins,
+        "stages": stages,
+    }
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else LOG_PATH
+    summary = summarize(read_records(path))
+    print(f"{summary['runs']} runs, {summary['cache_hits']} cache hits, failures: {summary['failures'] or 'none'}")
+    if summary["race_wins"]:
+        print(f"race wins: {summary['race_wins']}")
+    print(f"{'stage':<22}{'runs':>6}{'p50 s':>10}{'p95 s':>10}")
+    for name, s in summary["stages"].items():
+        print(f"{name:<22}{s['count']:>6}{s['p50']:>10.3f}{s['p95']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import hashlib
+import io
+import json
+
+import pandas as pd
+import streamlit as st
+
+COLUMNS = {
+    "driver_id": "Driver ID",
+    "job_id": "Job ID",
+    "pickup_zone": "Pickup Zone",
+    "dropoff_zone": "Dropoff Zone",
+}
+
+
+# ----------------- Table -----------------
+def assignments_frame(response_json):
+    # One row per job, built in a single json_normalize pass
+    assignments = [a for a in (response_json or {}).get("assignments", []) if a.get("jobs")]
+    if not assignments:
+        return pd.DataFrame(columns=list(COLUMNS.values()))
+    df = pd.json_normalize(assignments, record_path="jobs", meta=["driver_id"], meta_prefix="driver.")
+    df["driver_id"] = df.pop("driver.driver_id")
+    for column in COLUMNS:
+        if column not in df.columns:
+            df[column] = None
+    return df[list(COLUMNS)].rename(columns=COLUMNS)
+
+
+def to_parquet_bytes(df):
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+# ----------------- Results View -----------------
+def render_results(response_json, key="results", plan_id=None):
+    """Show a plan as one grid with a selection column and bulk assign.
+
+    Assigned job ids live in ``st.session_state[f"{key}_assigned"]`` so they
+    survive the rerun every widget click triggers; callers keep the plan
+    there too, for the same reason. ``plan_id`` (the plan's
+    cache key, else a digest of the plan) is part of the grid's widget key,
+    so ticks made on one plan are not carried over to the next.
+    """
+    if plan_id is None:
+        plan_id = hashlib.sha1(json.dumps(response_json, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    assigned_key = f"{key}_assigned"
+    assigned = st.session_state.setdefault(assigned_key, set())
+
+    df = assignments_frame(response_json)
+    st.write("### Job Assignments")
+    if df.empty:
+        st.info("No assignments to show.")
+        return df
+
+    grid = df.copy()
+    grid.insert(0, "Select", False)
+    grid["Assigned"] = grid["Job ID"].isin(assigned)
+
+    edited = st.data_editor(
+        grid,
+        key=f"{key}_grid_{plan_id}",
+        hide_index=True,
+        width="stretch",
+        disabled=[c for c in grid.columns if c != "Select"],
+        column_config={
+            "Select": st.column_config.CheckboxColumn("Select", help="Pick rows to assign"),
+            "Assigned": st.column_config.CheckboxColumn("Assigned"),
+        },
+    )
+
+    selected = edited[edited["Select"]]
+    if st.button(f"Assign selected ({len(selected)})", key=f"{key}_assign", disabled=selected.empty):
+        assigned.update(selected["Job ID"])
+        st.success(f"✅ Assigned {len(selected)} jobs across {selected['Driver ID'].nunique()} drivers")
+        st.rerun()
+
+    export_cols = st.columns(2)
+    export_cols[0].download_button(
+        "Download CSV",
+        data=df.to_csv(index=False),
+        file_name="assignments.csv",
+        mime="text/csv",
+        key=f"{key}_csv",
+    )
+    export_cols[1].download_button(
+        "Download Parquet",
+        data=to_parquet_bytes(df),
+        file_name="assignments.parquet",
+        mime="application/octet-stream",
+        key=f"{key}_parquet",
+    )
+    return df
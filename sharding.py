@@ -0,0 +1,127 @@
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from planning import DEFAULT_OUTPUT, build_prompt, decode_plan, request_plan
+from prompt_encoder import DEFAULT_FORMAT
+from solver import MAX_JOBS_PER_DRIVER, normalize_job, zone_components
+
+# Components are packed together until a shard holds this many jobs, so a
+# depot with many tiny zone islands still makes a handful of calls
+SHARD_SIZE = 150
+MAX_WORKERS = 4
+
+
+# ----------------- Shards -----------------
+def make_shards(jobs, shard_size=SHARD_SIZE):
+    # Jobs in different zone components can never share a driver. Biggest
+    # components first, first-fit into shards of at most shard_size jobs. A
+    # component bigger than shard_size is cut into shard_size pieces: chains
+    # across the cut are lost, but one call never outgrows max_tokens.
+    groups = []
+    for items in sorted(zone_components(jobs), key=len, reverse=True):
+        group = [jobs[i] for i in items]
+        groups.extend(group[i:i + shard_size] for i in range(0, len(group), shard_size))
+
+    shards = []
+    for group in groups:
+        for shard in shards:
+            if len(shard) + len(group) <= shard_size:
+                shard.extend(group)
+                break
+        else:
+            shards.append(list(group))
+    return shards
+
+
+def allocate_drivers(shards, drivers_json, max_jobs=MAX_JOBS_PER_DRIVER):
+    """Split the driver list into disjoint slices, one per shard.
+
+    Every shard first gets the drivers it needs to fit its jobs at
+    ``max_jobs`` each (as far as drivers last), spare drivers are then
+    handed out in proportion to shard size. With fewer drivers than the
+    shards need, the largest shards are served first and small ones may
+    get none.
+    """
+    need = [math.ceil(len(shard) / max_jobs) for shard in shards]
+    total = len(drivers_json)
+    if sum(need) > total:
+        # not enough drivers: scale every shard down, the rounding
+        # remainder goes to the largest shards
+        scale = total / sum(need)
+        need = [math.floor(n * scale) for n in need]
+        for n in sorted(range(len(need)), key=lambda n: -len(shards[n]))[:total - sum(need)]:
+            need[n] += 1
+    else:
+        spare = total - sum(need)
+        jobs_total = sum(len(shard) for shard in shards) or 1
+        extra = [spare * len(shard) // jobs_total for shard in shards]
+        extra[0] += spare - sum(extra)
+        need = [n + e for n, e in zip(need, extra)]
+
+    slices, start = [], 0
+    for n in need:
+        slices.append(drivers_json[start:start + n])
+        start += n
+    return slices
+
+
+# ----------------- Sharded Planning -----------------
+def plan_sharded(backend, drivers_json, jobs_json, user_prompt,
+                 shard_size=SHARD_SIZE, max_workers=MAX_WORKERS, fmt=DEFAULT_FORMAT, run=None,
+                 output=DEFAULT_OUTPUT):
+    """Plan each zone shard with its own concurrent Groq call and merge.
+
+    Returns ``(response_json, shard_stats)``. Each shard only sees its own
+    slice of drivers; assignments naming any other driver are dropped and
+    their jobs reported in ``unassigned``, so two shards can never hand work
+    to the same driver. ``run`` sums model time and tokens over all shards.
+    """
+    jobs = [normalize_job(j) for j in jobs_json]
+    shards = make_shards(jobs, shard_size)
+    if not shards:
+        return {"assignments": [], "unassigned": []}, []
+    driver_slices = allocate_drivers(shards, drivers_json)
+    # Only short of drivers does a shard get none, and then no other shard
+    # has room for its jobs either: they are unassigned without a call
+    left_over = [job for shard, drivers in zip(shards, driver_slices) if not drivers for job in shard]
+    if not any(driver_slices):
+        return {"assignments": [], "unassigned": left_over}, []
+    shards, driver_slices = zip(*[(s, d) for s, d in zip(shards, driver_slices) if d])
+
+    def run_shard(args):
+        n, shard, drivers = args
+        start = time.time()
+        prompt, zones = build_prompt(drivers, shard, user_prompt, fmt=fmt, output=output)
+        response_json, response_text, result = request_plan(backend, prompt, run=run, output=output)
+        response_json = decode_plan(response_json, zones, shard)
+        return response_json, {
+            "shard": n,
+            "jobs": len(shard),
+            "drivers": len(drivers),
+            "prompt_tokens": result.prompt_tokens,
+            "completion_tokens": result.completion_tokens,
+            "seconds": time.time() - start,
+            "parsed": response_json is not None,
+        }
+
+    work = [(n, shard, drivers) for n, (shard, drivers) in enumerate(zip(shards, driver_slices))]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(run_shard, work))
+
+    assignments, unassigned, stats = [], left_over, []
+    for (n, shard, drivers), (response_json, shard_stats) in zip(work, results):
+        stats.append(shard_stats)
+        if not response_json:
+            unassigned.extend(shard)
+            continue
+        allowed = {d["driver_id"] for d in drivers}
+        placed = set()
+        for entry in response_json.get("assignments", []):
+            if entry.get("driver_id") in allowed:
+                allowed.discard(entry["driver_id"])
+                assignments.append(entry)
+                placed.update(job.get("job_id") for job in entry.get("jobs", []))
+        unassigned.extend(job for job in shard if job["job_id"] not in placed)
+
+    return {"assignments": assignments, "unassigned": unassigned}, stats
@@ -0,0 +1,462 @@
+import math
+import numbers
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import pandas as pd
+
+# ----------------- Planning rules -----------------
+# Same rules the LLM prompts spell out:
+# - Each driver max 3 jobs.
+# - Next pickup_zone must equal previous dropoff_zone.
+# - Assign ALL jobs so none are left unassigned.
+MAX_JOBS_PER_DRIVER = 3
+
+# How many queued candidates to look at when picking the next job of a chain
+LOOKAHEAD = 8
+# Zone-connected groups up to this many jobs are chained by exact search when
+# the greedy pass may have missed the minimum; bounded path cover is NP-hard,
+# so larger groups, and a search past EXACT_STEPS (about a millisecond), keep
+# the greedy chains
+EXACT_JOBS = 12
+EXACT_STEPS = 1000
+
+# Column spellings seen in resources/Jobs.csv, Json/jobs.json and the
+# normalized records built in assignJob.py
+JOB_KEYS = {
+    "job_id": "job_id",
+    "pickup_zone": "pickup_zone",
+    "pickup zone": "pickup_zone",
+    "dropoff_zone": "dropoff_zone",
+    "dropoff zone": "dropoff_zone",
+    "pickup_datetime": "pickup_datetime",
+    "delivery_datetime": "delivery_datetime",
+}
+
+
+def normalize_job(record):
+    job = {}
+    for key, value in record.items():
+        # already-normalized keys skip the strip/lower
+        name = JOB_KEYS.get(key) or JOB_KEYS.get(str(key).strip().lower())
+        if name:
+            job[name] = value
+    missing = [k for k in ("job_id", "pickup_zone", "dropoff_zone") if k not in job]
+    if missing:
+        raise ValueError(f"job record is missing {', '.join(missing)}: {record}")
+    return job
+
+
+# ----------------- Time windows -----------------
+def to_timestamp(value):
+    """Seconds since the epoch for a datetime, date string or number; None if unset.
+
+    Times without a zone are read as UTC whatever their format, so a file
+    that mixes ISO and other spellings keeps one clock. Numbers are taken
+    as epoch seconds already. A value that cannot be read counts as unset
+    rather than failing the plan.
+    """
+    if value is None or pd.isna(value):   # None, NaN, pd.NA from string columns
+        return None
+    if isinstance(value, numbers.Real) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        value = value.strip()
+        if not value:
+            return None
+        try:
+            # ISO is the common case and much faster than pandas' parser
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            value = pd.to_datetime(value, errors="coerce")
+            return None if pd.isna(value) else value.timestamp()
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    # pandas reads naive datetimes as UTC too
+    return pd.Timestamp(value).timestamp()
+
+
+def job_times(job):
+    """``(pickup, delivery)`` timestamps with missing times left permissive.
+
+    A missing pickup sorts last and may follow anything; a missing delivery
+    may be followed by anything. Jobs without datetimes chain on zones alone.
+    """
+    pickup = to_timestamp(job.get("pickup_datetime"))
+    delivery = to_timestamp(job.get("delivery_datetime"))
+    return (math.inf if pickup is None else pickup), (-math.inf if delivery is None else delivery)
+
+
+def job_time_columns(jobs):
+    # (pickups, deliveries) as two flat lists, cheaper than a tuple per job
+    pickups, deliveries = [], []
+    for job in jobs:
+        pickup, delivery = job_times(job)
+        pickups.append(pickup)
+        deliveries.append(delivery)
+    return pickups, deliveries
+
+
+def _find(skip, p):
+    # First free position at or after p; skip[p] == p marks a free slot
+    root = p
+    while skip[root] != root:
+        root = skip[root]
+    while skip[p] != root:
+        skip[p], p = root, skip[p]
+    return root
+
+
+class ZoneTimeIndex:
+    """Items per zone sorted by time, with removal.
+
+    ``candidates(zone, after)`` bisects to the first item at or after
+    ``after`` and walks forward over items not yet taken; a union-find skip
+    list makes taken items cost nothing to step over, so finding a
+    successor is O(log n) instead of a scan of every job in the zone.
+    """
+
+    def __init__(self, zones, times):
+        # item i sits in zones[i] at times[i]
+        by_zone = defaultdict(list)
+        for item, zone in enumerate(zones):
+            by_zone[zone].append(item)
+        self.zones = zones
+        self.times, self.items, self.skip = {}, {}, {}
+        self.position = [0] * len(zones)
+        for zone, items in by_zone.items():
+            items.sort(key=times.__getitem__)
+            self.items[zone] = items
+            self.times[zone] = [times[i] for i in items]
+            self.skip[zone] = list(range(len(items) + 1))
+            for pos, item in enumerate(items):
+                self.position[item] = pos
+        self.taken = [False] * len(zones)
+
+    def first(self, zone, after):
+        times = self.times.get(zone)
+        if not times:
+            return None
+        p = _find(self.skip[zone], bisect_left(times, after))
+        return self.items[zone][p] if p < len(times) else None
+
+    def candidates(self, zone, after, limit=None):
+        times = self.times.get(zone)
+        if not times:
+            return
+        items, skip = self.items[zone], self.skip[zone]
+        p = _find(skip, bisect_left(times, after))
+        found = 0
+        while p < len(items) and (limit is None or found < limit):
+            yield items[p]
+            found += 1
+            p = _find(skip, p + 1)
+
+    def take(self, item):
+        self.taken[item] = True
+        pos = self.position[item]
+        self.skip[self.zones[item]][pos] = pos + 1
+
+
+# ----------------- Chaining -----------------
+def zone_components(jobs):
+    """Job indexes grouped by connected zones; no chain crosses two groups."""
+    parent = {}
+
+    def root(zone):
+        parent.setdefault(zone, zone)
+        while parent[zone] != zone:
+            parent[zone] = parent[parent[zone]]
+            zone = parent[zone]
+        return zone
+
+    for job in jobs:
+        a, b = root(job["pickup_zone"]), root(job["dropoff_zone"])
+        if a != b:
+            parent[a] = b
+    groups = defaultdict(list)
+    for i, job in enumerate(jobs):
+        groups[root(job["pickup_zone"])].append(i)
+    return list(groups.values())
+
+
+class _OverBudget(Exception):
+    pass
+
+
+def exact_chains(jobs, items, max_jobs, time_columns, max_steps=None):
+    """Fewest chains covering the job indexes ``items``, by exhaustive search.
+
+    Every feasible chain of two to ``max_jobs`` jobs is listed, then a
+    memoized search over the uncovered set always covers the lowest job
+    next, either alone or in a chain whose lowest index it is. Returns None
+    once listing and searching took more than ``max_steps`` (EXACT_STEPS)
+    steps.
+    """
+    pickups, deliveries = time_columns
+    n = len(items)
+    follows = [
+        [b for b in range(n) if b != a
+         and jobs[items[a]]["dropoff_zone"] == jobs[items[b]]["pickup_zone"]
+         and pickups[items[b]] >= deliveries[items[a]]]
+        for a in range(n)
+    ]
+    by_lowest = [[] for _ in range(n)]
+    steps = [EXACT_STEPS if max_steps is None else max_steps]
+
+    def step():
+        steps[0] -= 1
+        if steps[0] < 0:
+            raise _OverBudget
+
+    def extend(path, mask):
+        if len(path) > 1:
+            step()
+            by_lowest[min(path)].append((path, mask))
+        if len(path) < max_jobs:
+            for b in follows[path[-1]]:
+                if not mask >> b & 1:
+                    extend(path + [b], mask | 1 << b)
+
+    @lru_cache(maxsize=None)
+    def best(covered):
+        # (links, chains) for the jobs not in ``covered``; more links, fewer chains
+        if covered == (1 << n) - 1:
+            return 0, ()
+        low = next(i for i in range(n) if not covered >> i & 1)
+        links, rest = best(covered | 1 << low)
+        choice = (links, ((low,),) + rest)
+        for path, mask in by_lowest[low]:
+            step()
+            if not covered & mask:
+                links, rest = best(covered | mask)
+                if links + len(path) - 1 > choice[0]:
+                    choice = (links + len(path) - 1, (tuple(path),) + rest)
+        return choice
+
+    try:
+        for a in range(n):
+            extend([a], 1 << a)
+        chains = best(0)[1]
+    except _OverBudget:
+        return None
+    return [[items[i] for i in path] for path in chains]
+
+
+def chains_lower_bound(jobs, items, max_jobs, time_columns):
+    """No cover of ``items`` has fewer chains than this.
+
+    A chain holds at most ``max_jobs`` jobs, starts at every job no other
+    job can hand over to and ends at every job that cannot hand over.
+    """
+    pickups, deliveries = time_columns
+
+    def hands_over(a, b):
+        return a != b and jobs[a]["dropoff_zone"] == jobs[b]["pickup_zone"] and pickups[b] >= deliveries[a]
+
+    heads = sum(1 for b in items if not any(hands_over(a, b) for a in items))
+    tails = sum(1 for a in items if not any(hands_over(a, b) for b in items))
+    return max(-(-len(items) // max_jobs), heads, tails)
+
+
+def build_chains(jobs, max_jobs=MAX_JOBS_PER_DRIVER):
+    """Bounded path cover: greedy, made exact for small groups where it may not be.
+
+    Returns a list of chains (lists of indexes into ``jobs``) that together
+    cover every job, each at most ``max_jobs`` long, zone-consistent and
+    time-feasible: every pickup is at or after the previous delivery.
+    A greedy pass over a per-zone pickup-time index chains everything; a
+    zone-connected group of up to EXACT_JOBS jobs whose greedy chains are
+    above :func:`chains_lower_bound` is searched exactly, within
+    EXACT_STEPS. Other groups may use more chains than the minimum.
+    """
+    time_columns = job_time_columns(jobs)
+    greedy = greedy_chains(jobs, max_jobs, time_columns)
+    groups = zone_components(jobs)
+    if all(len(items) > EXACT_JOBS for items in groups):
+        return greedy
+
+    group_of = {}
+    for g, items in enumerate(groups):
+        for i in items:
+            group_of[i] = g
+    found = defaultdict(list)
+    for chain in greedy:
+        found[group_of[chain[0]]].append(chain)
+    chains = []
+    for g, items in enumerate(groups):
+        if len(items) <= EXACT_JOBS and len(found[g]) > chains_lower_bound(jobs, items, max_jobs, time_columns):
+            # None: too many ways to chain them; the greedy chains stay
+            exact = exact_chains(jobs, items, max_jobs, time_columns)
+            if exact is not None and len(exact) < len(found[g]):
+                found[g] = exact
+        chains.extend(found[g])
+    return chains
+
+
+def greedy_chains(jobs, max_jobs, time_columns):
+    # Chains grown one successor at a time, then joined end to end
+    pickups, deliveries = time_columns
+    dropoffs = [job["dropoff_zone"] for job in jobs]
+    index = ZoneTimeIndex([job["pickup_zone"] for job in jobs], pickups)
+
+    chains = []
+    dropoff_count = defaultdict(int)
+    for zone in dropoffs:
+        dropoff_count[zone] += 1
+
+    def next_job(tail, room):
+        if room <= 1:
+            return index.first(dropoffs[tail], deliveries[tail])
+        first = None
+        for i in index.candidates(dropoffs[tail], deliveries[tail], LOOKAHEAD):
+            if first is None:
+                first = i
+            # prefer a successor that can itself be extended
+            if any(j != i for j in index.candidates(dropoffs[i], deliveries[i], 2)):
+                return i
+        return first
+
+    # Jobs nobody can hand over to make the best chain heads, so start
+    # there; earliest pickups first so chains run forward in time
+    order = sorted(
+        range(len(jobs)),
+        key=lambda i: (dropoff_count.get(jobs[i]["pickup_zone"], 0) > 0, pickups[i]),
+    )
+
+    for start in order:
+        if index.taken[start]:
+            continue
+        index.take(start)
+        chain = [start]
+        while len(chain) < max_jobs:
+            i = next_job(chain[-1], max_jobs - len(chain))
+            if i is None:
+                break
+            index.take(i)
+            chain.append(i)
+        chains.append(chain)
+    return join_chains(jobs, chains, max_jobs, (pickups, deliveries))
+
+
+def join_chains(jobs, chains, max_jobs=MAX_JOBS_PER_DRIVER, time_columns=None):
+    # A chain that ended early can still hand over to a chain built before it
+    pickups, deliveries = time_columns or job_time_columns(jobs)
+    heads = ZoneTimeIndex(
+        [jobs[chain[0]]["pickup_zone"] if len(chain) < max_jobs else None for chain in chains],
+        [pickups[chain[0]] for chain in chains],
+    )
+
+    for c, chain in enumerate(chains):
+        if not chain or len(chain) >= max_jobs:
+            continue
+        tail = chain[-1]
+        for other in heads.candidates(jobs[tail]["dropoff_zone"], deliveries[tail]):
+            if other != c and chains[other] and len(chain) + len(chains[other]) <= max_jobs:
+                chain.extend(chains[other])
+                chains[other] = []
+                heads.take(other)
+                break
+    return [chain for chain in chains if chain]
+
+
+# ----------------- Assignment -----------------
+def solve_assignments(drivers, jobs, max_jobs=MAX_JOBS_PER_DRIVER):
+    """Plan ``jobs`` onto ``drivers`` without calling a model.
+
+    Takes the same ``drivers_json`` / ``jobs_json`` records the prompts embed
+    and returns ``{"assignments": [...], "unassigned": [...]}``. Jobs only end
+    up in ``unassigned`` when :func:`build_chains` made more chains than
+    there are drivers; outside the exact search that count is greedy, not
+    minimal.
+    """
+    jobs = [normalize_job(j) for j in jobs]
+    driver_ids = [d["driver_id"] if isinstance(d, dict) else d for d in drivers]
+
+    # Longest chains first so a short driver list still covers most jobs
+    chains = sorted(build_chains(jobs, max_jobs), key=len, reverse=True)
+
+    assignments = []
+    for driver_id, chain in zip(driver_ids, chains):
+        assignments.append({
+            "driver_id": driver_id,
+            "jobs": [jobs[i] for i in chain],
+        })
+
+    unassigned = [jobs[i] for chain in chains[len(driver_ids):] for i in chain]
+    return {"assignments": assignments, "unassigned": unassigned}
+
+
+# ----------------- Incremental -----------------
+def lock_prefixes(assignments, jobs, committed=None):
+    """Keep the still-valid head of every driver's chain from an earlier plan.
+
+    A chain is cut at the first job that was cancelled (missing from
+    ``jobs``) or whose zones changed; with ``committed`` (driver id -> job
+    count) it is also cut after that many jobs. ``jobs`` is the full current
+    job list, normalized once per call. Returns ``(locked_assignments,
+    pool)``: ``pool`` holds every job of ``jobs`` that is not locked,
+    including everything after a cut.
+    """
+    live = {}
+    for record in jobs:
+        job = normalize_job(record)
+        live[job["job_id"]] = job
+
+    locked, locked_ids = [], set()
+    for entry in assignments:
+        driver_id = entry.get("driver_id")
+        limit = len(entry.get("jobs", [])) if committed is None else committed.get(driver_id, 0)
+        kept = []
+        for item in entry.get("jobs", [])[:limit]:
+            job = live.get(item.get("job_id"))
+            if job is None or job["job_id"] in locked_ids or \
+                    (item.get("pickup_zone"), item.get("dropoff_zone")) != (job["pickup_zone"], job["dropoff_zone"]):
+                break
+            kept.append(job)
+            locked_ids.add(job["job_id"])
+        if kept:
+            locked.append({"driver_id": driver_id, "jobs": kept})
+    pool = [job for job_id, job in live.items() if job_id not in locked_ids]
+    return locked, pool
+
+
+def extend_tails(locked, drivers, jobs, max_jobs=MAX_JOBS_PER_DRIVER):
+    """Place ``jobs`` after the locked chains, then onto idle drivers.
+
+    Every locked chain's tail is looked up in a zone index of ``jobs``, so
+    a pass is linear in the number of drivers plus ``jobs``; it is cheap
+    when ``jobs`` is the small unlocked pool, not when it is the whole day.
+    Returns ``{"assignments": [...], "unassigned": [...]}`` with the locked
+    jobs first in every chain.
+    """
+    jobs = [normalize_job(j) for j in jobs]
+    index = ZoneTimeIndex([job["pickup_zone"] for job in jobs], job_time_columns(jobs)[0])
+    chains = {entry["driver_id"]: list(entry["jobs"]) for entry in locked}
+
+    # --- Extend chain tails ---
+    for driver_id, chain in chains.items():
+        while len(chain) < max_jobs:
+            tail = chain[-1]
+            i = index.first(tail["dropoff_zone"], job_times(tail)[1])
+            if i is None:
+                break
+            index.take(i)
+            chain.append(jobs[i])
+
+    # --- New chains for idle drivers ---
+    rest = [i for i in range(len(jobs)) if not index.taken[i]]
+    new_chains = sorted(build_chains([jobs[i] for i in rest], max_jobs), key=len, reverse=True)
+    idle = (d["driver_id"] if isinstance(d, dict) else d for d in drivers)
+    idle = [driver_id for driver_id in idle if driver_id not in chains]
+    for driver_id, chain in zip(idle, new_chains):
+        chains[driver_id] = [jobs[rest[i]] for i in chain]
+
+    unassigned = [jobs[rest[i]] for chain in new_chains[len(idle):] for i in chain]
+    return {
+        "assignments": [{"driver_id": d, "jobs": chain} for d, chain in chains.items()],
+        "unassigned": unassigned,
+    }
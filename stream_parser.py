@@ -0,0 +1,79 @@
+import json
+
+
+class AssignmentStreamParser:
+    """Pull driver objects out of a plan while it is still being generated.
+
+    Feed text chunks as they arrive; ``feed`` returns every driver object
+    that completed in that chunk. Both plan shapes used by the prompts work:
+    a bare ``[{"driver_id": ..., "jobs": [...]}, ...]`` array and
+    ``{"assignments": [...]}``. Anything before the first bracket (chatter,
+    markdown fences) is skipped.
+    """
+
+    def __init__(self, list_key="assignments"):
+        self.list_key = list_key
+        self.text = ""
+        self.pos = 0
+        self.started = False
+        self.stack = []          # [kind, start, key] per open container
+        self.in_string = False
+        self.escape = False
+        self.string_start = 0
+        self.last_string = None
+        self.pending_key = None
+        self.done = False
+
+    def feed(self, chunk):
+        self.text += chunk
+        found = []
+        text = self.text
+        for i in range(self.pos, len(text)):
+            ch = text[i]
+            if self.done:
+                break
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    self.last_string = text[self.string_start:i]
+                continue
+            if not self.started:
+                if ch not in "{[":
+                    continue
+                self.started = True
+            if ch == '"':
+                self.in_string = True
+                self.string_start = i + 1
+            elif ch == ":":
+                self.pending_key = self.last_string
+            elif ch == ",":
+                self.pending_key = None
+            elif ch in "{[":
+                parent_is_object = self.stack and self.stack[-1][0] == "{"
+                key = self.pending_key if parent_is_object else None
+                self.stack.append([ch, i, key])
+                self.pending_key = None
+            elif ch in "}]":
+                if not self.stack:
+                    continue
+                kind, start, key = self.stack.pop()
+                if kind == "{" and self.is_driver_slot():
+                    try:
+                        found.append(json.loads(text[start:i + 1]))
+                    except json.JSONDecodeError:
+                        pass
+                if not self.stack:
+                    self.done = True
+        self.pos = len(text)
+        return found
+
+    def is_driver_slot(self):
+        # The object just closed sits directly in the root array or in the
+        # array stored under list_key
+        if not self.stack or self.stack[-1][0] != "[":
+            return False
+        return len(self.stack) == 1 or self.stack[-1][2] == self.list_key
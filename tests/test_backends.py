@@ -0,0 +1,63 @@
+import asyncio
+import threading
+import time
+
+from backends import GroqBackend, LimitedBackend
+from rate_limit import RateLimiter
+
+
+class SlowBackend:
+    async def acomplete(self, *args, **kwargs):
+        await asyncio.sleep(0.05)
+        return "done"
+
+
+def test_cancelled_wait_for_a_slot_gives_the_slot_back():
+    limiter = threading.BoundedSemaphore(1)
+    backend = LimitedBackend(SlowBackend(), limiter)
+
+    async def race():
+        limiter.acquire()
+        waiting = asyncio.ensure_future(backend.acomplete([]))
+        await asyncio.sleep(0.05)
+        # the losing task is cancelled while its thread still waits for the slot
+        waiting.cancel()
+        limiter.release()
+        await asyncio.sleep(0.1)
+
+    asyncio.run(race())
+    assert limiter.acquire(blocking=False)
+
+
+class FakeChunk:
+    def __init__(self, content):
+        self.choices = [type("Choice", (), {"finish_reason": None, "delta": type("Delta", (), {"content": content})})]
+
+
+class FakeSDKStream:
+    closed = False
+
+    def __iter__(self):
+        for k in range(10):
+            yield FakeChunk(f"part {k} ")
+
+    def close(self):
+        self.closed = True
+
+
+def test_groq_stream_stopped_early_is_closed_and_settled():
+    limiter = RateLimiter(rpm=10, tpm=0, period=60.0)
+    backend = GroqBackend("mock", api_key="mock", limiter=limiter)
+    sdk_stream = FakeSDKStream()
+    wait, ticket = limiter.admit(100)
+
+    def create(request, stream=False):
+        return sdk_stream, ticket, time.time()
+
+    backend.create = create
+    with backend.stream([{"role": "user", "content": "plan"}]) as stream:
+        for content in stream:
+            break
+    assert sdk_stream.closed
+    # the first request's ticket is no longer pending, so the next one is admitted
+    assert limiter.admit(100)[1] is not None
@@ -0,0 +1,62 @@
+import argparse
+import asyncio
+import time
+
+from backends import GroqBackend
+from benchmarks.rate_limit import run_mode, start_mock
+from rate_limit import RateLimiter, SlidingWindow
+
+
+def stand_in_args(**overrides):
+    args = dict(requests=24, concurrency=8, rpm=6, tpm=2000, period=2.0,
+                prompt_tokens=150, max_tokens=200, latency=0.02)
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+def test_window_holds_the_quota_from_the_start():
+    window = SlidingWindow(3, period=1.0)
+    for _ in range(3):
+        assert window.room(1) == 0
+        window.book(1)
+    assert 0.9 < window.room(1) <= 1.0 + window.margin
+
+
+def test_window_room_returns_with_given_back_units():
+    window = SlidingWindow(10, period=60.0)
+    booking = window.book(10)
+    assert window.room(4) > 0
+    window.give_back(booking, 6)
+    assert window.room(4) == 0
+
+
+def test_threads_get_no_429s_from_the_stand_in():
+    row = run_mode("limiter", stand_in_args())
+    assert row["failed"] == 0
+    assert row["served_429"] == 0
+
+
+def test_racing_tasks_get_no_429s_from_the_stand_in():
+    args = stand_in_args()
+    server = start_mock(args.rpm, args.tpm, args.period, args.latency)
+    backend = GroqBackend(
+        "mock", api_key="mock", base_url=f"http://127.0.0.1:{server.server_address[1]}",
+        limiter=RateLimiter(rpm=args.rpm, tpm=0, period=args.period),
+    )
+    prompt = "Assign jobs to drivers. " * (args.prompt_tokens // 5)
+
+    async def burst():
+        return await asyncio.gather(*(
+            backend.acomplete([{"role": "user", "content": f"{k} {prompt}"}], max_tokens=args.max_tokens)
+            for k in range(args.requests)
+        ))
+
+    start = time.perf_counter()
+    try:
+        results = asyncio.run(burst())
+    finally:
+        server.shutdown()
+    assert len(results) == args.requests
+    assert server.window.rejected == 0
+    # six requests a window: three windows for the other eighteen
+    assert time.perf_counter() - start < 4 * args.period
@@ -0,0 +1,121 @@
+import datetime as dt
+import itertools
+import os
+import random
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import solver
+from solver import build_chains, job_times, to_timestamp
+
+NINE_UTC = 1754643600.0   # 2025-08-08 09:00:00 UTC
+
+
+@pytest.fixture
+def london():
+    # a local zone off UTC, so reading naive times as local would show
+    old = os.environ.get("TZ")
+    os.environ["TZ"] = "Europe/London"
+    time.tzset()
+    yield
+    if old is None:
+        del os.environ["TZ"]
+    else:
+        os.environ["TZ"] = old
+    time.tzset()
+
+
+@pytest.mark.parametrize("value", [
+    "2025-08-08T09:00:00",
+    "2025-08-08 09:00",
+    " 2025-08-08T09:00:00 ",
+    "08/08/2025 09:00",
+    "Aug 8 2025 9:00 AM",
+    "2025-08-08T10:00:00+01:00",
+    pd.Timestamp("2025-08-08 09:00"),
+    dt.datetime(2025, 8, 8, 9),
+    np.datetime64("2025-08-08T09:00"),
+    NINE_UTC,
+    int(NINE_UTC),
+    np.int64(NINE_UTC),
+])
+def test_every_format_reads_to_one_instant(london, value):
+    assert to_timestamp(value) == NINE_UTC
+
+
+@pytest.mark.parametrize("value", [None, "", "   ", float("nan"), pd.NA, pd.NaT, "not a time"])
+def test_unset_or_unreadable_times_are_none(value):
+    assert to_timestamp(value) is None
+
+
+# ----------------- Chaining -----------------
+def hands_over(a, b):
+    # a missing time may be followed by, or follow, anything
+    return a["dropoff_zone"] == b["pickup_zone"] and job_times(b)[0] >= job_times(a)[1]
+
+
+def fewest_chains(jobs, max_jobs):
+    # Every order of the jobs, cut into the longest runs that chain: the
+    # best cut of the best order is the minimum
+    best = len(jobs)
+    for order in itertools.permutations(jobs):
+        chains, length = 1, 1
+        for a, b in zip(order, order[1:]):
+            if length < max_jobs and hands_over(a, b):
+                length += 1
+            else:
+                chains, length = chains + 1, 1
+        best = min(best, chains)
+    return best
+
+
+def random_jobs(rng, n):
+    zones = [f"z{k}" for k in range(rng.randint(1, 4))]
+    jobs = []
+    for i in range(n):
+        job = {"job_id": f"J{i}", "pickup_zone": rng.choice(zones), "dropoff_zone": rng.choice(zones)}
+        if rng.random() < 0.5:
+            hour = rng.randrange(6, 18)
+            job["pickup_datetime"] = f"2025-08-08T{hour:02d}:00"
+            job["delivery_datetime"] = f"2025-08-08T{hour + 1:02d}:00"
+        jobs.append(job)
+    return jobs
+
+
+def assert_cover(jobs, chains, max_jobs):
+    assert sorted(i for chain in chains for i in chain) == list(range(len(jobs)))
+    for chain in chains:
+        assert len(chain) <= max_jobs
+        assert all(hands_over(jobs[a], jobs[b]) for a, b in zip(chain, chain[1:]))
+
+
+@pytest.mark.parametrize("seed", range(400))
+def test_small_groups_get_the_fewest_chains(monkeypatch, seed):
+    monkeypatch.setattr(solver, "EXACT_STEPS", 10 ** 9)
+    rng = random.Random(seed)
+    jobs = random_jobs(rng, rng.randint(1, 7))
+    max_jobs = rng.choice([2, 3])
+    chains = build_chains(jobs, max_jobs)
+    assert_cover(jobs, chains, max_jobs)
+    assert len(chains) == fewest_chains(jobs, max_jobs)
+
+
+def test_search_over_budget_keeps_the_greedy_chains(monkeypatch):
+    monkeypatch.setattr(solver, "EXACT_STEPS", 1)
+    jobs = random_jobs(random.Random(7), 12)
+    assert_cover(jobs, build_chains(jobs, 3), 3)
+
+
+def test_chains_cross_zone_groups_only_when_they_connect():
+    jobs = [
+        {"job_id": "J0", "pickup_zone": "z2", "dropoff_zone": "z1"},
+        {"job_id": "J1", "pickup_zone": "z1", "dropoff_zone": "z2"},
+        {"job_id": "J2", "pickup_zone": "z1", "dropoff_zone": "z4"},
+        {"job_id": "J3", "pickup_zone": "z3", "dropoff_zone": "z0"},
+    ]
+    chains = build_chains(jobs, 3)
+    assert_cover(jobs, chains, 3)
+    assert len(chains) == 2
@@ -0,0 +1,32 @@
+from optimizer import DeadheadTable
+from validator import repair_plan, strip_offenders, validate_plan
+
+DRIVERS = [{"driver_id": "D1"}, {"driver_id": "D2"}]
+JOBS = [
+    {"job_id": "J1", "pickup_zone": "a", "dropoff_zone": "b"},
+    {"job_id": "J2", "pickup_zone": "c", "dropoff_zone": "a"},
+]
+
+
+def test_repair_keeps_a_chain_the_deadhead_table_connects():
+    deadhead = DeadheadTable.from_records([{"from_zone": "b", "to_zone": "c", "cost": 5}])
+    plan = {"assignments": [{"driver_id": "D1", "jobs": JOBS}]}
+    assert not validate_plan(plan, DRIVERS, JOBS)["valid"]
+
+    # valid with the table, so there is nothing to re-prompt for
+    repaired, report, rounds = repair_plan(None, plan, DRIVERS, JOBS, "", deadhead=deadhead)
+    assert report["valid"] and rounds == []
+    assert repaired is plan
+
+
+def test_entry_without_a_driver_frees_its_jobs():
+    plan = {"assignments": [
+        {"driver_id": None, "jobs": [JOBS[0]]},
+        {"driver_id": "D2", "jobs": [JOBS[1]]},
+    ]}
+    report = validate_plan(plan, DRIVERS, JOBS)
+    assert [v["type"] for v in report["violations"]] == ["unknown_driver"]
+
+    kept, free_jobs = strip_offenders(plan, report, JOBS)
+    assert [a["driver_id"] for a in kept["assignments"]] == ["D2"]
+    assert [job["job_id"] for job in free_jobs] == ["J1"]
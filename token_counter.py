@@ -0,0 +1,85 @@
+import hashlib
+import os
+import threading
+
+# -------------------------
+# Helper: Count Tokens
+# -------------------------
+# Tokenizers are loaded once per process and shared by every Streamlit
+# session and rerun. Point TOKENIZER_DIR at a folder holding saved
+# tokenizers (one sub-folder per HF name, e.g. EleutherAI/gpt-neox-20b)
+# to count without reaching the HF hub.
+TOKENIZER_DIR = os.getenv("TOKENIZER_DIR")
+ESTIMATE_ENCODING = "o200k_base"
+
+tokenizer_cache = {}
+_encoding = None
+_lock = threading.Lock()
+
+
+def hf_model_for(model):
+    # Map Ollama/Groq model to HuggingFace equivalent
+    if "llama" in model:
+        return "meta-llama/Llama-2-7b-hf"   # adjust for llama3.2 once available
+    if "gpt-oss" in model:
+        return "EleutherAI/gpt-neox-20b"    # matches gpt-oss:20b arch
+    return "gpt2"  # fallback
+
+
+def get_tokenizer(model):
+    if model not in tokenizer_cache:
+        with _lock:
+            if model not in tokenizer_cache:
+                from transformers import AutoTokenizer
+
+                hf_model = hf_model_for(model)
+                local_dir = os.path.join(TOKENIZER_DIR, hf_model) if TOKENIZER_DIR else None
+                if local_dir and os.path.isdir(local_dir):
+                    tokenizer = AutoTokenizer.from_pretrained(local_dir, local_files_only=True)
+                else:
+                    tokenizer = AutoTokenizer.from_pretrained(hf_model)
+                tokenizer_cache[model] = tokenizer
+    return tokenizer_cache[model]
+
+
+def count_tokens_exact(text, model="gpt-oss:20b"):
+    tokenizer = get_tokenizer(model)
+    tokens = tokenizer.encode(text, add_special_tokens=False)
+    return len(tokens)
+
+
+def count_tokens_estimate(text, model="gpt-oss:20b"):
+    """Cheap count with tiktoken; falls back to ~4 characters per token."""
+    global _encoding
+    if _encoding is None:
+        with _lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding(ESTIMATE_ENCODING)
+                except Exception:
+                    # no tiktoken, or its BPE file cannot be fetched offline
+                    _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+COUNTERS = {"exact": count_tokens_exact, "estimate": count_tokens_estimate}
+
+# Static prompt prefixes repeat on every upload, so their counts are memoized
+_prefix_counts = {}
+
+
+def count_prompt_tokens(prefix, data, model="gpt-oss:20b", mode="exact"):
+    """Count a prompt split into a static ``prefix`` and per-upload ``data``.
+
+    The prefix is counted once per (model, mode, text) and reused. Summing the
+    two segments can differ from counting the joined text by a token at the
+    seam, which is fine for the budget display this feeds.
+    """
+    counter = COUNTERS[mode]
+    key = (model, mode, hashlib.sha256(prefix.encode("utf-8")).hexdigest())
+    if key not in _prefix_counts:
+        _prefix_counts[key] = counter(prefix, model=model)
+    return _prefix_counts[key] + counter(data, model=model)
@@ -0,0 +1,154 @@
+import math
+import time
+
+from planning import (
+    DEFAULT_OUTPUT, LEFTOVER_RULES, build_prompt, decode_plan, free_capacity, merge_assignments, request_plan,
+)
+from prompt_encoder import DEFAULT_FORMAT
+from solver import MAX_JOBS_PER_DRIVER, job_times, normalize_job
+
+
+# ----------------- Validation -----------------
+def validate_plan(plan, drivers_json, jobs_json, max_jobs=MAX_JOBS_PER_DRIVER, deadhead=None):
+    """Check a plan against the planning rules in one pass.
+
+    Returns ``{"valid", "violations", "offending_drivers", "unassigned"}``.
+    Each violation is a dict with ``type``, ``driver_id``, ``job_id`` and
+    ``detail``. Zones and pickup/delivery times are checked against the
+    source jobs, not against what the model echoed back. With a
+    ``deadhead`` table (see optimizer.py) a chain may also move empty
+    between zones the table connects.
+    """
+    jobs = {}
+    for record in jobs_json:
+        job = normalize_job(record)
+        jobs[job["job_id"]] = job
+    driver_ids = {d["driver_id"] if isinstance(d, dict) else d for d in drivers_json}
+
+    violations = []
+    offending = set()
+    seen_drivers = set()
+    seen_jobs = set()
+
+    def flag(kind, driver_id, job_id=None, detail=""):
+        violations.append({"type": kind, "driver_id": driver_id, "job_id": job_id, "detail": detail})
+        if driver_id is not None:
+            offending.add(driver_id)
+
+    for entry in (plan or {}).get("assignments", []):
+        driver_id = entry.get("driver_id")
+        if driver_id not in driver_ids:
+            flag("unknown_driver", driver_id, detail="driver is not in the drivers file")
+        elif driver_id in seen_drivers:
+            flag("duplicate_driver", driver_id, detail="driver appears more than once")
+        seen_drivers.add(driver_id)
+
+        entry_jobs = entry.get("jobs", [])
+        if len(entry_jobs) > max_jobs:
+            flag("too_many_jobs", driver_id, detail=f"{len(entry_jobs)} jobs, max {max_jobs}")
+
+        previous = None
+        for item in entry_jobs:
+            job_id = item.get("job_id")
+            source = jobs.get(job_id)
+            if source is None:
+                flag("unknown_job", driver_id, job_id, "job is not in the jobs file")
+                previous = None
+                continue
+            if job_id in seen_jobs:
+                flag("duplicate_job", driver_id, job_id, "job is assigned more than once")
+            seen_jobs.add(job_id)
+
+            if (item.get("pickup_zone"), item.get("dropoff_zone")) != (source["pickup_zone"], source["dropoff_zone"]):
+                flag("zone_mismatch", driver_id, job_id,
+                     f"plan says {item.get('pickup_zone')}->{item.get('dropoff_zone')}, "
+                     f"jobs file says {source['pickup_zone']}->{source['dropoff_zone']}")
+            if (previous is not None and source["pickup_zone"] != previous["dropoff_zone"]
+                    and (deadhead is None or deadhead.hop(previous["dropoff_zone"], source["pickup_zone"]) == math.inf)):
+                flag("broken_chain", driver_id, job_id,
+                     f"pickup {source['pickup_zone']} does not follow dropoff {previous['dropoff_zone']}")
+            pickup, delivery = job_times(source)
+            if previous is not None and pickup < previous_delivery:
+                flag("time_conflict", driver_id, job_id,
+                     f"pickup at {source.get('pickup_datetime')} is before the previous delivery "
+                     f"at {previous.get('delivery_datetime')}")
+            previous, previous_delivery = source, delivery
+
+    unassigned = [job for job_id, job in jobs.items() if job_id not in seen_jobs]
+    for job in unassigned:
+        flag("unassigned_job", None, job["job_id"], "job is not assigned to any driver")
+
+    return {
+        "valid": not violations,
+        "violations": violations,
+        "offending_drivers": offending,
+        "unassigned": unassigned,
+    }
+
+
+# ----------------- Repair -----------------
+def strip_offenders(plan, report, jobs_json):
+    """Drop offending drivers from ``plan``; return ``(kept_plan, free_jobs)``.
+
+    ``free_jobs`` are the unassigned jobs plus the real (source) jobs the
+    offending drivers held. An entry without a driver id is dropped too:
+    its violations are flagged under None, which no driver can own.
+    Invented job ids are discarded.
+    """
+    jobs = {}
+    for record in jobs_json:
+        job = normalize_job(record)
+        jobs[job["job_id"]] = job
+
+    kept, placed = [], set()
+    for entry in plan.get("assignments", []):
+        driver_id = entry.get("driver_id")
+        if driver_id is None or driver_id in report["offending_drivers"]:
+            continue
+        kept.append(entry)
+        placed.update(job.get("job_id") for job in entry.get("jobs", []))
+
+    free_jobs = [job for job_id, job in jobs.items() if job_id not in placed]
+    return {"assignments": kept}, free_jobs
+
+
+def repair_plan(backend, plan, drivers_json, jobs_json, user_prompt, max_rounds=2, fmt=DEFAULT_FORMAT,
+                output=DEFAULT_OUTPUT, deadhead=None):
+    """Re-prompt for the broken part of a plan until it validates.
+
+    Each round keeps every valid driver as-is and sends only the freed jobs
+    and the drivers with spare capacity. ``deadhead`` is passed on to
+    :func:`validate_plan`. Returns ``(plan, report, rounds)``.
+    """
+    report = validate_plan(plan, drivers_json, jobs_json, deadhead=deadhead)
+    rounds = []
+    while not report["valid"] and len(rounds) < max_rounds:
+        start = time.time()
+        kept, free_jobs = strip_offenders(plan, report, jobs_json)
+        # every driver stays in the plan so idle ones can take freed jobs
+        placed = {a["driver_id"]: a for a in kept["assignments"]}
+        base = {
+            "assignments": [placed.get(d["driver_id"], {"driver_id": d["driver_id"], "jobs": []}) for d in drivers_json],
+        }
+        free_drivers = free_capacity(base, drivers_json)
+        if not free_jobs or not free_drivers:
+            break
+
+        prompt, zones = build_prompt(
+            free_drivers, free_jobs, user_prompt, extra_rules=LEFTOVER_RULES, fmt=fmt, output=output,
+        )
+        response_json, response_text, result = request_plan(backend, prompt, output=output)
+        response_json = decode_plan(response_json, zones, free_jobs) or {"assignments": []}
+        plan = merge_assignments(base, response_json, free_jobs)
+
+        rounds.append({
+            "round": len(rounds) + 1,
+            "violations": len(report["violations"]),
+            "jobs": len(free_jobs),
+            "drivers": len(free_drivers),
+            "prompt_tokens": result.prompt_tokens,
+            "completion_tokens": result.completion_tokens,
+            "seconds": time.time() - start,
+        })
+        report = validate_plan(plan, drivers_json, jobs_json, deadhead=deadhead)
+    return plan, report, rounds